@@ -0,0 +1,30 @@
+"""
+Settings for operational commands run outside the web process
+
+    python manage.py wait_for_db --settings=app.ops_settings
+
+Leaves out the admin, sessions, messages and static files apps, which
+only serve HTTP requests, so commands such as wait_for_db, relay_outbox
+and the purge jobs start faster. Run migrate and runserver with the full
+settings, since they need every installed app.
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import INSTALLED_APPS, MIDDLEWARE, TEMPLATES
+
+
+WEB_ONLY_APPS = {
+    'django.contrib.admin',
+    'django.contrib.messages',
+    'django.contrib.sessions',
+    'django.contrib.staticfiles',
+}
+
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in WEB_ONLY_APPS]
+
+MIDDLEWARE = [
+    middleware for middleware in MIDDLEWARE
+    if not middleware.startswith(('django.contrib.sessions',
+                                  'django.contrib.messages'))
+]
+
+TEMPLATES = [dict(TEMPLATES[0], OPTIONS={'context_processors': []})]
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/2.1/ref/settings/
 """
 
+import json
 import os
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
@@ -46,6 +47,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -88,6 +90,27 @@ DATABASES = {
     }
 }
 
+# Hash partitions per business table on PostgreSQL 11+; 0 disables.
+# Fresh databases are partitioned by migration, existing data with the
+# partition_business command
+BUSINESS_PARTITIONS = int(os.environ.get('BUSINESS_PARTITIONS', 0))
+
+
+# Cache
+# https://docs.djangoproject.com/en/2.1/topics/cache/
+# Point CACHE_BACKEND/CACHE_LOCATION at a shared cache (e.g. memcached) in
+# production so throttle counters are shared between workers
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.1/ref/settings/#auth-password-validators
@@ -131,4 +154,162 @@ MEDIA_URL = '/media/'
 MEDIA_ROUTE = '/vol/web/media'
 STATUC_ROUTE = '/vol/web/static'
 
-AUTH_USER_MODEL = 'core.User'
\ No newline at end of file
+# Media storage. Uploads are stored under the hash of their content, on
+# disk by default or in an S3-compatible store with
+# MEDIA_STORAGE=core.storage.S3Storage
+DEFAULT_FILE_STORAGE = os.environ.get(
+    'MEDIA_STORAGE',
+    'core.storage.ContentAddressedStorage'
+)
+
+# How media on disk is served: 'django' streams files from Python,
+# 'x-accel-redirect' (nginx) and 'x-sendfile' (Apache, lighttpd) hand the
+# transfer to the web server. Outside DEBUG workers never stream files
+# unless 'django' is set explicitly.
+MEDIA_SERVE_MODE = os.environ.get(
+    'MEDIA_SERVE_MODE',
+    'django' if DEBUG else 'x-accel-redirect'
+)
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+
+# Media files are never modified in place, so they are cached for a year
+MEDIA_CACHE_MAX_AGE = 365 * 24 * 60 * 60
+
+# Seconds presigned media download and direct upload URLs stay valid
+MEDIA_URL_EXPIRES = 60 * 60
+MEDIA_UPLOAD_URL_EXPIRES = 15 * 60
+
+S3_ENDPOINT_URL = os.environ.get('S3_ENDPOINT_URL', '')
+S3_BUCKET = os.environ.get('S3_BUCKET', '')
+S3_REGION = os.environ.get('S3_REGION', 'us-east-1')
+S3_ACCESS_KEY = os.environ.get('S3_ACCESS_KEY', '')
+S3_SECRET_KEY = os.environ.get('S3_SECRET_KEY', '')
+# Public base URL (CDN or static server) for media; presigned URLs otherwise
+S3_PUBLIC_URL = os.environ.get('S3_PUBLIC_URL', '')
+
+AUTH_USER_MODEL = 'core.User'
+
+
+# Django REST framework
+
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': (
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': '30/min',
+        'login_email': '10/min',
+    },
+}
+
+# Token bucket rates per user for write requests, by the view's
+# throttle_scope or by `<throttle_scope>_<action>` for a single action
+WRITE_THROTTLE_RATES = {
+    'business': '120/min',
+    'business_upload_image': '20/min',
+    'business_confirm_upload': '20/min',
+    'category': '240/min',
+    'service': '240/min',
+}
+
+# Requests a user may have in flight per scope, and seconds after which
+# the slots of a worker that died are freed
+CONCURRENCY_LIMITS = {
+    'business_upload_image': 2,
+}
+CONCURRENCY_SLOT_TIMEOUT = 5 * 60
+
+# Responses smaller than COMPRESSION_MIN_SIZE bytes are not compressed.
+# Levels are tuned for dynamic responses rather than maximum ratio.
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_GZIP_LEVEL = 6
+COMPRESSION_BROTLI_QUALITY = 4
+
+# Seconds a failed email/password pair is rejected without hashing
+LOGIN_FAILURE_CACHE_TIMEOUT = 300
+
+# API tokens expire after AUTH_TOKEN_IDLE_TIMEOUT seconds without use or
+# AUTH_TOKEN_MAX_AGE seconds after creation. last_used is written at most
+# once per AUTH_TOKEN_TOUCH_INTERVAL seconds per token.
+AUTH_TOKEN_IDLE_TIMEOUT = 7 * 24 * 60 * 60
+AUTH_TOKEN_MAX_AGE = 30 * 24 * 60 * 60
+AUTH_TOKEN_TOUCH_INTERVAL = 5 * 60
+
+# Incremental sync: changes returned per page and days delete tombstones
+# are kept before clients with older cursors must sync from scratch
+SYNC_PAGE_SIZE = 500
+SYNC_TOMBSTONE_RETENTION_DAYS = 30
+
+# Seconds before a change is behind every sync cursor, and before
+# relay_outbox delivers an outbox event. Transactions that write changes
+# or events must commit within it, including clock skew between hosts.
+SYNC_COMMIT_LAG = 10
+
+# Where relay_outbox delivers domain events: core.outbox.FileSink (path),
+# WebhookSink (url, secret, timeout), SpoolSink (directory) or
+# business.webhooks.WebhookDispatcher to notify webhook subscriptions.
+# OUTBOX_OPTIONS holds the backend's options as JSON.
+OUTBOX_SINK = {
+    'BACKEND': os.environ.get('OUTBOX_SINK', 'core.outbox.FileSink'),
+    'OPTIONS': json.loads(os.environ.get(
+        'OUTBOX_OPTIONS',
+        '{"path": "/vol/web/outbox.jsonl"}'
+    )),
+}
+
+# Webhook deliveries: worker threads, requests in flight per endpoint,
+# attempts per delivery with exponential backoff starting at
+# WEBHOOK_BACKOFF seconds, and failed deliveries in a row before a
+# subscription is deactivated
+WEBHOOK_WORKERS = int(os.environ.get('WEBHOOK_WORKERS', 8))
+WEBHOOK_ENDPOINT_CONCURRENCY = 2
+WEBHOOK_MAX_ATTEMPTS = 5
+WEBHOOK_BACKOFF = 0.5
+WEBHOOK_TIMEOUT = 10
+WEBHOOK_MAX_FAILURES = 20
+
+# Seconds a batch may spend on deliveries while relay_outbox holds its
+# locks; deliveries still failing then are counted as failures
+WEBHOOK_BATCH_TIMEOUT = 30
+
+# Webhooks only reach https URLs on public addresses, so tenants cannot
+# make the relay send requests into the internal network. Turn off only
+# for local development.
+WEBHOOK_PUBLIC_ONLY = True
+
+# Background jobs: threads per run_worker, seconds a claimed job stays
+# hidden from other workers, and attempts per job with exponential
+# backoff starting at JOB_RETRY_BACKOFF seconds
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 4))
+JOB_VISIBILITY_TIMEOUT = 5 * 60
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_BACKOFF = 10
+
+# Businesses serialized per query when caches are warmed, and whether a
+# login queues a job warming the user's caches
+WARM_BATCH_SIZE = 200
+WARM_CACHE_ON_LOGIN = os.environ.get('WARM_CACHE_ON_LOGIN', '') == '1'
+
+# Seconds a replaced business image is kept for clients that still have
+# its URL before it is deleted, unless another business refers to it
+REPLACED_IMAGE_GRACE = 60 * 60
+
+# Seconds a category or service id stays cached as owned by a user
+RELATED_ID_CACHE_TIMEOUT = 30
+
+# Seconds the ordered business ids of a filtered list stay cached
+BUSINESS_ID_CACHE_TIMEOUT = 300
+
+# Seconds a serialized business version stays cached
+BUSINESS_REPR_CACHE_TIMEOUT = 60 * 60
+
+# Link categories and services to shared taxonomy terms by name
+GLOBAL_TAXONOMY = os.environ.get('GLOBAL_TAXONOMY', '') == '1'
+
+# List businesses from the denormalized BusinessListing table. Run the
+# rebuild_listings command before enabling it.
+BUSINESS_LISTING = os.environ.get('BUSINESS_LISTING', '') == '1'
+
+GEO_DEFAULT_RADIUS_KM = 5
+GEO_MAX_RADIUS_KM = 500
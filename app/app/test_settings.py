@@ -0,0 +1,51 @@
+"""
+Settings for running the test suite
+
+    python manage.py test --settings=app.test_settings --parallel
+
+Tests run against in-memory SQLite, which every parallel worker clones,
+unless TEST_DB_ENGINE=postgresql is set to run them against the
+PostgreSQL server configured by the DB_* variables instead; Django then
+clones one template test database per worker. Only the PostgreSQL run
+builds the schema with the migrations, so run it before merging
+migrations; core.tests.test_migrations checks they were all applied.
+"""
+import os
+import tempfile
+
+from .settings import *  # noqa: F401,F403
+
+
+if os.environ.get('TEST_DB_ENGINE') != 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': ':memory:',
+        }
+    }
+
+    # SQLite rebuilds tables to alter them, which fails on the partial
+    # indexes, so the schema is created from the models instead;
+    # test_migrations still checks the migrations match the models
+    MIGRATION_MODULES = {'core': None}
+
+# Password hashing dominates fixture setup with the default hasher
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+MEDIA_ROOT = tempfile.mkdtemp(prefix='test-media-')
+
+DEBUG = False
+
+# Tests reuse user ids, so write throttles would carry over between them;
+# throttle tests enable the rates they need
+WRITE_THROTTLE_RATES = {}
+
+# Test transactions never commit, so cursors may pass new changes and the
+# relay may deliver new events at once; the tests of the lag enable it
+SYNC_COMMIT_LAG = 0
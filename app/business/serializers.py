@@ -1,6 +1,30 @@
+from django.conf import settings
+from django.db import transaction
+
 from rest_framework import serializers
 
-from core.models import Category, Service, Business
+from core.exceptions import PreconditionFailed
+from core.outbox import BlockedAddress, check_public_url
+from core.models import Category, Service, Business, TaxonomyTerm
+from core.models import WebhookSubscription
+from core.relations import UserPrimaryKeyRelatedField
+
+
+class TaxonomyListSerializer(serializers.ListSerializer):
+    """Create many categories or services, interning all names at once"""
+
+    def create(self, validated_data):
+        if settings.GLOBAL_TAXONOMY:
+            term_ids = TaxonomyTerm.objects.intern(
+                self.child.Meta.model.taxonomy_kind,
+                [attrs['name'] for attrs in validated_data]
+            )
+            validated_data = [
+                dict(attrs, term_id=term_ids[attrs['name']])
+                for attrs in validated_data
+            ]
+
+        return super().create(validated_data)
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -10,6 +34,7 @@ class CategorySerializer(serializers.ModelSerializer):
         model = Category
         fields = ('id', 'name')
         read_only_fields = ('id',)
+        list_serializer_class = TaxonomyListSerializer
 
 
 class ServiceSerializer(serializers.ModelSerializer):
@@ -19,23 +44,95 @@ class ServiceSerializer(serializers.ModelSerializer):
         model = Service
         fields = ('id', 'name')
         read_only_fields = ('id',)
+        list_serializer_class = TaxonomyListSerializer
+
+
+class SparseFieldsMixin:
+    """Shape serializer output with requested fields and expanded relations
+
+    `fields` limits the output to the given field names and `expand`
+    replaces primary key relations listed in `expandable_fields` with
+    nested objects.
+    """
+    expandable_fields = {}
 
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        expand = kwargs.pop('expand', ())
+        super().__init__(*args, **kwargs)
 
-class BusinessSerializer(serializers.ModelSerializer):
+        for name in expand:
+            if name in self.expandable_fields and name in self.fields:
+                self.fields[name] = self.expandable_fields[name](
+                    many=True,
+                    read_only=True
+                )
+
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class BusinessSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for Business object"""
-    services = serializers.PrimaryKeyRelatedField(
+    expandable_fields = {
+        'services': ServiceSerializer,
+        'categories': CategorySerializer,
+    }
+    services = UserPrimaryKeyRelatedField(
         many=True,
         queryset=Service.objects.all()
     )
-    categories = serializers.PrimaryKeyRelatedField(
+    categories = UserPrimaryKeyRelatedField(
         many=True,
         queryset=Category.objects.all()
     )
 
+    distance = serializers.FloatField(read_only=True)
+
     class Meta:
         model = Business
-        fields = ('id', 'name', 'services', 'categories')
-        read_only_fields = ('id',)
+        fields = (
+            'id', 'name', 'services', 'categories', 'latitude', 'longitude',
+            'distance', 'version'
+        )
+        read_only_fields = ('id', 'version')
+
+    def validate(self, attrs):
+        """Require latitude and longitude to be set together"""
+        latitude, longitude = (
+            attrs.get(name, getattr(self.instance, name, None))
+            for name in ('latitude', 'longitude')
+        )
+        if (latitude is None) != (longitude is None):
+            raise serializers.ValidationError(
+                'Latitude and longitude must be set together.'
+            )
+
+        return attrs
+
+    def update(self, instance, validated_data):
+        """Update the business with one conditional UPDATE
+
+        Pass `expected_version` to `save()` to only write while the
+        business is still at that version. Relations are diffed so only
+        changed rows are written.
+        """
+        version = validated_data.pop('expected_version', None)
+        relations = {
+            name: validated_data.pop(name)
+            for name in ('categories', 'services') if name in validated_data
+        }
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+
+        with transaction.atomic():
+            if not instance.conditional_update(validated_data, version):
+                raise PreconditionFailed()
+            for name, ids in relations.items():
+                instance.set_related_ids(name, ids)
+
+        return instance
 
 
 class BusinessDetailSerializer(BusinessSerializer):
@@ -50,4 +147,43 @@ class BusinessImageSerializer(serializers.ModelSerializer):
     class Meta:
         model = Business
         fields = ('id', 'image')
-        read_only_fields = ('id',)
\ No newline at end of file
+        read_only_fields = ('id',)
+
+
+class DirectUploadSerializer(serializers.Serializer):
+    """Serializer for uploading a business image straight to storage"""
+    sha256 = serializers.RegexField(r'^[0-9a-f]{64}$')
+    ext = serializers.ChoiceField(
+        choices=('jpg', 'jpeg', 'png', 'gif', 'webp')
+    )
+
+
+class WebhookSubscriptionSerializer(serializers.ModelSerializer):
+    """Serializer for webhook subscriptions"""
+
+    class Meta:
+        model = WebhookSubscription
+        fields = ('id', 'url', 'secret', 'active', 'failures', 'created')
+        read_only_fields = ('id', 'failures', 'created')
+        extra_kwargs = {'secret': {'write_only': True}}
+
+    def validate_url(self, url):
+        """Reject URLs that are not https to a public address"""
+        if settings.WEBHOOK_PUBLIC_ONLY:
+            try:
+                check_public_url(url)
+            except BlockedAddress as error:
+                raise serializers.ValidationError(str(error))
+            except OSError:
+                raise serializers.ValidationError(
+                    'The host could not be resolved.'
+                )
+
+        return url
+
+    def update(self, instance, validated_data):
+        """Start counting failures afresh when a subscription is reactivated"""
+        if validated_data.get('active'):
+            instance.failures = 0
+
+        return super().update(instance, validated_data)
@@ -0,0 +1,25 @@
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from core.jobs import task
+from core.models import Business
+from core.storage import lock_stored_file
+
+from .warming import warm_user
+
+
+@task('business.collect_image')
+def collect_image(image):
+    """Delete a replaced image once no business refers to it"""
+    with transaction.atomic():
+        lock_stored_file(image)
+        if Business.all_objects.filter(image=image).exists():
+            return
+
+        default_storage.delete(image)
+
+
+@task('business.warm_cache')
+def warm_cache(user_id):
+    """Preload the caches read by the user's first requests"""
+    warm_user(user_id)
@@ -1,9 +1,11 @@
 import tempfile
 import os
+from unittest.mock import patch
 
 from PIL import Image
 
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import TestCase
 from django.urls import reverse
 
@@ -11,6 +13,7 @@ from rest_framework import status
 from rest_framework.test import APIClient
 
 from core.models import Business, Category, Service
+from core.querycache import business_repr_cache, owned_id_cache
 
 from ..serializers import BusinessSerializer, BusinessDetailSerializer
 
@@ -22,6 +25,14 @@ def image_upload_url(business_id):
     """Return url for business image"""
     return reverse('business:business-upload-image', args=[business_id])
 
+def upload_url_url(business_id):
+    """Return url for requesting a direct image upload"""
+    return reverse('business:business-upload-url', args=[business_id])
+
+def confirm_upload_url(business_id):
+    """Return url for confirming a direct image upload"""
+    return reverse('business:business-confirm-upload', args=[business_id])
+
 def detail_url(business_id):
     """Return business detail url"""
     return reverse('business:business-detail', args=[business_id])
@@ -63,9 +74,17 @@ class PublicBusinessApiTest(TestCase):
 class PrivateBusinessApiTest(TestCase):
     """Test authenticated business API"""
 
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            'test@test.com',
+            '12345'
+        )
+
     def setUp(self):
+        owned_id_cache.clear()
+        cache.clear()
         self.client = APIClient()
-        self.user = get_user_model().objects.create_user('test@test.com', '12345')
         self.client.force_authenticate(self.user)
 
     def test_retrieve_business(self):
@@ -173,6 +192,91 @@ class PrivateBusinessApiTest(TestCase):
         categories = business.categories.all()
         self.assertEqual(categories.count(), 1)
 
+    def test_create_business_with_other_users_category(self):
+        """Test assigning another user's category is rejected"""
+        user2 = get_user_model().objects.create_user('test1@test.com', '12345')
+        category = sample_category(user=user2)
+
+        res = self.client.post(
+            BUSINESS_URL,
+            {'name': 'Business 1', 'categories': [category.id]}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_retrieve_business_etag(self):
+        """Test the business detail carries the ETag of its version"""
+        business = sample_business(user=self.user)
+
+        res = self.client.get(detail_url(business.id))
+
+        self.assertEqual(res['ETag'], f'"{business.id}-1"')
+        self.assertEqual(res.data['version'], 1)
+
+    def test_update_business_if_match(self):
+        """Test updating with a current If-Match writes a new version"""
+        business = sample_business(user=self.user)
+        url = detail_url(business.id)
+        etag = self.client.get(url)['ETag']
+
+        res = self.client.patch(url, {'name': 'New name'}, HTTP_IF_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['ETag'], f'"{business.id}-2"')
+        business.refresh_from_db()
+        self.assertEqual((business.name, business.version), ('New name', 2))
+
+    def test_update_business_weak_if_match(self):
+        """Test a weakened ETag still matches its version"""
+        business = sample_business(user=self.user)
+
+        res = self.client.patch(
+            detail_url(business.id),
+            {'name': 'New name'},
+            HTTP_IF_MATCH=f'W/{business.etag}'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_update_business_stale_if_match(self):
+        """Test updating with an outdated If-Match is rejected"""
+        business = sample_business(user=self.user)
+        etag = business.etag
+        business.name = 'Changed elsewhere'
+        business.save()
+
+        res = self.client.put(
+            detail_url(business.id),
+            {'name': 'Lost update'},
+            HTTP_IF_MATCH=etag
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        business.refresh_from_db()
+        self.assertEqual(business.name, 'Changed elsewhere')
+
+    def test_update_business_relations_diffed(self):
+        """Test updating relations only replaces the changed rows"""
+        business = sample_business(user=self.user)
+        kept = sample_category(user=self.user, name='Kept')
+        removed = sample_category(user=self.user, name='Removed')
+        added = sample_category(user=self.user, name='Added')
+        business.categories.add(kept, removed)
+        kept_row = business.categories.through.objects.get(category=kept)
+
+        res = self.client.patch(
+            detail_url(business.id),
+            {'categories': [kept.id, added.id]}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        rows = business.categories.through.objects.filter(business=business)
+        self.assertEqual(
+            set(rows.values_list('category_id', flat=True)),
+            {kept.id, added.id}
+        )
+        self.assertTrue(rows.filter(id=kept_row.id).exists())
+
     def test_full_update_business(self):
         """Test updating a business with patch"""
         business = sample_business(user=self.user)
@@ -191,11 +295,193 @@ class PrivateBusinessApiTest(TestCase):
         self.assertEqual(categories.count(), 0)
 
 
+    def test_list_sparse_fields(self):
+        """Test limiting business list output to requested fields"""
+        business = sample_business(user=self.user)
+        business.categories.add(sample_category(user=self.user))
+
+        res = self.client.get(BUSINESS_URL, {'fields': 'id,name'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res.data,
+            [{'id': business.id, 'name': business.name}]
+        )
+
+    def test_list_sparse_fields_skip_relations(self):
+        """Test that unrequested relations are not queried"""
+        for i in range(3):
+            sample_business(user=self.user, name=f'Business {i}')
+
+        with self.assertNumQueries(1):
+            self.client.get(BUSINESS_URL, {'fields': 'name'})
+
+    def test_filter_permutations_share_cached_ids(self):
+        """Test reordered and repeated filter ids reuse the cached ids"""
+        business = sample_business(user=self.user, name='Business 1')
+        category1 = sample_category(user=self.user, name='Category 1')
+        category2 = sample_category(user=self.user, name='Category 2')
+        business.categories.add(category1, category2)
+
+        res = self.client.get(
+            BUSINESS_URL,
+            {'categories': f'{category1.id},{category2.id}'}
+        )
+        # Both the ids and the representations are cached
+        with self.assertNumQueries(0):
+            cached = self.client.get(
+                BUSINESS_URL,
+                {'categories': f'{category2.id},{category1.id},{category2.id}'}
+            )
+
+        self.assertEqual(cached.data, res.data)
+        self.assertEqual([item['id'] for item in res.data], [business.id])
+
+    def test_filter_cache_invalidated_by_changes(self):
+        """Test cached filter results follow relation changes"""
+        business1 = sample_business(user=self.user, name='Business 1')
+        business2 = sample_business(user=self.user, name='Business 2')
+        category = sample_category(user=self.user)
+        business1.categories.add(category)
+        params = {'categories': str(category.id)}
+
+        self.client.get(BUSINESS_URL, params)
+        business2.categories.add(category)
+        res = self.client.get(BUSINESS_URL, params)
+
+        self.assertEqual(
+            [item['id'] for item in res.data],
+            [business2.id, business1.id]
+        )
+
+    def test_list_serializes_cache_misses_only(self):
+        """Test that cached representations are not loaded again"""
+        for i in range(3):
+            business = sample_business(user=self.user, name=f'Business {i}')
+            business.categories.add(sample_category(user=self.user))
+        res = self.client.get(BUSINESS_URL)
+
+        with self.assertNumQueries(1):
+            cached = self.client.get(BUSINESS_URL)
+        business.name = 'Renamed'
+        business.save()
+        with self.assertNumQueries(4) as context:
+            updated = self.client.get(BUSINESS_URL)
+
+        self.assertEqual(cached.data, res.data)
+        self.assertIn(
+            f'IN ({business.id})',
+            context.captured_queries[1]['sql']
+        )
+        self.assertEqual(updated.data[0]['name'], 'Renamed')
+
+    def test_cached_representations_follow_relation_changes(self):
+        """Test that relation changes are rendered despite the cache"""
+        business = sample_business(user=self.user)
+        category = sample_category(user=self.user)
+        business.categories.add(category)
+        url = detail_url(business.id)
+        self.client.get(url)
+        self.client.get(BUSINESS_URL)
+
+        category.name = 'Renamed'
+        category.save()
+        service = sample_service(user=self.user)
+        service.business_set.add(business)
+
+        detail = self.client.get(url)
+        res = self.client.get(BUSINESS_URL)
+        self.assertEqual(detail.data['categories'][0]['name'], 'Renamed')
+        self.assertEqual(res.data[0]['services'], [service.id])
+
+    def test_late_cache_fill_not_served_after_relation_change(self):
+        """Test a representation read before a change is not served after"""
+        business = sample_business(user=self.user)
+        category = sample_category(user=self.user)
+        business.categories.add(category)
+        url = detail_url(business.id)
+        stale = self.client.get(url)
+        business.refresh_from_db()
+        version = business.version
+
+        category.name = 'Renamed'
+        category.save()
+        # A reader that loaded the business before the rename commits
+        # caches it only after the rename
+        business_repr_cache.set_many(
+            'detail',
+            {(business.id, version): stale.data}
+        )
+
+        res = self.client.get(url)
+
+        self.assertEqual(res.data['categories'][0]['name'], 'Renamed')
+        self.assertNotEqual(res['ETag'], stale['ETag'])
+
+    def test_list_relations_prefetched(self):
+        """Test that relation ids are loaded without a query per row"""
+        for i in range(3):
+            business = sample_business(user=self.user, name=f'Business {i}')
+            business.categories.add(sample_category(user=self.user))
+            business.services.add(sample_service(user=self.user))
+
+        with self.assertNumQueries(4):
+            self.client.get(BUSINESS_URL)
+
+    def test_list_expand_relations(self):
+        """Test expanding relations into nested objects"""
+        business = sample_business(user=self.user)
+        category = sample_category(user=self.user)
+        service = sample_service(user=self.user)
+        business.categories.add(category)
+        business.services.add(service)
+
+        res = self.client.get(BUSINESS_URL, {'expand': 'categories'})
+
+        self.assertEqual(
+            res.data[0]['categories'],
+            [{'id': category.id, 'name': category.name}]
+        )
+        self.assertEqual(res.data[0]['services'], [service.id])
+
+    def test_detail_sparse_fields(self):
+        """Test limiting business detail output to requested fields"""
+        business = sample_business(user=self.user)
+        category = sample_category(user=self.user)
+        business.categories.add(category)
+
+        res = self.client.get(
+            detail_url(business.id),
+            {'fields': 'categories'}
+        )
+
+        self.assertEqual(res.data, {
+            'categories': [{'id': category.id, 'name': category.name}]
+        })
+
+    def test_delete_business(self):
+        """Test that deleting a business hides it without removing the row"""
+        business = sample_business(user=self.user)
+
+        res = self.client.delete(detail_url(business.id))
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.client.get(BUSINESS_URL).data, [])
+        self.assertTrue(Business.all_objects.filter(id=business.id).exists())
+
+
 class BusinessImageUploadTest(TestCase):
 
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            'user@test.com',
+            '12345'
+        )
+
     def setUp(self):
+        cache.clear()
         self.client = APIClient()
-        self.user = get_user_model().objects.create_user('user@test.com', '12345')
         self.client.force_authenticate(self.user)
         self.business = sample_business(user=self.user)
 
@@ -224,6 +510,78 @@ class BusinessImageUploadTest(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
 
+    @patch('business.views.default_storage')
+    def test_direct_upload_url(self, storage):
+        """Test requesting a presigned url for a new image"""
+        storage.exists.return_value = False
+        storage.presigned_upload.return_value = ('https://s3.test/put', {})
+        digest = 'a' * 64
+
+        res = self.client.post(
+            upload_url_url(self.business.id),
+            {'sha256': digest, 'ext': 'png'}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['url'], 'https://s3.test/put')
+        storage.presigned_upload.assert_called_once_with(
+            f'uploads/business/aa/{digest}.png',
+            digest
+        )
+
+    @patch('business.views.default_storage')
+    def test_direct_upload_deduplicated(self, storage):
+        """Test that already stored content is attached without uploading"""
+        storage.exists.return_value = True
+        digest = 'b' * 64
+
+        res = self.client.post(
+            upload_url_url(self.business.id),
+            {'sha256': digest, 'ext': 'png'}
+        )
+
+        self.business.refresh_from_db()
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            self.business.image.name,
+            f'uploads/business/bb/{digest}.png'
+        )
+        storage.presigned_upload.assert_not_called()
+
+    @patch('business.views.default_storage')
+    def test_confirm_missing_upload(self, storage):
+        """Test that an image must be uploaded before it is attached"""
+        storage.exists.return_value = False
+
+        res = self.client.post(
+            confirm_upload_url(self.business.id),
+            {'sha256': 'c' * 64, 'ext': 'png'}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @patch('business.views.lock_stored_file')
+    @patch('business.views.default_storage')
+    def test_confirm_upload_collected_meanwhile(self, storage, lock):
+        """Test that an image deleted before the lock is held is not used"""
+        storage.exists.return_value = True
+
+        # The collector deletes the file while this waits for the lock
+        def collect(name):
+            storage.exists.return_value = False
+
+        lock.side_effect = collect
+
+        res = self.client.post(
+            confirm_upload_url(self.business.id),
+            {'sha256': 'd' * 64, 'ext': 'png'}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        lock.assert_called_once_with(f'uploads/business/dd/{"d" * 64}.png')
+        self.business.refresh_from_db()
+        self.assertFalse(self.business.image)
+
     def test_filter_businesses_by_category(self):
         """Test returning businesses in specific category"""
         business1 = sample_business(user=self.user, name='Business 1')
@@ -271,4 +629,152 @@ class BusinessImageUploadTest(TestCase):
         self.assertNotIn(serializer3.data, res.data)
 
     
-        
\ No newline at end of file
+        
+    def test_create_business_with_location(self):
+        """Test creating a business with coordinates stores its geohash"""
+        payload = {
+            'name': 'Harbour',
+            'latitude': 57.64911,
+            'longitude': 10.40744,
+        }
+        res = self.client.post(BUSINESS_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        business = Business.objects.get(id=res.data['id'])
+        self.assertTrue(business.geohash.startswith('u4pruydqqvj'))
+
+    def test_create_business_partial_location_invalid(self):
+        """Test latitude without longitude is rejected"""
+        res = self.client.post(
+            BUSINESS_URL,
+            {'name': 'Harbour', 'latitude': 57.6}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_filter_businesses_near(self):
+        """Test returning businesses within a radius, nearest first"""
+        far = sample_business(
+            user=self.user,
+            name='Far',
+            latitude=45.81,
+            longitude=15.98
+        )
+        near = sample_business(
+            user=self.user,
+            name='Near',
+            latitude=45.80,
+            longitude=15.97
+        )
+        nearest = sample_business(
+            user=self.user,
+            name='Nearest',
+            latitude=45.8,
+            longitude=15.961
+        )
+        sample_business(
+            user=self.user,
+            name='Away',
+            latitude=44.0,
+            longitude=15.0
+        )
+        sample_business(user=self.user, name='Nowhere')
+
+        res = self.client.get(
+            BUSINESS_URL,
+            {'near': '45.8,15.96', 'radius': '5'}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [business['id'] for business in res.data],
+            [nearest.id, near.id, far.id]
+        )
+        self.assertLess(res.data[0]['distance'], 0.1)
+
+    def test_location_and_relation_filters_combined(self):
+        """Test businesses matching several ids are listed once near a point"""
+        near = sample_business(
+            user=self.user,
+            name='Near',
+            latitude=45.80,
+            longitude=15.97
+        )
+        far = sample_business(
+            user=self.user,
+            name='Far',
+            latitude=45.81,
+            longitude=15.98
+        )
+        sample_business(
+            user=self.user,
+            name='Plain',
+            latitude=45.8,
+            longitude=15.961
+        )
+        category1 = sample_category(user=self.user, name='Category 1')
+        category2 = sample_category(user=self.user, name='Category 2')
+        service1 = sample_service(user=self.user, name='Service 1')
+        service2 = sample_service(user=self.user, name='Service 2')
+        near.categories.add(category1, category2)
+        near.services.add(service1, service2)
+        far.categories.add(category1)
+        far.services.add(service2)
+        filters = {
+            'categories': f'{category1.id},{category2.id}',
+            'services': f'{service1.id},{service2.id}',
+        }
+
+        cached = self.client.get(BUSINESS_URL, filters)
+        located = self.client.get(
+            BUSINESS_URL,
+            dict(filters, near='45.8,15.96', radius='5')
+        )
+        boxed = self.client.get(
+            BUSINESS_URL,
+            dict(filters, bbox='15.5,45.5,16.5,46.0')
+        )
+
+        self.assertEqual(
+            sorted(business['id'] for business in cached.data),
+            [near.id, far.id]
+        )
+        self.assertEqual(
+            [business['id'] for business in located.data],
+            [near.id, far.id]
+        )
+        self.assertEqual(
+            sorted(business['id'] for business in boxed.data),
+            [near.id, far.id]
+        )
+
+    def test_filter_businesses_bbox(self):
+        """Test returning businesses inside a bounding box"""
+        inside = sample_business(
+            user=self.user,
+            name='Inside',
+            latitude=45.8,
+            longitude=15.9
+        )
+        sample_business(
+            user=self.user,
+            name='Outside',
+            latitude=46.5,
+            longitude=15.9
+        )
+
+        res = self.client.get(BUSINESS_URL, {'bbox': '15.5,45.5,16.5,46.0'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [business['id'] for business in res.data],
+            [inside.id]
+        )
+
+    def test_filter_businesses_invalid_location(self):
+        """Test malformed location filters are rejected"""
+        for params in ({'near': '45.8'}, {'near': '45.8,15.9', 'radius': '-1'},
+                       {'bbox': '16.5,45.5,15.5,46.0'}, {'bbox': 'a,b,c,d'}):
+            res = self.client.get(BUSINESS_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
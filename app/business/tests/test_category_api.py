@@ -1,11 +1,14 @@
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from core.models import Category, Business
+from core.models import Category, Business, TaxonomyTerm
+from core.taxonomy import term_cache
 
 from ..serializers import CategorySerializer
 
@@ -30,11 +33,14 @@ class PublicCategoryApiTests(TestCase):
 class PrivateCategoryApiTests(TestCase):
     """Test the authorized categories API"""
 
-    def setUp(self):
-        self.user = get_user_model().objects.create_user(
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
             'test@test.com',
             '12345'
         )
+
+    def setUp(self):
         self.client = APIClient()
         self.client.force_authenticate(self.user)
 
@@ -78,6 +84,40 @@ class PrivateCategoryApiTests(TestCase):
 
         self.assertTrue(exists)
 
+    @override_settings(GLOBAL_TAXONOMY=True)
+    def test_create_categories_in_bulk(self):
+        """Test creating a list of categories linked to shared terms"""
+        term_cache.clear()
+        payload = [{'name': 'Bakery'}, {'name': 'bakery'}, {'name': 'Cafe'}]
+        res = self.client.post(CATEGORY_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(res.data), 3)
+        terms = dict(Category.objects.values_list('name', 'term'))
+        self.assertEqual(terms['Bakery'], terms['bakery'])
+        self.assertEqual(TaxonomyTerm.objects.count(), 2)
+
+    @override_settings(GLOBAL_TAXONOMY=True)
+    def test_bulk_create_interns_names_once(self):
+        """Test that a bulk create reads and writes terms in one batch"""
+        term_cache.clear()
+        payload = [{'name': f'Category {i}'} for i in range(10)]
+
+        with CaptureQueriesContext(connection) as context:
+            res = self.client.post(CATEGORY_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        term_queries = [
+            query for query in context.captured_queries
+            if 'core_taxonomyterm' in query['sql']
+        ]
+        # One INSERT of the missing terms and one SELECT of their ids
+        self.assertEqual(len(term_queries), 2)
+        self.assertEqual(
+            Category.objects.filter(term__isnull=False).count(),
+            10
+        )
+
     def test_create_category_invalid(self):
         """Test creating a new category with invalid payload"""
         payload = {'name': ''}
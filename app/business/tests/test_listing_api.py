@@ -0,0 +1,88 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Business, Category, Service
+from core.tests.factories import create_named, create_users
+
+
+BUSINESS_URL = reverse('business:business-list')
+
+
+@override_settings(BUSINESS_LISTING=True)
+class BusinessListingApiTests(TestCase):
+    """Test listing businesses from the denormalized read model"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.other = create_users(2)
+        cls.food, cls.drinks = create_named(
+            Category,
+            cls.user,
+            ['Food', 'Drinks']
+        )
+        cls.delivery, = create_named(Service, cls.user, ['Delivery'])
+        cls.bistro = Business.objects.create(
+            user=cls.user,
+            name='Bistro',
+            latitude=45.81,
+            longitude=15.98
+        )
+        cls.bistro.categories.add(cls.food)
+        cls.bistro.services.add(cls.delivery)
+        cls.bar = Business.objects.create(user=cls.user, name='Bar')
+        cls.bar.categories.add(cls.drinks)
+        Business.objects.create(user=cls.other, name='Elsewhere')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assertSameAsBusinessTable(self, params):
+        res = self.client.get(BUSINESS_URL, params)
+        # Neither list may be served from the other's cached rows
+        cache.clear()
+        with override_settings(BUSINESS_LISTING=False):
+            expected = self.client.get(BUSINESS_URL, params)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json(), expected.json())
+        return res
+
+    def test_list_matches_business_table(self):
+        """Test listings render like the businesses they copy"""
+        res = self.assertSameAsBusinessTable({})
+
+        self.assertEqual(
+            [item['name'] for item in res.json()],
+            ['Bistro', 'Bar']
+        )
+
+    def test_expand_and_fields_match_business_table(self):
+        """Test expanded relations and sparse fields render the same"""
+        self.assertSameAsBusinessTable({'expand': 'categories,services'})
+        self.assertSameAsBusinessTable({'fields': 'id,name,services'})
+
+    def test_filters_match_business_table(self):
+        """Test relation and location filters select the same businesses"""
+        res = self.assertSameAsBusinessTable(
+            {'categories': f'{self.food.id},{self.drinks.id}'}
+        )
+        self.assertEqual(len(res.json()), 2)
+        self.assertSameAsBusinessTable({'services': str(self.delivery.id)})
+        self.assertSameAsBusinessTable({'near': '45.8,15.97', 'radius': '5'})
+
+    def test_list_reads_one_table(self):
+        """Test the list is served from the listing table without joins"""
+        with self.assertNumQueries(2) as context:
+            self.client.get(
+                BUSINESS_URL,
+                {'categories': str(self.food.id), 'expand': 'categories'}
+            )
+
+        for query in context.captured_queries:
+            self.assertNotIn('JOIN', query['sql'])
@@ -0,0 +1,100 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Business, Category, OutboxEvent
+
+
+BUSINESS_URL = reverse('business:business-list')
+CATEGORY_URL = reverse('business:category-list')
+
+
+def detail_url(business_id):
+    """Return business detail URL"""
+    return reverse('business:business-detail', args=[business_id])
+
+
+class OutboxApiTests(TestCase):
+    """Test that API writes append outbox events"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            'test@test.com',
+            '12345'
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def events(self):
+        return list(OutboxEvent.objects.order_by('id').values_list(
+            'aggregate', 'aggregate_id', 'event_type'
+        ))
+
+    def test_create_appends_event(self):
+        """Test creating a business appends a created event"""
+        res = self.client.post(BUSINESS_URL, {'name': 'Shop'})
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        event = OutboxEvent.objects.get()
+        self.assertEqual(event.user_id, self.user.id)
+        self.assertEqual(
+            (event.aggregate, event.aggregate_id, event.event_type),
+            ('business', res.data['id'], OutboxEvent.CREATED)
+        )
+        self.assertEqual(json.loads(event.payload)['name'], 'Shop')
+
+    def test_bulk_create_appends_event_per_object(self):
+        """Test creating a list of categories appends one event each"""
+        res = self.client.post(
+            CATEGORY_URL,
+            [{'name': 'Food'}, {'name': 'Drinks'}],
+            format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.events(), [
+            ('category', item['id'], OutboxEvent.CREATED)
+            for item in res.data
+        ])
+
+    def test_update_and_delete_append_events(self):
+        """Test updating and deleting a business append events in order"""
+        business = Business.objects.create(user=self.user, name='Shop')
+
+        self.client.patch(detail_url(business.id), {'name': 'Store'})
+        self.client.delete(detail_url(business.id))
+
+        self.assertEqual(self.events(), [
+            ('business', business.id, OutboxEvent.UPDATED),
+            ('business', business.id, OutboxEvent.DELETED),
+        ])
+        payloads = OutboxEvent.objects.order_by('id').values_list(
+            'payload',
+            flat=True
+        )
+        self.assertEqual(json.loads(payloads[0])['name'], 'Store')
+        self.assertEqual(json.loads(payloads[1]), {'id': business.id})
+
+    def test_failed_write_appends_no_event(self):
+        """Test that rejected writes append no events"""
+        category = Category.objects.create(user=self.user, name='Food')
+        business = Business.objects.create(user=self.user, name='Shop')
+
+        res = self.client.patch(
+            detail_url(business.id),
+            {'name': 'Store'},
+            HTTP_IF_MATCH='"0-0"'
+        )
+        self.client.post(CATEGORY_URL, {'name': ''})
+
+        self.assertEqual(res.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.assertFalse(OutboxEvent.objects.exists())
+        self.assertTrue(Category.objects.filter(id=category.id).exists())
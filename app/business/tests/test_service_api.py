@@ -29,12 +29,15 @@ class PublicServiceApiTests(TestCase):
 class PrivateSeviceApiTests(TestCase):
     """Test the private Service API"""
 
-    def setUp(self):
-        self.client = APIClient()
-        self.user = get_user_model().objects.create_user(
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
             'test@test.com',
             '12345'
         )
+
+    def setUp(self):
+        self.client = APIClient()
         self.client.force_authenticate(self.user)
     
     def test_retrieve_services_list(self):
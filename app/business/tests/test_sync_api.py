@@ -0,0 +1,193 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Business, Category, Service, Change
+
+
+SYNC_URL = reverse('business:sync')
+
+
+class PublicSyncApiTests(TestCase):
+    """Test unauthenticated sync API access"""
+
+    def test_login_required(self):
+        """Test that login is required for syncing"""
+        res = APIClient().get(SYNC_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateSyncApiTests(TestCase):
+    """Test the authorized sync API"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            'test@test.com',
+            '12345'
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def sync(self, cursor=0, **params):
+        res = self.client.get(SYNC_URL, {'cursor': cursor, **params})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data
+
+    def test_initial_sync_returns_everything(self):
+        """Test that syncing from scratch returns all objects"""
+        category = Category.objects.create(user=self.user, name='Category')
+        service = Service.objects.create(user=self.user, name='Service')
+        business = Business.objects.create(user=self.user, name='Business')
+        business.categories.add(category)
+
+        data = self.sync()
+
+        self.assertEqual(
+            data['categories'],
+            [{'id': category.id, 'name': 'Category'}]
+        )
+        self.assertEqual(
+            data['services'],
+            [{'id': service.id, 'name': 'Service'}]
+        )
+        self.assertEqual(data['businesses'][0]['categories'], [category.id])
+        self.assertFalse(data['more'])
+
+    def test_sync_returns_only_new_changes(self):
+        """Test that a warm sync only returns changes after the cursor"""
+        Category.objects.create(user=self.user, name='Old')
+        cursor = self.sync()['cursor']
+        category = Category.objects.create(user=self.user, name='New')
+
+        data = self.sync(cursor)
+
+        self.assertEqual(
+            data['categories'],
+            [{'id': category.id, 'name': 'New'}]
+        )
+        self.assertEqual(self.sync(data['cursor'])['categories'], [])
+
+    def test_sync_limited_to_user(self):
+        """Test that changes of other users are not returned"""
+        user2 = get_user_model().objects.create_user('test1@test.com', '12345')
+        Category.objects.create(user=user2, name='Other')
+
+        self.assertEqual(self.sync()['categories'], [])
+
+    def test_sync_returns_deletes(self):
+        """Test that deleted objects are returned as tombstones"""
+        business = Business.objects.create(user=self.user, name='Business')
+        cursor = self.sync()['cursor']
+        business_id = business.id
+        business.delete()
+
+        data = self.sync(cursor)
+
+        self.assertEqual(data['deleted']['businesses'], [business_id])
+        self.assertEqual(data['businesses'], [])
+
+    def test_relation_change_updates_business(self):
+        """Test that adding a category logs a business update"""
+        business = Business.objects.create(user=self.user, name='Business')
+        category = Category.objects.create(user=self.user, name='Category')
+        cursor = self.sync()['cursor']
+        business.categories.add(category)
+
+        data = self.sync(cursor)
+
+        self.assertEqual(data['businesses'][0]['categories'], [category.id])
+
+    def test_changes_are_compacted_on_write(self):
+        """Test that only the latest change per object is kept"""
+        category = Category.objects.create(user=self.user, name='Category')
+        for name in ('A', 'B', 'C'):
+            category.name = name
+            category.save()
+
+        self.assertEqual(Change.objects.filter(user=self.user).count(), 1)
+
+    def test_sync_paginates(self):
+        """Test that changes are returned in pages"""
+        for i in range(3):
+            Category.objects.create(user=self.user, name=f'Category {i}')
+
+        first = self.sync(limit=2)
+        second = self.sync(first['cursor'], limit=2)
+
+        self.assertTrue(first['more'])
+        self.assertEqual(len(first['categories']), 2)
+        self.assertFalse(second['more'])
+        self.assertEqual(len(second['categories']), 1)
+
+    def test_sync_resets_after_tombstones_compacted(self):
+        """Test that cursors older than compacted deletes must resync"""
+        category = Category.objects.create(user=self.user, name='Category')
+        cursor = self.sync()['cursor']
+        category.delete()
+        Change.objects.update(created=timezone.now() - timedelta(days=60))
+        call_command('compact_changes', stdout=StringIO())
+
+        data = self.sync(cursor)
+
+        self.assertTrue(data['reset'])
+        self.assertEqual(Change.objects.count(), 0)
+
+    @override_settings(SYNC_COMMIT_LAG=10)
+    def test_cursor_waits_for_uncommitted_changes(self):
+        """Test that a change committed after a higher id is not skipped"""
+        settled = timezone.now() - timedelta(seconds=60)
+        first = Category.objects.create(user=self.user, name='First')
+        second = Category.objects.create(user=self.user, name='Second')
+        Change.objects.update(created=settled)
+        # Writer A took the lower id but has not committed yet, while
+        # writer B committed the higher id just now
+        change_a = Change.objects.get(object_id=first.id)
+        change_a.delete()
+        Change.objects.filter(object_id=second.id).update(
+            created=timezone.now()
+        )
+
+        data = self.sync()
+
+        self.assertEqual(
+            data['categories'],
+            [{'id': second.id, 'name': 'Second'}]
+        )
+        self.assertEqual(data['cursor'], 0)
+        self.assertFalse(data['more'])
+
+        # Writer A commits
+        change_a.save()
+        data = self.sync(data['cursor'])
+
+        self.assertEqual(
+            [category['id'] for category in data['categories']],
+            [first.id, second.id]
+        )
+
+    @override_settings(SYNC_COMMIT_LAG=10)
+    def test_cursor_passes_settled_changes(self):
+        """Test that the cursor moves past changes older than the lag"""
+        old = Category.objects.create(user=self.user, name='Old')
+        Change.objects.update(created=timezone.now() - timedelta(seconds=60))
+        Category.objects.create(user=self.user, name='New')
+
+        data = self.sync()
+
+        self.assertEqual(
+            data['cursor'],
+            Change.objects.get(object_id=old.id).id
+        )
+        self.assertEqual(len(self.sync(data['cursor'])['categories']), 1)
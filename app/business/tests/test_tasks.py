@@ -0,0 +1,118 @@
+import json
+import tempfile
+from unittest.mock import patch
+
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Business, Job
+
+from ..tasks import collect_image
+
+
+def image_upload_url(business_id):
+    """Return url for business image"""
+    return reverse('business:business-upload-image', args=[business_id])
+
+
+class CollectImageTests(TestCase):
+    """Test deleting replaced business images"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            'user@test.com',
+            '12345'
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.business = Business.objects.create(user=self.user, name='One')
+
+    def tearDown(self):
+        self.business.refresh_from_db()
+        self.business.image.delete()
+
+    def upload(self, color):
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as ntf:
+            Image.new('RGB', (10, 10), color).save(ntf, format='JPEG')
+            ntf.seek(0)
+            return self.client.post(
+                image_upload_url(self.business.id),
+                {'image': ntf},
+                format='multipart'
+            )
+
+    def test_replacing_image_queues_collection(self):
+        """Test that uploading over an image queues the old one's deletion"""
+        self.upload('red')
+        self.assertFalse(Job.objects.exists())
+        self.business.refresh_from_db()
+        replaced = self.business.image.name
+
+        res = self.upload('blue')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        job = Job.objects.get()
+        self.assertEqual(job.name, 'business.collect_image')
+        self.assertEqual(json.loads(job.kwargs), {'image': replaced})
+
+        collect_image(**json.loads(job.kwargs))
+        self.assertFalse(default_storage.exists(replaced))
+
+    def test_collect_unreferenced_image(self):
+        """Test that an image no business refers to is deleted"""
+        name = default_storage.save(
+            'uploads/business/old.jpg',
+            ContentFile(b'x')
+        )
+
+        collect_image(name)
+
+        self.assertFalse(default_storage.exists(name))
+
+    def test_referenced_image_kept(self):
+        """Test that an image still in use is kept"""
+        name = default_storage.save(
+            'uploads/business/old.jpg',
+            ContentFile(b'x')
+        )
+        Business.objects.create(
+            user=self.user,
+            name='Two',
+            image=name
+        ).delete()
+
+        collect_image(name)
+
+        self.assertTrue(default_storage.exists(name))
+        default_storage.delete(name)
+
+    def test_image_attached_while_locking_kept(self):
+        """Test that references are checked once the file lock is held"""
+        name = default_storage.save(
+            'uploads/business/old.jpg',
+            ContentFile(b'x')
+        )
+
+        # An upload attaching the same content commits while the
+        # collector waits for the lock
+        def attach(locked):
+            Business.objects.create(user=self.user, name='Two', image=locked)
+
+        locking = patch('business.tasks.lock_stored_file', side_effect=attach)
+        with locking as lock:
+            collect_image(name)
+
+        lock.assert_called_once_with(name)
+        self.assertTrue(default_storage.exists(name))
+        default_storage.delete(name)
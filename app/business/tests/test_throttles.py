@@ -0,0 +1,245 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.exceptions import Throttled
+from rest_framework.test import APIClient, APIRequestFactory
+
+from core import metrics
+from core.models import Business
+
+from ..throttles import TokenBucketThrottle, concurrency_limit
+
+
+BUSINESS_URL = reverse('business:business-list')
+CATEGORIES_URL = reverse('business:category-list')
+
+
+def image_upload_url(business_id):
+    """Return url for business image"""
+    return reverse('business:business-upload-image', args=[business_id])
+
+
+class SampleThrottle(TokenBucketThrottle):
+    rate = '4/min'
+    scope = 'sample'
+
+    def get_cache_key(self, request, view):
+        return 'throttle_sample'
+
+
+class TokenBucketThrottleTests(TestCase):
+    """Test the token bucket throttle"""
+
+    def setUp(self):
+        cache.clear()
+        self.request = APIRequestFactory().post('/')
+
+    def allow(self, now):
+        throttle = SampleThrottle()
+        # The cache expires keys on the same clock
+        with patch.object(throttle, 'timer', return_value=now), \
+                patch('time.time', return_value=now):
+            allowed = throttle.allow_request(self.request, None)
+        self.wait = None if allowed else throttle.wait()
+        return allowed
+
+    def test_burst_up_to_rate_allowed(self):
+        """Test that a full bucket allows a burst of the rate"""
+        results = [self.allow(600) for _ in range(4)]
+
+        self.assertTrue(all(results))
+        self.assertFalse(self.allow(600))
+        self.assertEqual(self.wait, 15)
+
+    def test_tokens_refill_over_time(self):
+        """Test that one token is added per rate interval"""
+        for _ in range(4):
+            self.allow(600)
+
+        self.assertFalse(self.allow(614))
+        self.assertTrue(self.allow(615))
+        self.assertFalse(self.allow(616))
+
+    def test_rejected_requests_take_no_token(self):
+        """Test that rejected requests do not delay the next token"""
+        for _ in range(4):
+            self.allow(600)
+        for second in range(600, 615):
+            self.assertFalse(self.allow(second))
+
+        self.assertTrue(self.allow(615))
+
+    def test_idle_bucket_is_full(self):
+        """Test that a bucket idle for a period allows a full burst again"""
+        for _ in range(4):
+            self.allow(600)
+
+        results = [self.allow(700) for _ in range(4)]
+
+        self.assertTrue(all(results))
+        self.assertFalse(self.allow(700))
+
+    def test_sustained_load_keeps_bucket_empty(self):
+        """Test that a bucket drained for longer than its period stays so"""
+        for _ in range(4):
+            self.allow(600)
+
+        for second in range(615, 915, 15):
+            self.assertTrue(self.allow(second))
+            self.assertFalse(self.allow(second))
+
+
+class ConcurrencyLimitTests(TestCase):
+    """Test the cap on requests in flight"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            'test@test.com',
+            '12345'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.request = APIRequestFactory().post('/')
+        self.request.user = self.user
+
+    def enter(self, now):
+        """Take a slot at `now`, returning a function that releases it"""
+        slot = concurrency_limit(self.request, 'uploads')
+        with patch('time.time', return_value=now):
+            slot.__enter__()
+
+        def release(at):
+            with patch('time.time', return_value=at):
+                slot.__exit__(None, None, None)
+
+        return release
+
+    @override_settings(
+        CONCURRENCY_LIMITS={'uploads': 1},
+        CONCURRENCY_SLOT_TIMEOUT=300
+    )
+    def test_slots_kept_while_in_use(self):
+        """Test that the counter lives on after each slot taken"""
+        self.enter(0)(1)
+        release = self.enter(290)
+
+        with self.assertRaises(Throttled):
+            self.enter(310)
+
+        release(320)
+        self.enter(330)(331)
+
+    @override_settings(
+        CONCURRENCY_LIMITS={'uploads': 1},
+        CONCURRENCY_SLOT_TIMEOUT=300
+    )
+    def test_release_after_expiry_frees_no_extra_slot(self):
+        """Test that releases never take the counter below zero"""
+        stale = self.enter(0)
+        release = self.enter(400)
+        stale(401)
+        release(402)
+
+        held = self.enter(410)
+        with self.assertRaises(Throttled):
+            self.enter(411)
+        held(412)
+
+
+@override_settings(
+    WRITE_THROTTLE_RATES={'business': '2/min', 'category': '1/min'},
+    CONCURRENCY_LIMITS={'business_upload_image': 1}
+)
+class WriteThrottleApiTests(TestCase):
+    """Test the per user limits of write endpoints"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            'test@test.com',
+            '12345'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_writes_over_rate_throttled(self):
+        """Test that writes over the rate get a 429 with Retry-After"""
+        for name in ('One', 'Two'):
+            res = self.client.post(BUSINESS_URL, {'name': name})
+            self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        res = self.client.post(BUSINESS_URL, {'name': 'Three'})
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(res['Retry-After'], '30')
+        self.assertEqual(Business.objects.count(), 2)
+        self.assertEqual(
+            metrics.read(['throttle.business.limited']),
+            {'throttle.business.limited': 1}
+        )
+
+    def test_reads_not_throttled(self):
+        """Test that reads take no tokens"""
+        for _ in range(3):
+            res = self.client.get(BUSINESS_URL)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        res = self.client.post(BUSINESS_URL, {'name': 'One'})
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+    def test_buckets_per_user_and_scope(self):
+        """Test that users and endpoints have their own buckets"""
+        other = get_user_model().objects.create_user('other@test.com', '12345')
+        self.client.post(CATEGORIES_URL, {'name': 'Food'})
+
+        res = self.client.post(CATEGORIES_URL, {'name': 'Drinks'})
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+        res = self.client.post(BUSINESS_URL, {'name': 'One'})
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        self.client.force_authenticate(other)
+        res = self.client.post(CATEGORIES_URL, {'name': 'Drinks'})
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+    def test_concurrent_uploads_capped(self):
+        """Test that uploads over the concurrency limit are throttled"""
+        business = Business.objects.create(user=self.user, name='One')
+        key = f'concurrency_business_upload_image_{self.user.pk}'
+        cache.set(key, 1)
+
+        res = self.client.post(
+            image_upload_url(business.id),
+            {'image': 'notimage'},
+            format='multipart'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(res['Retry-After'], '1')
+        self.assertEqual(cache.get(key), 1)
+
+    def test_upload_frees_its_slot(self):
+        """Test that finished uploads release their concurrency slot"""
+        business = Business.objects.create(user=self.user, name='One')
+
+        for _ in range(2):
+            res = self.client.post(
+                image_upload_url(business.id),
+                {'image': 'notimage'},
+                format='multipart'
+            )
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        key = f'concurrency_business_upload_image_{self.user.pk}'
+        self.assertEqual(cache.get(key), 0)
@@ -0,0 +1,102 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework.test import APIClient
+
+from core.models import AuthToken, Business, Category, Service
+from core.tests.factories import create_users
+
+from ..warming import warm_user
+
+
+BUSINESS_URL = reverse('business:business-list')
+
+
+def detail_url(business_id):
+    """Return business detail url"""
+    return reverse('business:business-detail', args=[business_id])
+
+
+class WarmCacheTests(TestCase):
+    """Test preloading the caches of users"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.other, cls.idle = create_users(3)
+        for user in (cls.user, cls.other, cls.idle):
+            category = Category.objects.create(user=user, name='Food')
+            service = Service.objects.create(user=user, name='Delivery')
+            for i in range(3):
+                business = Business.objects.create(user=user, name=f'Shop {i}')
+                business.categories.add(category)
+                business.services.add(service)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_warmed_lists_served_from_cache(self):
+        """Test that warmed representations match the endpoints' own"""
+        self.assertEqual(warm_user(self.user.pk), 6)
+        business = Business.objects.for_user(self.user).first()
+
+        with self.assertNumQueries(1):
+            warm = self.client.get(BUSINESS_URL)
+        with self.assertNumQueries(1):
+            warm_detail = self.client.get(detail_url(business.id))
+        cache.clear()
+        cold = self.client.get(BUSINESS_URL)
+        cold_detail = self.client.get(detail_url(business.id))
+
+        self.assertEqual(warm.data, cold.data)
+        self.assertEqual(warm_detail.data, cold_detail.data)
+
+    def test_cached_representations_not_serialized_again(self):
+        """Test that only representations missing from the cache are built"""
+        self.client.get(BUSINESS_URL)
+
+        self.assertEqual(warm_user(self.user.pk), 3)
+        self.assertEqual(warm_user(self.user.pk), 0)
+
+    def test_command_warms_most_active_users_first(self):
+        """Test that users are warmed by their token's last use"""
+        now = timezone.now()
+        AuthToken.objects.create(
+            user=self.user,
+            last_used=now - timedelta(hours=1)
+        )
+        AuthToken.objects.create(user=self.other, last_used=now)
+        AuthToken.objects.create(
+            user=self.idle,
+            last_used=now - AuthToken.idle_timeout() - timedelta(hours=1)
+        )
+        out = StringIO()
+
+        call_command('warm_cache', users=1, concurrency=1, stdout=out)
+
+        self.assertIn(
+            'Warmed 1 users, serialized 6 businesses',
+            out.getvalue()
+        )
+        self.assertEqual(warm_user(self.other.pk), 0)
+        self.assertEqual(warm_user(self.user.pk), 6)
+
+    def test_command_skips_users_without_live_tokens(self):
+        """Test that users who must log in again are not warmed"""
+        expired = AuthToken.idle_timeout() + timedelta(hours=1)
+        AuthToken.objects.create(
+            user=self.idle,
+            last_used=timezone.now() - expired
+        )
+        out = StringIO()
+
+        call_command('warm_cache', concurrency=1, stdout=out)
+
+        self.assertIn('Warmed 0 users', out.getvalue())
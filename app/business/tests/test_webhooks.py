@@ -0,0 +1,312 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Business, OutboxEvent, WebhookSubscription
+from core.tests.factories import create_users
+
+from ..webhooks import WebhookDispatcher, coalesce
+
+
+WEBHOOKS_URL = reverse('business:webhooksubscription-list')
+
+PUBLIC_ADDRESS = [(2, 1, 6, '', ('93.184.216.34', 443))]
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Answer webhook requests with the server's next status"""
+
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        with server.lock:
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        time.sleep(server.delay)
+        with server.lock:
+            server.in_flight -= 1
+            server.received.append((self.path, json.loads(body)))
+            code = server.statuses.pop(0) if server.statuses else 204
+        self.send_response(code)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stand_in(testcase, statuses=(), delay=0):
+    """Start a local webhook endpoint stopped when the test ends"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+    server.lock = threading.Lock()
+    server.statuses = list(statuses)
+    server.delay = delay
+    server.received = []
+    server.in_flight = server.max_in_flight = 0
+    threading.Thread(
+        target=server.serve_forever,
+        kwargs={'poll_interval': 0.05},
+        daemon=True
+    ).start()
+    testcase.addCleanup(server.server_close)
+    testcase.addCleanup(server.shutdown)
+
+    return server, f'http://127.0.0.1:{server.server_port}'
+
+
+def message(business, event_type):
+    """Return the outbox message of a business change"""
+    return {
+        'aggregate': 'business',
+        'aggregate_id': business.id,
+        'user': business.user_id,
+        'type': event_type,
+    }
+
+
+class WebhookSubscriptionApiTests(TestCase):
+    """Test the webhook subscription API"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.other = create_users(2)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        resolver = patch(
+            'core.outbox.socket.getaddrinfo',
+            return_value=PUBLIC_ADDRESS
+        )
+        self.getaddrinfo = resolver.start()
+        self.addCleanup(resolver.stop)
+
+    def test_create_subscription(self):
+        """Test creating a subscription hides its secret"""
+        res = self.client.post(WEBHOOKS_URL, {
+            'url': 'https://example.com/hook',
+            'secret': 's3cret',
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn('secret', res.data)
+        subscription = WebhookSubscription.objects.get()
+        self.assertEqual(subscription.user, self.user)
+        self.assertEqual(subscription.secret, 's3cret')
+
+    def test_non_public_urls_rejected(self):
+        """Test subscriptions must use https to a public address"""
+        res = self.client.post(WEBHOOKS_URL, {'url': 'http://example.com/'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        for address in ('10.0.0.5', '127.0.0.1', '169.254.169.254', '::1'):
+            self.getaddrinfo.return_value = [(2, 1, 6, '', (address, 443))]
+            res = self.client.post(WEBHOOKS_URL, {
+                'url': 'https://internal.example.com/hook',
+            })
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('non-public address', str(res.data['url']))
+
+        self.assertFalse(WebhookSubscription.objects.exists())
+
+    @override_settings(WEBHOOK_PUBLIC_ONLY=False)
+    def test_any_url_allowed_when_not_public_only(self):
+        """Test the address check can be turned off for development"""
+        res = self.client.post(WEBHOOKS_URL, {'url': 'http://127.0.0.1/'})
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+    def test_subscriptions_limited_to_user(self):
+        """Test only the user's subscriptions are listed"""
+        WebhookSubscription.objects.create(
+            user=self.other,
+            url='https://example.com/other'
+        )
+        mine = WebhookSubscription.objects.create(
+            user=self.user,
+            url='https://example.com/mine'
+        )
+
+        res = self.client.get(WEBHOOKS_URL)
+
+        self.assertEqual([item['id'] for item in res.data], [mine.id])
+
+    def test_reactivating_resets_failures(self):
+        """Test reactivating a subscription clears its failure count"""
+        subscription = WebhookSubscription.objects.create(
+            user=self.user,
+            url='https://example.com/hook',
+            active=False,
+            failures=20
+        )
+        url = reverse(
+            'business:webhooksubscription-detail',
+            args=[subscription.id]
+        )
+
+        self.client.patch(url, {'active': True})
+
+        subscription.refresh_from_db()
+        self.assertTrue(subscription.active)
+        self.assertEqual(subscription.failures, 0)
+
+
+class WebhookDispatcherTests(TestCase):
+    """Test delivering business changes to webhook subscriptions"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.other = create_users(2)
+
+    def dispatcher(self, **kwargs):
+        return WebhookDispatcher(**dict(
+            {'workers': 4, 'backoff': 0, 'timeout': 5, 'public_only': False},
+            **kwargs
+        ))
+
+    def test_coalesce_keeps_latest_change(self):
+        """Test changes to one business are merged into the latest"""
+        first = Business.objects.create(user=self.user, name='First')
+        second = Business.objects.create(user=self.user, name='Second')
+
+        changes = coalesce([
+            message(first, OutboxEvent.CREATED),
+            message(second, OutboxEvent.UPDATED),
+            message(first, OutboxEvent.UPDATED),
+            {'aggregate': 'category', 'aggregate_id': 1, 'user': 1,
+             'type': OutboxEvent.CREATED},
+            message(second, OutboxEvent.DELETED),
+        ])
+
+        self.assertEqual(list(changes.items()), [
+            (first.id, (self.user.id, OutboxEvent.CREATED)),
+            (second.id, (self.user.id, OutboxEvent.DELETED)),
+        ])
+
+    def test_send_delivers_current_state_once(self):
+        """Test each subscription gets one request with current state"""
+        server, base = start_stand_in(self)
+        WebhookSubscription.objects.create(user=self.user, url=f'{base}/a')
+        WebhookSubscription.objects.create(user=self.other, url=f'{base}/b')
+        business = Business.objects.create(user=self.user, name='Old')
+        business.name = 'New'
+        business.save()
+
+        self.dispatcher().send([
+            message(business, OutboxEvent.CREATED),
+            message(business, OutboxEvent.UPDATED),
+        ])
+
+        self.assertEqual(len(server.received), 1)
+        path, body = server.received[0]
+        self.assertEqual(path, '/a')
+        self.assertEqual(len(body['events']), 1)
+        self.assertEqual(body['events'][0]['type'], OutboxEvent.CREATED)
+        self.assertEqual(body['events'][0]['business']['name'], 'New')
+
+    def test_deleted_business_sends_id_only(self):
+        """Test a deleted business is sent as a deletion"""
+        server, base = start_stand_in(self)
+        WebhookSubscription.objects.create(user=self.user, url=base)
+        business = Business.objects.create(user=self.user, name='Shop')
+        business.delete()
+
+        self.dispatcher().send([message(business, OutboxEvent.UPDATED)])
+
+        self.assertEqual(server.received[0][1]['events'], [
+            {'type': OutboxEvent.DELETED, 'business': {'id': business.id}}
+        ])
+
+    def test_endpoint_concurrency_limited(self):
+        """Test requests in flight to one endpoint are bounded"""
+        server, base = start_stand_in(self, delay=0.05)
+        users = create_users(6, prefix='hook')
+        changes = []
+        for user in users:
+            WebhookSubscription.objects.create(user=user, url=base)
+            business = Business.objects.create(user=user, name='Shop')
+            changes.append(message(business, OutboxEvent.CREATED))
+
+        self.dispatcher(endpoint_concurrency=2).send(changes)
+
+        self.assertEqual(len(server.received), 6)
+        self.assertLessEqual(server.max_in_flight, 2)
+
+    def test_retries_with_backoff(self):
+        """Test failed requests are retried until they succeed"""
+        server, base = start_stand_in(self, statuses=[503, 500])
+        subscription = WebhookSubscription.objects.create(
+            user=self.user,
+            url=base,
+            failures=3
+        )
+        business = Business.objects.create(user=self.user, name='Shop')
+
+        self.dispatcher(max_attempts=3).send(
+            [message(business, OutboxEvent.CREATED)]
+        )
+
+        self.assertEqual(len(server.received), 3)
+        subscription.refresh_from_db()
+        self.assertEqual(subscription.failures, 0)
+
+    @override_settings(WEBHOOK_MAX_FAILURES=2)
+    def test_failing_subscription_deactivated(self):
+        """Test subscriptions are deactivated after repeated failures"""
+        server, base = start_stand_in(self, statuses=[400, 400])
+        subscription = WebhookSubscription.objects.create(
+            user=self.user,
+            url=base
+        )
+        business = Business.objects.create(user=self.user, name='Shop')
+        dispatcher = self.dispatcher(max_attempts=3)
+
+        for _ in range(2):
+            dispatcher.send([message(business, OutboxEvent.UPDATED)])
+
+        # Client errors are not retried
+        self.assertEqual(len(server.received), 2)
+        subscription.refresh_from_db()
+        self.assertEqual(subscription.failures, 2)
+        self.assertFalse(subscription.active)
+
+    def test_non_public_address_not_delivered(self):
+        """Test deliveries re-check the address and are not retried"""
+        server, base = start_stand_in(self)
+        subscription = WebhookSubscription.objects.create(
+            user=self.user,
+            url=base.replace('http:', 'https:')
+        )
+        business = Business.objects.create(user=self.user, name='Shop')
+
+        self.dispatcher(max_attempts=3, public_only=True).send(
+            [message(business, OutboxEvent.CREATED)]
+        )
+
+        self.assertEqual(server.received, [])
+        subscription.refresh_from_db()
+        self.assertEqual(subscription.failures, 1)
+
+    def test_batch_time_bounded(self):
+        """Test slow endpoints cannot hold a batch past its timeout"""
+        server, base = start_stand_in(self, delay=1)
+        subscription = WebhookSubscription.objects.create(
+            user=self.user,
+            url=base
+        )
+        business = Business.objects.create(user=self.user, name='Shop')
+        dispatcher = self.dispatcher(max_attempts=5, batch_timeout=0.2)
+
+        start = time.monotonic()
+        dispatcher.send([message(business, OutboxEvent.CREATED)])
+
+        self.assertLess(time.monotonic() - start, 0.8)
+        subscription.refresh_from_db()
+        self.assertEqual(subscription.failures, 1)
@@ -0,0 +1,139 @@
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+
+from rest_framework.exceptions import Throttled
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.throttling import SimpleRateThrottle
+
+from core import metrics
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    """Throttle requests with a token bucket kept in one cache counter
+
+    A rate of N per period refills N tokens per period into a bucket
+    holding N, so bursts up to N are allowed. The bucket is stored as the
+    time in ms at which it will be full again, which requests push
+    forward with an atomic increment; rejected requests take their
+    increment back. A missing counter reads as a full bucket, so allowed
+    requests keep it cached until that time. Concurrent requests to an
+    idle bucket may each restart it, letting a few extra requests through.
+    """
+
+    def allow_request(self, request, view):
+        """Take a token, or return False when the bucket is empty"""
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        now = int(self.timer() * 1000)
+        interval = max(int(self.duration * 1000 / self.num_requests), 1)
+        tolerance = self.duration * 1000 - interval
+
+        self.cache.add(self.key, now, self.duration)
+        try:
+            full_at = self.cache.incr(self.key, interval)
+        except ValueError:
+            full_at = None
+        if full_at is None or full_at - interval < now:
+            full_at = now + interval
+            self.cache.set(self.key, full_at, self.duration)
+
+        excess = full_at - interval - now - tolerance
+        if excess <= 0:
+            self.cache.touch(self.key, (full_at - now) // 1000 + 1)
+            return True
+
+        try:
+            self.cache.decr(self.key, interval)
+        except ValueError:
+            pass
+        self.wait_seconds = excess / 1000
+        return self.throttle_failure()
+
+    def throttle_failure(self):
+        metrics.incr(f'throttle.{self.scope}.limited')
+        return False
+
+    def wait(self):
+        """Return the seconds until the next token is added"""
+        return self.wait_seconds
+
+
+class WriteRateThrottle(TokenBucketThrottle):
+    """Limit each user's write requests per endpoint
+
+    Writes to an action with a rate in WRITE_THROTTLE_RATES under
+    `<throttle_scope>_<action>`, such as `business_upload_image`, take
+    tokens from their own bucket; other writes share the view's
+    `<throttle_scope>` bucket. Views without a rate are not throttled.
+    """
+
+    def __init__(self):
+        # The rate depends on the view, so it is read in allow_request
+        pass
+
+    def allow_request(self, request, view):
+        if request.method in SAFE_METHODS or not request.user.is_authenticated:
+            return True
+
+        rates = settings.WRITE_THROTTLE_RATES
+        scope = getattr(view, 'throttle_scope', None)
+        action_scope = f'{scope}_{getattr(view, "action", None)}'
+        self.scope = action_scope if action_scope in rates else scope
+        self.rate = rates.get(self.scope)
+        if self.rate is None:
+            return True
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+
+        return super().allow_request(request, view)
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {
+            'scope': self.scope,
+            'ident': request.user.pk
+        }
+
+
+@contextmanager
+def concurrency_limit(request, scope):
+    """Cap the requests a user has in flight for `scope`
+
+    The cap comes from CONCURRENCY_LIMITS; requests over it are throttled.
+    Slots held by workers that died are freed when their counter expires,
+    CONCURRENCY_SLOT_TIMEOUT seconds after the last request took a slot.
+    Releases never take the counter below zero, so slots released after
+    it expired are not handed out twice.
+    """
+    limit = settings.CONCURRENCY_LIMITS.get(scope)
+    if limit is None:
+        yield
+        return
+
+    key = f'concurrency_{scope}_{request.user.pk}'
+    timeout = settings.CONCURRENCY_SLOT_TIMEOUT
+    cache.add(key, 0, timeout)
+    try:
+        in_flight = cache.incr(key)
+        cache.touch(key, timeout)
+    except ValueError:
+        cache.set(key, 1, timeout)
+        in_flight = 1
+
+    try:
+        if in_flight > limit:
+            metrics.incr(f'throttle.{scope}.limited')
+            raise Throttled(wait=1)
+        yield
+    finally:
+        try:
+            in_flight = cache.decr(key)
+            if in_flight < 0:
+                cache.incr(key, -in_flight)
+        except ValueError:
+            pass
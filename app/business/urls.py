@@ -8,9 +8,11 @@ router = DefaultRouter()
 router.register('categories', views.CategoryViewSet)
 router.register('services', views.ServiceViewSet)
 router.register('business', views.BusinessViewSet)
+router.register('webhooks', views.WebhookSubscriptionViewSet)
 
 app_name = 'business'
 
 urlpatterns = [
+    path('sync/', views.SyncView.as_view(), name='sync'),
     path('', include(router.urls))
 ]
@@ -1,68 +1,366 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Prefetch
+from django.http import Http404
+from django.utils import timezone
+from django.utils.http import parse_etags
+
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
 from rest_framework import viewsets, mixins, status
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.views import APIView
+
+from core import jobs
+from core.exceptions import PreconditionFailed
+from core.models import Category, Service, Business, Change, SyncHorizon
+from core.models import BusinessListing, OutboxEvent, WebhookSubscription
+from core.models import BusinessCategory, BusinessService
+from core.models import business_image_file_path
+from core.querycache import business_id_cache, business_repr_cache
+from core.storage import content_addressed_name, lock_stored_file
+from user.authentication import ExpiringTokenAuthentication
 
-from core.models import Category, Service, Business
 from . import serializers
+from .throttles import WriteRateThrottle, concurrency_limit
+
+
+class TenantScopedMixin:
+    """Limit querysets to the authenticated user's rows
+
+    Subclasses build on `super().get_queryset()`, so no query can miss
+    the user filter that the (user, name, id) indexes are built for.
+    """
+
+    def get_queryset(self):
+        """Return objects for the current authenticated user only"""
+        return self.queryset.for_user(self.request.user)
 
 
-class BaseBusinessAttrViewSet(viewsets.GenericViewSet, mixins.ListModelMixin, mixins.CreateModelMixin):
+class OutboxMixin:
+    """Append an outbox event in the same transaction as each write"""
+
+    def append_events(self, event_type, serializer):
+        """Append events carrying the serializer's output for its objects"""
+        instances, payloads = serializer.instance, serializer.data
+        if not isinstance(instances, list):
+            instances, payloads = [instances], [payloads]
+        OutboxEvent.objects.append(event_type, instances, payloads)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            super().perform_destroy(instance)
+            OutboxEvent.objects.append(
+                OutboxEvent.DELETED,
+                [instance],
+                [{'id': instance.pk}]
+            )
+
+
+class BaseBusinessAttrViewSet(OutboxMixin, TenantScopedMixin,
+                              viewsets.GenericViewSet,
+                              mixins.ListModelMixin,
+                              mixins.CreateModelMixin):
     """Base viewset for business attributes"""
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (ExpiringTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    throttle_classes = (WriteRateThrottle,)
 
     def get_queryset(self):
         """Return objects for the current authenticated user only"""
         assigned_only = bool(self.request.query_params.get('assigned_only'))
-        queryset = self.queryset
+        queryset = super().get_queryset()
         if assigned_only:
-            queryset = queryset.filter(business__isnull=False)
+            queryset = queryset.filter(
+                business__isnull=False,
+                business__deleted_at__isnull=True
+            ).distinct()
+
+        return queryset
 
-        return queryset.filter(user=self.request.user).order_by('-name')
+    def get_serializer(self, *args, **kwargs):
+        """Return a list serializer when a list of objects is posted"""
+        if isinstance(kwargs.get('data'), list):
+            kwargs['many'] = True
+
+        return super().get_serializer(*args, **kwargs)
 
     def perform_create(self, serializer):
         """Create a new category"""
-        serializer.save(user=self.request.user)
+        with transaction.atomic():
+            serializer.save(user=self.request.user)
+            self.append_events(OutboxEvent.CREATED, serializer)
 
 
 class CategoryViewSet(BaseBusinessAttrViewSet):
     """Manage categories in the database"""
     queryset = Category.objects.all()
     serializer_class = serializers.CategorySerializer
+    throttle_scope = 'category'
 
 
 class ServiceViewSet(BaseBusinessAttrViewSet):
     """Manage services in the database"""
     queryset = Service.objects.all()
     serializer_class = serializers.ServiceSerializer
+    throttle_scope = 'service'
 
 
-class BusinessViewSet(viewsets.ModelViewSet):
+class BusinessViewSet(OutboxMixin, TenantScopedMixin, viewsets.ModelViewSet):
     """Manage business in the database"""
     serializer_class = serializers.BusinessSerializer
     queryset = Business.objects.all()
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (ExpiringTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    throttle_classes = (WriteRateThrottle,)
+    throttle_scope = 'business'
 
     def _params_to_ints(self, qs):
         """Convert a list of string IDs to a list of integeres"""
         return [int(str_id) for str_id in qs.split(',')]
 
+    def _params_to_ids(self, qs):
+        """Convert a list of string IDs to sorted, unique integers"""
+        return sorted(set(self._params_to_ints(qs)))
+
+    def _params_to_floats(self, qs, count):
+        """Convert a comma separated string to `count` floats"""
+        try:
+            values = [float(value) for value in qs.split(',')]
+        except ValueError:
+            values = []
+        if len(values) != count:
+            raise ValidationError(f'Expected {count} comma separated numbers.')
+
+        return values
+
+    def _params_to_names(self, qs):
+        """Convert a comma separated string to a list of names"""
+        return [name.strip() for name in qs.split(',') if name.strip()]
+
+    def _requested_fields(self):
+        """Return the field names requested with `fields`, or None for all"""
+        fields = self.request.query_params.get('fields')
+        if fields is None:
+            return None
+
+        return self._params_to_names(fields)
+
+    def _requested_expand(self):
+        """Return the relation names requested with `expand`"""
+        if self.action == 'retrieve':
+            return [field.name for field in Business._meta.many_to_many]
+
+        return self._params_to_names(
+            self.request.query_params.get('expand', '')
+        )
+
+    def _shape_queryset(self, queryset):
+        """Load only the columns and relations the response will render"""
+        serializer_class = self.get_serializer_class()
+        fields = self._requested_fields()
+        if fields is None:
+            fields = serializer_class.Meta.fields
+        expand = self._requested_expand()
+
+        concrete = {field.name for field in Business._meta.concrete_fields}
+        queryset = queryset.only(
+            'id', *[name for name in fields if name in concrete]
+        )
+
+        for name, related_class in serializer_class.expandable_fields.items():
+            if name not in fields:
+                continue
+            related_fields = ['id']
+            if name in expand:
+                related_fields = related_class.Meta.fields
+            related_model = related_class.Meta.model
+            queryset = queryset.prefetch_related(Prefetch(
+                name,
+                queryset=related_model.objects.only(*related_fields)
+            ))
+
+        return queryset
+
+    def _from_listing(self):
+        """Return whether the list is read from the BusinessListing table"""
+        return settings.BUSINESS_LISTING and self.action == 'list'
+
+    def _relation_filters(self):
+        """Return the canonical `categories` and `services` id filters"""
+        params = self.request.query_params
+        return tuple(
+            tuple(self._params_to_ids(params[name]))
+            if params.get(name) else ()
+            for name in ('categories', 'services')
+        )
+
+    def _base_queryset(self):
+        """Return the user's businesses, or their listings when enabled"""
+        if self._from_listing():
+            return BusinessListing.objects.for_user(self.request.user)
+
+        return super().get_queryset()
+
+    def _filter_relations(self, queryset):
+        """Apply the `categories` and `services` filters
+
+        Businesses are matched through a subquery on the relation table
+        rather than a join, so one with several of the ids is returned
+        once on every path, including `near` and `bbox`.
+        """
+        category_ids, service_ids = self._relation_filters()
+        if self._from_listing():
+            if category_ids:
+                queryset = queryset.filter(category_ids__overlap=category_ids)
+            if service_ids:
+                queryset = queryset.filter(service_ids__overlap=service_ids)
+            return queryset
+
+        relations = (
+            (BusinessCategory, 'category_id__in', category_ids),
+            (BusinessService, 'service_id__in', service_ids),
+        )
+        for model, lookup, ids in relations:
+            if ids:
+                queryset = queryset.filter(id__in=model.objects.filter(
+                    **{lookup: ids}
+                ).values('business_id'))
+
+        return queryset
+
+    def _shape(self, queryset):
+        if self.request.method == 'GET' and not self._from_listing():
+            queryset = self._shape_queryset(queryset)
+
+        return queryset
+
     def get_queryset(self):
         """Return objects for the current authenticated user only"""
-        categories = self.request.query_params.get('categories')
-        services = self.request.query_params.get('services')
-        queryset = self.queryset
-        if categories:
-            category_ids = self._params_to_ints(categories)
-            queryset = queryset.filter(categories__id__in=category_ids)
-        if services:
-            service_ids = self._params_to_ints(services)
-            queryset = queryset.filter(services__id__in=service_ids)
-        
-        return queryset.filter(user=self.request.user).order_by('-name')
+        queryset = self._filter_relations(self._base_queryset())
+        queryset = self._filter_location(queryset)
+
+        return self._shape(queryset)
+
+    def list(self, request, *args, **kwargs):
+        """List businesses from cached ids and representations
+
+        The ordered ids matching `categories` and `services` are cached
+        per user, so repeated filters skip the relation joins. Full
+        representations are cached, so without `fields` or `expand` only
+        businesses whose current version is not cached are loaded and
+        serialized.
+        """
+        params = request.query_params
+        filters = self._relation_filters()
+        full = (
+            self._requested_fields() is None
+            and not self._requested_expand()
+        )
+        if 'near' in params or 'bbox' in params or not (full or any(filters)):
+            return super().list(request, *args, **kwargs)
+
+        if any(filters):
+            pairs = business_id_cache.get_or_set(
+                request.user.pk,
+                filters,
+                lambda: list(
+                    self._filter_relations(self._base_queryset())
+                    .values_list('id', 'version')
+                )
+            )
+        else:
+            pairs = list(self._base_queryset().values_list('id', 'version'))
+
+        if not full:
+            ids = [pk for pk, _ in pairs]
+            rows = self._shape(self._base_queryset()).in_bulk(ids)
+            serializer = self.get_serializer(
+                [rows[pk] for pk in ids if pk in rows],
+                many=True
+            )
+            return Response(serializer.data)
+
+        return Response(
+            [data for _, data in self._representations('list', pairs)]
+        )
+
+    def _representations(self, variant, pairs):
+        """Return the (version, data) of businesses given as (id, version)
+
+        Cached representations are read with one multi-get. Only the
+        misses are loaded and serialized, then cached at the version they
+        were read at.
+        """
+        found = business_repr_cache.get_many(variant, pairs)
+        representations = {
+            pk: (version, found[pk]) for pk, version in pairs if pk in found
+        }
+
+        missing = [pk for pk, _ in pairs if pk not in found]
+        if missing:
+            queryset = self._base_queryset()
+            if not self._from_listing():
+                queryset = queryset.prefetch_related(
+                    *[field.name for field in Business._meta.many_to_many]
+                )
+            rows = list(queryset.in_bulk(missing).values())
+            data = self.get_serializer_class()(
+                rows,
+                many=True,
+                context=self.get_serializer_context()
+            ).data
+            fresh = {
+                (row.pk, row.version): item
+                for row, item in zip(rows, data)
+            }
+            business_repr_cache.set_many(variant, fresh)
+            representations.update(
+                (pk, (version, item)) for (pk, version), item in fresh.items()
+            )
+
+        return [
+            representations[pk] for pk, _ in pairs if pk in representations
+        ]
+
+    def _filter_location(self, queryset):
+        """Apply the `near`/`radius` and `bbox` filters, nearest first"""
+        params = self.request.query_params
+        bbox = params.get('bbox')
+        near = params.get('near')
+        if bbox:
+            corners = self._params_to_floats(bbox, 4)
+            min_lng, min_lat, max_lng, max_lat = corners
+            if min_lat > max_lat or min_lng > max_lng:
+                raise ValidationError(
+                    'bbox must be min_lng,min_lat,max_lng,max_lat.'
+                )
+            queryset = queryset.within_bbox(
+                min_lat, min_lng, max_lat, max_lng
+            )
+            if not near:
+                queryset = queryset.by_distance(
+                    (min_lat + max_lat) / 2,
+                    (min_lng + max_lng) / 2
+                )
+        if near:
+            latitude, longitude = self._params_to_floats(near, 2)
+            radius, = self._params_to_floats(
+                params.get('radius', str(settings.GEO_DEFAULT_RADIUS_KM)), 1
+            )
+            max_radius = settings.GEO_MAX_RADIUS_KM
+            if not 0 < radius <= max_radius:
+                raise ValidationError(
+                    f'radius must be between 0 and {max_radius} km.'
+                )
+            queryset = queryset.near(latitude, longitude, radius)
+
+        return queryset
 
     def get_serializer_class(self):
         """Return appropriate serializer class"""
@@ -70,31 +368,281 @@ class BusinessViewSet(viewsets.ModelViewSet):
             return serializers.BusinessDetailSerializer
         elif self.action == 'upload_image':
             return serializers.BusinessImageSerializer
+        elif self.action in ('upload_url', 'confirm_upload'):
+            return serializers.DirectUploadSerializer
 
         return self.serializer_class
 
+    def get_serializer(self, *args, **kwargs):
+        """Return a serializer shaped by the `fields` and `expand` params"""
+        if self.request.method == 'GET':
+            kwargs.setdefault('fields', self._requested_fields())
+            kwargs.setdefault('expand', self._requested_expand())
+
+        return super().get_serializer(*args, **kwargs)
+
     def perform_create(self, serializer):
         """Create a new business"""
-        serializer.save(user=self.request.user)
+        with transaction.atomic():
+            serializer.save(user=self.request.user)
+            self.append_events(OutboxEvent.CREATED, serializer)
 
-    @action(methods=['POST'], detail=True, url_path='upload-image')
-    def upload_image(self, request, pk=None):
-        """Upload an image to a business"""
+    def _expected_version(self, business):
+        """Return the version required by If-Match, or None without one"""
+        if_match = self.request.META.get('HTTP_IF_MATCH')
+        if not if_match or if_match.strip() == '*':
+            return None
+
+        # Compression weakens entity tags, their value still identifies
+        # the version
+        tags = [tag[2:] if tag.startswith('W/') else tag
+                for tag in parse_etags(if_match)]
+        if business.etag not in tags:
+            raise PreconditionFailed()
+
+        return business.version
+
+    def retrieve(self, request, *args, **kwargs):
+        """Return a business with the ETag of its version"""
+        if self._requested_fields() is not None:
+            business = self.get_object()
+            serializer = self.get_serializer(business)
+            return Response(serializer.data, headers={'ETag': business.etag})
+
+        pk, version = get_object_or_404(
+            self._base_queryset().values_list('id', 'version'),
+            pk=self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+        )
+        representations = self._representations('detail', [(pk, version)])
+        if not representations:
+            raise Http404
+        version, data = representations[0]
+
+        return Response(
+            data,
+            headers={'ETag': Business(id=pk, version=version).etag}
+        )
+
+    def update(self, request, *args, **kwargs):
+        """Update a business, honouring If-Match, and return its new ETag"""
+        partial = kwargs.pop('partial', False)
         business = self.get_object()
         serializer = self.get_serializer(
             business,
-            data=request.data
+            data=request.data,
+            partial=partial
         )
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            serializer.save(expected_version=self._expected_version(business))
+            self.append_events(OutboxEvent.UPDATED, serializer)
+
+        return Response(serializer.data, headers={'ETag': business.etag})
 
-        if serializer.is_valid():
-            serializer.save()
-            return Response(
-                serializer.data,
-                status=status.HTTP_200_OK
+    @action(methods=['POST'], detail=True, url_path='upload-image')
+    def upload_image(self, request, pk=None):
+        """Upload an image to a business"""
+        business = self.get_object()
+        replaced = business.image.name
+        # The slot is held while the upload is read and stored
+        with concurrency_limit(request, 'business_upload_image'):
+            serializer = self.get_serializer(
+                business,
+                data=request.data
             )
 
+            if serializer.is_valid():
+                with transaction.atomic():
+                    serializer.save()
+                    self._check_stored_image(business)
+                    self.append_events(OutboxEvent.UPDATED, serializer)
+                    self._collect_replaced_image(business, replaced)
+                return Response(
+                    serializer.data,
+                    status=status.HTTP_200_OK
+                )
+
         return Response(
             serializer.errors,
             status=status.HTTP_400_BAD_REQUEST
         )
-    
\ No newline at end of file
+
+    def _direct_upload(self, business):
+        """Return the storage name and digest of the image in the request"""
+        serializer = self.get_serializer(data=self.request.data)
+        serializer.is_valid(raise_exception=True)
+        digest = serializer.validated_data['sha256']
+        upload_name = business_image_file_path(
+            business,
+            f"image.{serializer.validated_data['ext']}"
+        )
+
+        return content_addressed_name(upload_name, digest), digest
+
+    def _attach_image(self, business, name):
+        """Point the business at an already stored image"""
+        serializer = serializers.BusinessImageSerializer(
+            business,
+            context=self.get_serializer_context()
+        )
+        replaced = business.image.name
+        business.image.name = name
+        with transaction.atomic():
+            business.save(update_fields=['image'])
+            self._check_stored_image(business)
+            self.append_events(OutboxEvent.UPDATED, serializer)
+            self._collect_replaced_image(business, replaced)
+
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    def _check_stored_image(self, business):
+        """Check that the attached image was not collected meanwhile
+
+        Identical content shares one file, which collect_image may be
+        deleting. The check is made under the file's lock after the row
+        is written, so either the collector sees the reference or this
+        sees the file gone and rolls back.
+        """
+        lock_stored_file(business.image.name)
+        if not default_storage.exists(business.image.name):
+            raise ValidationError(
+                'The image was deleted while it was attached, '
+                'upload it again.'
+            )
+
+    def _collect_replaced_image(self, business, replaced):
+        """Queue the deletion of the image a new one replaced"""
+        if replaced and replaced != business.image.name:
+            jobs.enqueue(
+                'business.collect_image',
+                delay=settings.REPLACED_IMAGE_GRACE,
+                image=replaced
+            )
+
+    @action(methods=['POST'], detail=True, url_path='upload-url')
+    def upload_url(self, request, pk=None):
+        """Return a presigned URL for uploading an image to storage"""
+        business = self.get_object()
+        if not hasattr(default_storage, 'presigned_upload'):
+            raise ValidationError('Direct uploads are not supported.')
+
+        name, digest = self._direct_upload(business)
+        # Identical content is already stored, no upload needed
+        if default_storage.exists(name):
+            return self._attach_image(business, name)
+
+        url, headers = default_storage.presigned_upload(name, digest)
+        return Response(
+            {'url': url, 'method': 'PUT', 'headers': headers},
+            status=status.HTTP_200_OK
+        )
+
+    @action(methods=['POST'], detail=True, url_path='confirm-upload')
+    def confirm_upload(self, request, pk=None):
+        """Attach an image uploaded with a presigned URL to the business"""
+        business = self.get_object()
+        name, digest = self._direct_upload(business)
+        if not default_storage.exists(name):
+            raise ValidationError('The image has not been uploaded.')
+
+        return self._attach_image(business, name)
+
+
+class WebhookSubscriptionViewSet(viewsets.ModelViewSet):
+    """Manage webhook subscriptions in the database"""
+    serializer_class = serializers.WebhookSubscriptionSerializer
+    queryset = WebhookSubscription.objects.all()
+    authentication_classes = (ExpiringTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+
+    def get_queryset(self):
+        """Return subscriptions for the current authenticated user only"""
+        return self.queryset.filter(user=self.request.user).order_by('-id')
+
+    def perform_create(self, serializer):
+        """Create a new webhook subscription"""
+        serializer.save(user=self.request.user)
+
+
+class SyncView(APIView):
+    """Return objects changed and deleted since a sync cursor"""
+    authentication_classes = (ExpiringTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+    synced = (
+        ('categories', Category, serializers.CategorySerializer),
+        ('services', Service, serializers.ServiceSerializer),
+        ('businesses', Business, serializers.BusinessSerializer),
+    )
+
+    def _int_param(self, name, default):
+        """Return a non-negative integer query param"""
+        try:
+            value = int(self.request.query_params.get(name, default))
+        except ValueError:
+            raise ValidationError({name: 'A valid integer is required.'})
+        if value < 0:
+            raise ValidationError({name: 'Must not be negative.'})
+
+        return value
+
+    def get(self, request, format=None):
+        """Return one page of changes after the cursor"""
+        cursor = self._int_param('cursor', 0)
+        limit = self._int_param('limit', settings.SYNC_PAGE_SIZE)
+        limit = max(1, min(limit, settings.SYNC_PAGE_SIZE))
+
+        # Deletes older than the horizon have been compacted away
+        horizon = SyncHorizon.objects.filter(user=request.user).first()
+        reset = bool(cursor and horizon and cursor <= horizon.change_id)
+        if reset:
+            cursor = 0
+
+        changes = list(
+            Change.objects.filter(user=request.user, id__gt=cursor)
+            .order_by('id')[:limit + 1]
+        )
+        more = len(changes) > limit
+        changes = changes[:limit]
+
+        # Ids are taken at insert but transactions commit in any order, so
+        # a lower id may still become visible. The cursor only moves past
+        # changes older than SYNC_COMMIT_LAG; newer ones are returned
+        # again by the next sync.
+        settled_before = timezone.now() - timedelta(
+            seconds=settings.SYNC_COMMIT_LAG
+        )
+        next_cursor = cursor
+        for change in changes:
+            if change.created > settled_before:
+                more = False
+                break
+            next_cursor = change.id
+
+        data = {
+            'cursor': next_cursor,
+            'more': more,
+            'reset': reset,
+            'deleted': {},
+        }
+        for name, model, serializer_class in self.synced:
+            model_name = model._meta.model_name
+            upserts = [change.object_id for change in changes
+                       if change.model == model_name and
+                       change.action == Change.UPSERT]
+            queryset = model.objects.for_user(request.user).filter(
+                id__in=upserts
+            )
+            if model is Business:
+                queryset = queryset.prefetch_related('categories', 'services')
+            data[name] = serializer_class(
+                queryset.order_by('id'),
+                many=True
+            ).data
+            data['deleted'][name] = [
+                change.object_id for change in changes
+                if change.model == model_name and
+                change.action == Change.DELETE
+            ]
+
+        return Response(data)
+
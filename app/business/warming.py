@@ -0,0 +1,47 @@
+from django.conf import settings
+
+from core.models import Business, Category, Service
+from core.querycache import business_repr_cache
+
+from . import serializers
+
+
+VARIANTS = (
+    ('list', serializers.BusinessSerializer),
+    ('detail', serializers.BusinessDetailSerializer),
+)
+
+
+def warm_user(user_id):
+    """Preload a user's lists, returning the businesses serialized
+
+    Representations missing from the cache are serialized and cached as
+    the list and detail endpoints would, in batches of WARM_BATCH_SIZE.
+    The category and service lists are read once so their index pages are
+    in the database's buffers.
+    """
+    for model in (Category, Service):
+        list(model.objects.for_user(user_id).values_list('id', 'name'))
+
+    pairs = list(
+        Business.objects.for_user(user_id).values_list('id', 'version')
+    )
+    serialized = 0
+    for variant, serializer_class in VARIANTS:
+        found = business_repr_cache.get_many(variant, pairs)
+        missing = [pk for pk, _ in pairs if pk not in found]
+        for start in range(0, len(missing), settings.WARM_BATCH_SIZE):
+            rows = list(
+                Business.objects.filter(
+                    id__in=missing[start:start + settings.WARM_BATCH_SIZE]
+                ).prefetch_related(
+                    *[field.name for field in Business._meta.many_to_many]
+                )
+            )
+            data = serializer_class(rows, many=True).data
+            business_repr_cache.set_many(variant, {
+                (row.pk, row.version): item for row, item in zip(rows, data)
+            })
+            serialized += len(rows)
+
+    return serialized
@@ -0,0 +1,200 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError
+
+from django.conf import settings
+from django.db.models import F
+
+from core.models import Business, OutboxEvent, WebhookSubscription
+from core.outbox import BlockedAddress, WebhookSink
+
+from .serializers import BusinessSerializer
+
+
+def coalesce(messages):
+    """Return the latest change of each business in outbox messages
+
+    Maps business id to (user id, event type), ordered by each business's
+    last change. A business created and then updated is still reported
+    as created.
+    """
+    changes = {}
+    for message in messages:
+        if message['aggregate'] != Business._meta.model_name:
+            continue
+        event_type = message['type']
+        previous = changes.pop(message['aggregate_id'], None)
+        if previous and previous[1] == OutboxEvent.CREATED and \
+                event_type == OutboxEvent.UPDATED:
+            event_type = OutboxEvent.CREATED
+        changes[message['aggregate_id']] = (message['user'], event_type)
+
+    return changes
+
+
+def is_retryable(error):
+    """Return whether a failed delivery may succeed when sent again"""
+    if isinstance(error, BlockedAddress):
+        return False
+    if isinstance(error, HTTPError):
+        return error.code >= 500 or error.code in (408, 429)
+    return True
+
+
+class WebhookDispatcher:
+    """Outbox sink notifying webhook subscriptions of business changes
+
+    Each batch of events is coalesced to the latest change per business,
+    so changes made within one relay interval reach subscribers once.
+    Every subscription gets a single request per batch with the current
+    state of its user's changed businesses, built by BusinessSerializer.
+
+    Requests are sent by a pool of threads, at most `endpoint_concurrency`
+    at a time per URL, and retried with exponential backoff. Deliveries
+    that still fail are counted on the subscription instead of failing
+    the batch, so one broken endpoint cannot hold back the others.
+    relay_outbox holds its row locks while a batch is sent, so deliveries
+    give up once the batch has taken `batch_timeout` seconds.
+
+    With `public_only` requests only go to https URLs on public
+    addresses, checked after DNS resolution.
+    """
+
+    def __init__(self, workers=None, endpoint_concurrency=None,
+                 max_attempts=None, backoff=None, timeout=None,
+                 batch_timeout=None, public_only=None):
+        def setting(value, name):
+            return getattr(settings, name) if value is None else value
+
+        self.workers = setting(workers, 'WEBHOOK_WORKERS')
+        self.endpoint_concurrency = setting(
+            endpoint_concurrency,
+            'WEBHOOK_ENDPOINT_CONCURRENCY'
+        )
+        self.max_attempts = setting(max_attempts, 'WEBHOOK_MAX_ATTEMPTS')
+        self.backoff = setting(backoff, 'WEBHOOK_BACKOFF')
+        self.timeout = setting(timeout, 'WEBHOOK_TIMEOUT')
+        self.batch_timeout = setting(batch_timeout, 'WEBHOOK_BATCH_TIMEOUT')
+        self.public_only = setting(public_only, 'WEBHOOK_PUBLIC_ONLY')
+        self._executor = ThreadPoolExecutor(
+            self.workers,
+            thread_name_prefix='webhook'
+        )
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    def send(self, messages):
+        changes = coalesce(messages)
+        if not changes:
+            return
+
+        subscriptions = list(WebhookSubscription.objects.filter(
+            user_id__in={user_id for user_id, _ in changes.values()},
+            active=True
+        ))
+        if not subscriptions:
+            return
+
+        payloads = self.payloads(changes)
+        deadline = time.monotonic() + self.batch_timeout
+        futures = {
+            subscription: self._executor.submit(
+                self.deliver,
+                subscription,
+                payloads[subscription.user_id],
+                deadline
+            )
+            for subscription in subscriptions
+        }
+        # Outcomes are saved here since the workers have no transaction
+        # of their own
+        self.record([
+            subscription for subscription, future in futures.items()
+            if not future.result()
+        ], [
+            subscription for subscription, future in futures.items()
+            if future.result() and subscription.failures
+        ])
+
+    def payloads(self, changes):
+        """Return each user's list of change notifications"""
+        businesses = Business.all_objects.filter(
+            id__in=changes
+        ).prefetch_related('categories', 'services').in_bulk()
+
+        payloads = {}
+        for pk, (user_id, event_type) in changes.items():
+            business = businesses.get(pk)
+            if business is None or business.deleted_at:
+                notification = {
+                    'type': OutboxEvent.DELETED,
+                    'business': {'id': pk},
+                }
+            else:
+                notification = {
+                    'type': event_type,
+                    'business': BusinessSerializer(business).data,
+                }
+            payloads.setdefault(user_id, []).append(notification)
+
+        return payloads
+
+    def deliver(self, subscription, payload, deadline=None):
+        """Send a payload to a subscription, returning whether it arrived
+
+        No attempt is started, and no request waits, past `deadline`.
+        """
+        if deadline is None:
+            deadline = time.monotonic() + self.batch_timeout
+        endpoint = self._endpoint(subscription.url)
+        if not endpoint.acquire(timeout=max(deadline - time.monotonic(), 0)):
+            return False
+
+        try:
+            for attempt in range(self.max_attempts):
+                pause = self.backoff * 2 ** (attempt - 1) if attempt else 0
+                remaining = deadline - time.monotonic() - pause
+                if remaining <= 0:
+                    break
+                time.sleep(pause)
+                sink = WebhookSink(
+                    subscription.url,
+                    subscription.secret,
+                    min(self.timeout, remaining),
+                    public_only=self.public_only
+                )
+                try:
+                    sink.send(payload)
+                    return True
+                except OSError as error:
+                    if not is_retryable(error):
+                        break
+        finally:
+            endpoint.release()
+
+        return False
+
+    def record(self, failed, recovered):
+        """Count failed deliveries and reset recovered subscriptions"""
+        if failed:
+            WebhookSubscription.objects.filter(
+                id__in=[subscription.id for subscription in failed]
+            ).update(failures=F('failures') + 1)
+            WebhookSubscription.objects.filter(
+                id__in=[subscription.id for subscription in failed],
+                failures__gte=settings.WEBHOOK_MAX_FAILURES
+            ).update(active=False)
+        if recovered:
+            WebhookSubscription.objects.filter(
+                id__in=[subscription.id for subscription in recovered]
+            ).update(failures=0)
+
+    def _endpoint(self, url):
+        """Return the semaphore bounding requests in flight to a URL"""
+        with self._lock:
+            if url not in self._endpoints:
+                self._endpoints[url] = threading.BoundedSemaphore(
+                    self.endpoint_concurrency
+                )
+            return self._endpoints[url]
@@ -3,6 +3,7 @@ from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.utils.translation import gettext as _
 
 from . import models
+from .pagination import EstimatedCountPaginator
 
 
 class UserAdmin(BaseUserAdmin):
@@ -24,8 +25,84 @@ class UserAdmin(BaseUserAdmin):
         }),
     )
 
+    def delete_model(self, request, obj):
+        """Deactivate the user and leave their data to purge_deleted"""
+        obj.soft_delete()
+
+    def delete_queryset(self, request, queryset):
+        """Deactivate the users and leave their data to purge_deleted"""
+        for user in queryset:
+            user.soft_delete()
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Admin for large per-user tables
+
+    Counts are estimated, user foreign keys are joined in the list query
+    and edited by id, and search only uses indexed name prefixes.
+    """
+    list_display = ['name', 'user']
+    list_select_related = ['user']
+    raw_id_fields = ['user']
+    search_fields = ['^name']
+    ordering = ['-id']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def delete_queryset(self, request, queryset):
+        """Soft delete each selected object"""
+        for obj in queryset:
+            obj.delete()
+
+
+class BusinessCategoryInline(admin.TabularInline):
+    model = models.BusinessCategory
+    autocomplete_fields = ['category']
+    extra = 0
+
+
+class BusinessServiceInline(admin.TabularInline):
+    model = models.BusinessService
+    autocomplete_fields = ['service']
+    extra = 0
+
+
+class BusinessAdmin(LargeTableAdmin):
+    """Admin for businesses, with their relations edited inline
+
+    The relations have explicit through models, which the admin form
+    leaves out, so they are edited as inline rows with autocomplete.
+    """
+    inlines = [BusinessCategoryInline, BusinessServiceInline]
+    relations = {
+        models.BusinessCategory: ('categories', 'category'),
+        models.BusinessService: ('services', 'service'),
+    }
+
+    def save_formset(self, request, form, formset, change):
+        """Write relation rows with set_related_ids
+
+        Rows saved one by one would skip the m2m_changed signals that
+        log the change, bump the version and refresh the listing.
+        """
+        relation = self.relations.get(formset.model)
+        if relation is None:
+            return super().save_formset(request, form, formset, change)
+
+        name, target = relation
+        # Sets the objects the change message lists, writing nothing
+        formset.save(commit=False)
+        form.instance.set_related_ids(name, {
+            row.cleaned_data[target].pk
+            for row in formset.forms
+            if row.cleaned_data.get(target)
+            and not formset._should_delete_form(row)
+        })
+
 
 admin.site.register(models.User, UserAdmin)
-admin.site.register(models.Category)
-admin.site.register(models.Service)
-admin.site.register(models.Business)
\ No newline at end of file
+admin.site.register(models.Category, LargeTableAdmin)
+admin.site.register(models.Service, LargeTableAdmin)
+admin.site.register(models.Business, BusinessAdmin)
+admin.site.register(models.WebhookSubscription)
+admin.site.register(models.Job)
@@ -0,0 +1,73 @@
+import json
+
+from django.db import models
+from django.db.models.lookups import FieldGetDbPrepValueMixin, Lookup
+
+
+class ListField(models.Field):
+    """List of `base_field` values kept in a single column
+
+    PostgreSQL stores a native array, which GIN indexes make searchable
+    with `overlap`. Other databases store a JSON array.
+    """
+    empty_strings_allowed = False
+
+    def __init__(self, base_field, **kwargs):
+        self.base_field = base_field
+        kwargs.setdefault('default', list)
+        super().__init__(**kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        kwargs['base_field'] = self.base_field.clone()
+        if kwargs.get('default') is list:
+            del kwargs['default']
+
+        return name, path, args, kwargs
+
+    def db_type(self, connection):
+        if connection.vendor == 'postgresql':
+            return f'{self.base_field.db_type(connection)}[]'
+
+        return 'text'
+
+    def from_db_value(self, value, expression, connection):
+        if value is None or isinstance(value, list):
+            return value
+
+        return json.loads(value)
+
+    def to_python(self, value):
+        if isinstance(value, str):
+            return json.loads(value)
+
+        return value
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if value is None or connection.vendor == 'postgresql':
+            return value
+
+        return json.dumps(list(value), separators=(',', ':'))
+
+
+@ListField.register_lookup
+class Overlap(FieldGetDbPrepValueMixin, Lookup):
+    """Match lists sharing at least one value with the given list"""
+    lookup_name = 'overlap'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+
+        return (
+            f'EXISTS (SELECT 1 FROM json_each({lhs}) WHERE value IN '
+            f'(SELECT value FROM json_each({rhs})))',
+            lhs_params + rhs_params
+        )
+
+    def as_postgresql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        db_type = self.lhs.output_field.db_type(connection)
+
+        return f'{lhs} && {rhs}::{db_type}', lhs_params + rhs_params
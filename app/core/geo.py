@@ -0,0 +1,108 @@
+import math
+
+from django.db.models import ExpressionWrapper, F, FloatField
+from django.db.models.functions import ASin, Cos, Power, Radians, Sin, Sqrt
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+EARTH_RADIUS_KM = 6371.0088
+GEOHASH_PRECISION = 12
+
+
+def encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    """Return the geohash of a point"""
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    geohash, bits, char = [], 0, 0
+    even = True
+    while len(geohash) < precision:
+        if even:
+            value, bounds = longitude, lng_range
+        else:
+            value, bounds = latitude, lat_range
+        middle = (bounds[0] + bounds[1]) / 2
+        char <<= 1
+        if value >= middle:
+            char |= 1
+            bounds[0] = middle
+        else:
+            bounds[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            geohash.append(BASE32[char])
+            bits, char = 0, 0
+
+    return ''.join(geohash)
+
+
+def cell_size(precision):
+    """Return the (height, width) in degrees of a geohash cell"""
+    lng_bits = math.ceil(precision * 5 / 2)
+    lat_bits = precision * 5 // 2
+
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lng_bits
+
+
+def covering_cells(min_lat, min_lng, max_lat, max_lng, max_cells=16):
+    """Return the geohash prefixes of the cells covering a bounding box
+
+    The finest precision needing at most `max_cells` cells is used. An
+    empty list means the box is too large for geohash cells to help.
+    """
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = cell_size(precision)
+        rows = math.floor(max_lat / height) - math.floor(min_lat / height) + 1
+        columns = (math.floor(max_lng / width) -
+                   math.floor(min_lng / width) + 1)
+        if rows * columns > max_cells:
+            continue
+
+        cells = set()
+        for row in range(rows):
+            latitude = min(min_lat + row * height, max_lat)
+            for column in range(columns):
+                longitude = min(min_lng + column * width, max_lng)
+                cells.add(encode(latitude, longitude, precision))
+        # The last row and column may start past the box edge
+        cells.add(encode(max_lat, max_lng, precision))
+        cells.add(encode(min_lat, max_lng, precision))
+        cells.add(encode(max_lat, min_lng, precision))
+        return sorted(cells)
+
+    return []
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """Return (min_lat, min_lng, max_lat, max_lng) enclosing a circle
+
+    Boxes reaching a pole or the antimeridian are clamped to valid
+    coordinates rather than wrapped around.
+    """
+    lat_delta = math.degrees(radius_km / EARTH_RADIUS_KM)
+    min_lat = max(latitude - lat_delta, -90.0)
+    max_lat = min(latitude + lat_delta, 90.0)
+    if min_lat == -90.0 or max_lat == 90.0:
+        return min_lat, -180.0, max_lat, 180.0
+
+    lng_delta = math.degrees(
+        radius_km / (EARTH_RADIUS_KM * math.cos(math.radians(latitude)))
+    )
+
+    return (min_lat, max(longitude - lng_delta, -180.0),
+            max_lat, min(longitude + lng_delta, 180.0))
+
+
+def distance_km(latitude, longitude):
+    """Return an expression for the great circle distance to a point"""
+    lat, lng = math.radians(latitude), math.radians(longitude)
+    row_lat = Radians(F('latitude'))
+    delta_lat = row_lat - lat
+    delta_lng = Radians(F('longitude')) - lng
+    haversine = (
+        Power(Sin(delta_lat / 2), 2) +
+        Cos(row_lat) * math.cos(lat) * Power(Sin(delta_lng / 2), 2)
+    )
+
+    return ExpressionWrapper(
+        2 * EARTH_RADIUS_KM * ASin(Sqrt(haversine)),
+        output_field=FloatField()
+    )
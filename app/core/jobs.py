@@ -0,0 +1,80 @@
+import json
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+from core import metrics
+from core.models import Job
+
+
+_tasks = {}
+
+
+def task(name):
+    """Register a function as the task run by jobs named `name`
+
+    Tasks are looked up in the `tasks` module of each installed app and
+    take JSON serializable keyword arguments. They may run more than once
+    for a job, so they must be idempotent.
+    """
+    def register(func):
+        _tasks[name] = func
+        return func
+
+    return register
+
+
+def autodiscover():
+    """Import the tasks modules of the installed apps"""
+    autodiscover_modules('tasks')
+
+
+def enqueue(name, priority=0, delay=0, max_attempts=None, **kwargs):
+    """Add a job in the caller's transaction and return it"""
+    return Job.objects.create(
+        name=name,
+        kwargs=json.dumps(
+            kwargs,
+            cls=DjangoJSONEncoder,
+            separators=(',', ':')
+        ),
+        priority=priority,
+        available_at=timezone.now() + timedelta(seconds=delay),
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS
+    )
+
+
+def execute(job):
+    """Run a claimed job and record its outcome, returning whether it ran
+
+    Outcomes are only written while the job is still claimed by this
+    attempt, so a job run again after its visibility timeout is not
+    deleted or retried twice.
+    """
+    claimed = Job.objects.filter(id=job.id, attempts=job.attempts)
+    try:
+        func = _tasks.get(job.name)
+        if func is None:
+            raise LookupError(f'No task is registered as {job.name}.')
+        func(**json.loads(job.kwargs))
+    except Exception:
+        error = traceback.format_exc()
+        if job.attempts >= job.max_attempts:
+            claimed.update(failed_at=timezone.now(), last_error=error)
+            metrics.incr('jobs.failed')
+        else:
+            backoff = settings.JOB_RETRY_BACKOFF * 2 ** (job.attempts - 1)
+            claimed.update(
+                available_at=timezone.now() + timedelta(seconds=backoff),
+                last_error=error
+            )
+            metrics.incr('jobs.retried')
+        return False
+
+    claimed.delete()
+    metrics.incr('jobs.succeeded')
+    return True
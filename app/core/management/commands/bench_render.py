@@ -0,0 +1,76 @@
+import gzip
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from rest_framework.renderers import JSONRenderer
+
+from core.middleware import brotli
+from core.renderers import FastJSONRenderer, orjson
+
+
+class Command(BaseCommand):
+    """Django command benchmarks rendering and compressing business lists"""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=1000,
+            help='Number of businesses in the rendered list'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=50,
+            help='Number of timed runs per measurement'
+        )
+
+    def handle(self, *args, **options):
+        data = [
+            {
+                'id': i,
+                'name': f'Business {i}',
+                'services': list(range(i, i + 5)),
+                'categories': list(range(i, i + 3)),
+            }
+            for i in range(options['rows'])
+        ]
+        repeat = options['repeat']
+
+        self.stdout.write(f"{options['rows']} rows, best of {repeat} runs")
+        self.stdout.write(f"{'step':<24}{'CPU ms':>10}{'bytes':>12}")
+
+        renderers = [('JSONRenderer', JSONRenderer())]
+        if orjson is not None:
+            renderers.append(('FastJSONRenderer', FastJSONRenderer()))
+        for name, renderer in renderers:
+            content = self._report(name, repeat, lambda: renderer.render(data))
+
+        compressors = [(
+            f'gzip level {settings.COMPRESSION_GZIP_LEVEL}',
+            lambda: gzip.compress(content, settings.COMPRESSION_GZIP_LEVEL)
+        )]
+        if brotli is not None:
+            compressors.append((
+                f'brotli quality {settings.COMPRESSION_BROTLI_QUALITY}',
+                lambda: brotli.compress(
+                    content,
+                    quality=settings.COMPRESSION_BROTLI_QUALITY
+                )
+            ))
+        for name, compress in compressors:
+            self._report(name, repeat, compress)
+
+    def _report(self, name, repeat, func):
+        """Time `func` in CPU time, print the best run and return its output"""
+        best = None
+        for _ in range(repeat):
+            start = time.process_time()
+            output = func()
+            elapsed = time.process_time() - start
+            best = elapsed if best is None else min(best, elapsed)
+
+        self.stdout.write(f'{name:<24}{best * 1000:>10.2f}{len(output):>12}')
+        return output
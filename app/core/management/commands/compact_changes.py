@@ -0,0 +1,79 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import Exists, Max, OuterRef
+from django.utils import timezone
+
+from core.models import Change, SyncHorizon
+
+
+class Command(BaseCommand):
+    """Django command compacts the sync change log"""
+    requires_system_checks = False
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retention-days',
+            type=int,
+            default=settings.SYNC_TOMBSTONE_RETENTION_DAYS,
+            help='Days a delete tombstone is kept for clients to sync'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of entries deleted per statement'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        superseded = Change.objects.annotate(newer=Exists(
+            Change.objects.filter(
+                model=OuterRef('model'),
+                object_id=OuterRef('object_id'),
+                id__gt=OuterRef('id')
+            )
+        )).filter(newer=True)
+        removed = self._delete_in_batches(superseded, batch_size)
+
+        orphaned = Change.objects.annotate(user_exists=Exists(
+            get_user_model().objects.filter(pk=OuterRef('user_id'))
+        )).filter(user_exists=False)
+        removed += self._delete_in_batches(orphaned, batch_size)
+
+        cutoff = timezone.now() - timedelta(days=options['retention_days'])
+        expired = Change.objects.filter(
+            action=Change.DELETE,
+            created__lt=cutoff
+        )
+        self._advance_horizons(expired)
+        removed += self._delete_in_batches(expired, batch_size)
+
+        self.stdout.write(self.style.SUCCESS(f'Removed {removed} changes'))
+
+    def _advance_horizons(self, tombstones):
+        """Remember the newest tombstone dropped for each user"""
+        horizons = tombstones.values('user_id').annotate(change_id=Max('id'))
+        for horizon in horizons:
+            updated = SyncHorizon.objects.filter(
+                user_id=horizon['user_id'],
+                change_id__lt=horizon['change_id']
+            ).update(change_id=horizon['change_id'])
+            if not updated:
+                SyncHorizon.objects.get_or_create(
+                    user_id=horizon['user_id'],
+                    defaults={'change_id': horizon['change_id']}
+                )
+
+    def _delete_in_batches(self, queryset, batch_size):
+        """Delete the queryset in bounded statements and return the count"""
+        removed = 0
+        while True:
+            ids = list(queryset.values_list('id', flat=True)[:batch_size])
+            if not ids:
+                return removed
+            Change.objects.filter(id__in=ids).delete()
+            removed += len(ids)
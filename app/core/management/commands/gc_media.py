@@ -0,0 +1,80 @@
+import posixpath
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import Business
+from core.storage import lock_stored_file
+
+
+class Command(BaseCommand):
+    """Django command deletes stored images no business refers to"""
+    requires_system_checks = False
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--prefix',
+            default='uploads/business',
+            help='Storage directory to collect'
+        )
+        parser.add_argument(
+            '--grace-hours',
+            type=int,
+            default=24,
+            help='Keep unreferenced files younger than this many hours'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of files checked against the database at once'
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options['grace_hours'])
+        removed = 0
+        batch = []
+        for name in self._walk(options['prefix']):
+            batch.append(name)
+            if len(batch) >= options['batch_size']:
+                removed += self._collect(batch, cutoff)
+                batch = []
+        removed += self._collect(batch, cutoff)
+
+        self.stdout.write(self.style.SUCCESS(f'Removed {removed} files'))
+
+    def _walk(self, path):
+        """Yield every file name below a storage directory"""
+        try:
+            directories, files = default_storage.listdir(path)
+        except FileNotFoundError:
+            return
+        for name in files:
+            yield posixpath.join(path, name)
+        for directory in directories:
+            yield from self._walk(posixpath.join(path, directory))
+
+    def _collect(self, names, cutoff):
+        """Delete the unreferenced names that are past the grace period"""
+        # Soft deleted businesses still own their image until purged
+        referenced = set(
+            Business.all_objects.filter(image__in=names)
+            .values_list('image', flat=True)
+        )
+        removed = 0
+        for name in names:
+            if name in referenced:
+                continue
+            if default_storage.get_modified_time(name) >= cutoff:
+                continue
+            with transaction.atomic():
+                lock_stored_file(name)
+                if Business.all_objects.filter(image=name).exists():
+                    continue
+                default_storage.delete(name)
+            removed += 1
+
+        return removed
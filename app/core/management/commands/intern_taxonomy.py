@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import Category, Service, TaxonomyTerm
+
+
+class Command(BaseCommand):
+    """Django command links existing categories and services to terms"""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of rows linked per transaction'
+        )
+
+    def handle(self, *args, **options):
+        linked = 0
+        for model in (Category, Service):
+            linked += self._link(model, options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(f'Linked {linked} rows to terms'))
+
+    def _link(self, model, batch_size):
+        """Intern the names of unlinked rows one batch at a time"""
+        queryset = model.all_objects.filter(term__isnull=True).order_by('id')
+        linked = 0
+        last_id = 0
+        while True:
+            with transaction.atomic():
+                rows = list(
+                    queryset.filter(id__gt=last_id)
+                    .only('id', 'name')[:batch_size]
+                )
+                if not rows:
+                    return linked
+
+                terms = TaxonomyTerm.objects.intern(
+                    model.taxonomy_kind,
+                    {row.name for row in rows}
+                )
+                for row in rows:
+                    row.term_id = terms[row.name]
+                model.all_objects.bulk_update(rows, ['term'])
+            linked += len(rows)
+            last_id = rows[-1].id
@@ -0,0 +1,63 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from core.partitioning import BusinessPartitioner
+
+
+class Command(BaseCommand):
+    """Django command to hash partition the business tables online"""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--partitions',
+            type=int,
+            default=settings.BUSINESS_PARTITIONS or 16,
+            help='Number of hash partitions per table'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10000,
+            help='Range of ids copied per transaction'
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0,
+            help='Seconds to sleep between batches'
+        )
+        parser.add_argument(
+            '--drop-old',
+            action='store_true',
+            help='Drop the original tables instead of keeping them as *_old'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Partitioning requires PostgreSQL')
+        if connection.pg_version < 110000:
+            raise CommandError('Hash partitioning requires PostgreSQL 11+')
+
+        partitioner = BusinessPartitioner(connection, options['partitions'])
+        if partitioner.is_partitioned():
+            self.stdout.write('Business tables are already partitioned')
+            return
+
+        if not partitioner.is_prepared():
+            with transaction.atomic():
+                partitioner.prepare()
+            self.stdout.write('Created partitioned tables')
+
+        copied = 0
+        for table, rows in partitioner.copy(options['batch_size']):
+            copied += rows
+            self.stdout.write(f'{table}: copied {copied} rows')
+            time.sleep(options['pause'])
+
+        with transaction.atomic():
+            partitioner.swap(drop_old=options['drop_old'])
+
+        self.stdout.write(self.style.SUCCESS('Partitioned business tables'))
@@ -0,0 +1,63 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import Category, Service, Business
+
+
+class Command(BaseCommand):
+    """Django command hard deletes soft deleted rows in bounded batches"""
+    requires_system_checks = False
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than-days',
+            type=int,
+            default=7,
+            help='Only purge rows deleted at least this many days ago'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of rows deleted per transaction'
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['older_than_days'])
+        batch_size = options['batch_size']
+        purged = 0
+
+        # Businesses go first so their relation rows are gone before the
+        # categories and services they point to
+        for model in (Business, Category, Service):
+            purged += self._purge(
+                model.all_objects.filter(deleted_at__lt=cutoff),
+                batch_size
+            )
+
+        users = get_user_model().objects.filter(deleted_at__lt=cutoff)
+        for user in users.iterator():
+            for model in (Business, Category, Service):
+                purged += self._purge(
+                    model.all_objects.filter(user=user),
+                    batch_size
+                )
+            user.delete()
+            purged += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Purged {purged} rows'))
+
+    def _purge(self, queryset, batch_size):
+        """Hard delete the queryset one batch at a time"""
+        purged = 0
+        while True:
+            with transaction.atomic():
+                ids = list(queryset.values_list('id', flat=True)[:batch_size])
+                if not ids:
+                    return purged
+                queryset.model.all_objects.filter(id__in=ids).delete()
+            purged += len(ids)
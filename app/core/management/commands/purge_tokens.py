@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from core.models import AuthToken
+
+
+class Command(BaseCommand):
+    """Django command deletes expired auth tokens in chunks"""
+    requires_system_checks = False
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of tokens deleted per statement'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        purged = 0
+        while True:
+            keys = list(
+                AuthToken.objects.expired()
+                .values_list('key', flat=True)[:batch_size]
+            )
+            if not keys:
+                break
+            AuthToken.objects.filter(key__in=keys).delete()
+            purged += len(keys)
+
+        self.stdout.write(self.style.SUCCESS(f'Purged {purged} tokens'))
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+
+from core.models import Business, BusinessListing
+
+
+class Command(BaseCommand):
+    """Django command rewrites the business listings from the businesses"""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of businesses rewritten per transaction'
+        )
+
+    def handle(self, *args, **options):
+        business_ids = Business.all_objects.order_by('id').values_list(
+            'id',
+            flat=True
+        )
+        rebuilt = 0
+        last_id = 0
+        while True:
+            batch = list(
+                business_ids.filter(id__gt=last_id)[:options['batch_size']]
+            )
+            if not batch:
+                break
+
+            BusinessListing.objects.refresh(batch)
+            rebuilt += len(batch)
+            last_id = batch[-1]
+
+        # Listings of businesses deleted while signals were not recording
+        BusinessListing.objects.exclude(
+            id__in=Business.all_objects.values('id')
+        ).delete()
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt listings of {rebuilt} businesses')
+        )
@@ -0,0 +1,133 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models.functions import Mod
+from django.utils import timezone
+
+from core.models import OutboxEvent
+from core.outbox import get_sink
+
+
+class Command(BaseCommand):
+    """Django command delivers outbox events to the configured sink
+
+    Events are delivered in id order and deleted in the transaction that
+    locked them, after the sink accepted them, so every event is delivered
+    at least once. Concurrent relays on the same shard wait for each other,
+    which keeps each user's events in order; run one relay per shard to
+    deliver in parallel.
+
+    Ids are taken at insert but transactions commit in any order, so only
+    events older than SYNC_COMMIT_LAG are delivered, up to the first newer
+    one. With --loop a failing sink is retried with exponential backoff.
+    """
+    requires_system_checks = False
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Number of events delivered per batch'
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep polling for new events instead of exiting when drained'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=1.0,
+            help='Seconds to wait between polls once drained'
+        )
+        parser.add_argument(
+            '--max-backoff',
+            type=float,
+            default=60.0,
+            help='Most seconds to wait before retrying a failed batch'
+        )
+        parser.add_argument(
+            '--shards',
+            type=int,
+            default=1,
+            help='Number of relays splitting the users between them'
+        )
+        parser.add_argument(
+            '--shard',
+            type=int,
+            default=0,
+            help='Shard of users delivered by this relay'
+        )
+
+    def handle(self, *args, **options):
+        sink = get_sink()
+        pending = OutboxEvent.objects.order_by('id')
+        if options['shards'] > 1:
+            pending = pending.annotate(
+                shard=Mod('user_id', options['shards'])
+            ).filter(shard=options['shard'])
+
+        relayed = 0
+        failures = 0
+        while True:
+            try:
+                delivered = self._relay_batch(
+                    sink,
+                    pending,
+                    options['batch_size']
+                )
+            except Exception as error:
+                if not options['loop']:
+                    raise
+                failures += 1
+                backoff = min(
+                    options['interval'] * 2 ** (failures - 1),
+                    options['max_backoff']
+                )
+                self.stderr.write(
+                    f'Delivery failed ({error!r}), retrying in {backoff:g}s'
+                )
+                time.sleep(backoff)
+                continue
+
+            failures = 0
+            relayed += delivered
+            if delivered:
+                continue
+            # A batch can come back empty while another relay holds the
+            # events, so only stop once none are left or the oldest has
+            # not settled
+            if not options['loop']:
+                oldest = pending.values_list('created', flat=True).first()
+                if oldest is None or oldest > self._settled():
+                    break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(f'Relayed {relayed} events'))
+
+    def _settled(self):
+        """Return the time before which every event has committed"""
+        return timezone.now() - timedelta(seconds=settings.SYNC_COMMIT_LAG)
+
+    def _relay_batch(self, sink, pending, batch_size):
+        """Deliver and delete a batch of settled events, returning its size"""
+        with transaction.atomic():
+            events = list(pending.select_for_update()[:batch_size])
+            settled_before = self._settled()
+            for index, event in enumerate(events):
+                if event.created > settled_before:
+                    events = events[:index]
+                    break
+            if not events:
+                return 0
+
+            sink.send([event.to_message() for event in events])
+            OutboxEvent.objects.filter(
+                id__in=[event.id for event in events]
+            ).delete()
+
+        return len(events)
@@ -0,0 +1,113 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from core import jobs
+from core.models import Job
+
+
+class Command(BaseCommand):
+    """Django command runs queued jobs
+
+    Workers claim jobs with SELECT ... FOR UPDATE SKIP LOCKED, so any
+    number of them can share the queue without a broker. With a
+    concurrency of 1 jobs run in the command's thread, otherwise in a pool
+    of threads each claiming as they free up.
+    """
+    requires_system_checks = False
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=settings.JOB_WORKERS,
+            help='Number of jobs run at the same time'
+        )
+        parser.add_argument(
+            '--visibility-timeout',
+            type=int,
+            default=settings.JOB_VISIBILITY_TIMEOUT,
+            help='Seconds a claimed job is hidden from other workers'
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep polling for new jobs instead of exiting when drained'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=1.0,
+            help='Seconds to wait between polls once drained'
+        )
+
+    def handle(self, *args, **options):
+        jobs.autodiscover()
+        concurrency = max(options['concurrency'], 1)
+        timeout = options['visibility_timeout']
+
+        if concurrency == 1:
+            counts = self._run_inline(timeout, options)
+        else:
+            with ThreadPoolExecutor(concurrency) as executor:
+                counts = self._run_pool(
+                    executor,
+                    concurrency,
+                    timeout,
+                    options
+                )
+
+        succeeded, failed = counts
+        self.stdout.write(self.style.SUCCESS(
+            f'Ran {succeeded + failed} jobs, {failed} failed'
+        ))
+
+    def _run_inline(self, timeout, options):
+        """Run jobs one at a time, returning (succeeded, failed)"""
+        counts = [0, 0]
+        while True:
+            claimed = Job.objects.claim(1, timeout)
+            for job in claimed:
+                counts[not jobs.execute(job)] += 1
+            if claimed:
+                continue
+            if not options['loop']:
+                return counts
+            time.sleep(options['interval'])
+
+    def _run_pool(self, executor, concurrency, timeout, options):
+        """Keep the pool busy, returning (succeeded, failed)"""
+        counts = [0, 0]
+        running = set()
+        while True:
+            free = concurrency - len(running)
+            claimed = Job.objects.claim(free, timeout) if free else []
+            running.update(
+                executor.submit(self._execute, job) for job in claimed
+            )
+
+            if not running:
+                if not options['loop']:
+                    return counts
+                time.sleep(options['interval'])
+                continue
+
+            # With every thread busy, claim again once a job finishes;
+            # otherwise the queue was drained, so poll after the interval
+            busy = len(claimed) == free
+            done, running = wait(
+                running,
+                timeout=None if busy else options['interval'],
+                return_when=FIRST_COMPLETED
+            )
+            for future in done:
+                counts[not future.result()] += 1
+
+    def _execute(self, job):
+        try:
+            return jobs.execute(job)
+        finally:
+            connection.close()
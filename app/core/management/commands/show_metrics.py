@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from core import metrics
+
+
+class Command(BaseCommand):
+    """Django command prints the counters shared through the cache"""
+    requires_system_checks = False
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'names',
+            nargs='*',
+            help='Counters to print, all known ones by default'
+        )
+
+    def handle(self, *args, **options):
+        names = options['names'] or metrics.known_names()
+        for name, value in metrics.read(names).items():
+            self.stdout.write(f'{name} {value}')
@@ -0,0 +1,93 @@
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+IMPORT_TIME = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+class Command(BaseCommand):
+    """Django command reports where another command spends its startup
+
+    The command is run with `python -X importtime` in a fresh interpreter,
+    with this command's settings, and the import times are summed by
+    package. Pass options meant for the profiled command after `--`:
+
+        python manage.py startup_report --settings=app.ops_settings \\
+            -- wait_for_db
+    """
+    requires_system_checks = False
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'profiled',
+            nargs='+',
+            help='Command, with its arguments, to profile'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Runs to take the median wall time of'
+        )
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=15,
+            help='Number of packages and modules listed'
+        )
+
+    def handle(self, *args, **options):
+        manage = os.path.join(os.getcwd(), 'manage.py')
+        if not os.path.exists(manage):
+            raise CommandError(
+                'Run startup_report from the project directory.'
+            )
+
+        argv = [sys.executable, '-X', 'importtime', manage]
+        argv += options['profiled']
+        wall_times = []
+        for _ in range(max(options['repeat'], 1)):
+            started = time.perf_counter()
+            result = subprocess.run(argv, capture_output=True, text=True)
+            wall_times.append(time.perf_counter() - started)
+            if result.returncode:
+                raise CommandError(
+                    f'{" ".join(options["profiled"])} failed:\n{result.stderr}'
+                )
+
+        self._report(result.stderr, wall_times, options['top'])
+
+    def _report(self, stderr, wall_times, top):
+        """Print the wall time, and import times by package and module"""
+        packages = defaultdict(int)
+        modules = []
+        for line in stderr.splitlines():
+            match = IMPORT_TIME.match(line)
+            if not match:
+                continue
+            own, cumulative, indent, name = match.groups()
+            packages[name.split('.')[0]] += int(own)
+            if len(indent) == 1:
+                modules.append((int(cumulative), name))
+
+        total = sum(packages.values())
+        self.stdout.write(
+            f'Wall time: {statistics.median(wall_times) * 1000:.0f} ms '
+            f'(median of {len(wall_times)}), imports: {total / 1000:.0f} ms'
+        )
+
+        self.stdout.write('\nImport time by package:')
+        by_time = sorted(packages.items(), key=lambda item: -item[1])
+        for name, own in by_time[:top]:
+            self.stdout.write(f'{own / 1000:8.1f} ms  {name}')
+
+        self.stdout.write('\nSlowest top level imports:')
+        for cumulative, name in sorted(modules, reverse=True)[:top]:
+            self.stdout.write(f'{cumulative / 1000:8.1f} ms  {name}')
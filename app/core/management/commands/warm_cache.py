@@ -0,0 +1,57 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from business.warming import warm_user
+from core.models import AuthToken
+
+
+class Command(BaseCommand):
+    """Django command preloads the caches of recently active users
+
+    Users are warmed in order of their token's last use, most recent
+    first, so the users likely to make the next requests get warm caches
+    first. Users without a live token cannot make requests before they
+    log in again.
+    """
+    requires_system_checks = False
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=None,
+            help='Warm only this many of the most active users'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=4,
+            help='Number of users warmed at the same time'
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        user_ids = AuthToken.objects.filter(
+            created__gte=now - AuthToken.max_age(),
+            last_used__gte=now - AuthToken.idle_timeout()
+        ).order_by('-last_used').values_list('user_id', flat=True)
+        user_ids = list(user_ids[:options['users']])
+
+        if options['concurrency'] <= 1:
+            serialized = sum(map(warm_user, user_ids))
+        else:
+            with ThreadPoolExecutor(options['concurrency']) as executor:
+                serialized = sum(executor.map(self._warm_user, user_ids))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Warmed {len(user_ids)} users, serialized {serialized} businesses'
+        ))
+
+    def _warm_user(self, user_id):
+        try:
+            return warm_user(user_id)
+        finally:
+            connection.close()
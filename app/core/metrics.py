@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.cache import cache
+
+
+def _key(name):
+    return f'metric:{name}'
+
+
+def incr(name, amount=1):
+    """Add to a counter shared by every worker through the cache"""
+    key = _key(name)
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key, amount)
+    except ValueError:
+        cache.set(key, amount, None)
+
+
+def read(names):
+    """Return the current value of counters, 0 for unknown ones"""
+    values = cache.get_many([_key(name) for name in names])
+    return {name: values.get(_key(name), 0) for name in names}
+
+
+def known_names():
+    """Return the counters the project reports"""
+    scopes = set(settings.WRITE_THROTTLE_RATES)
+    scopes |= set(settings.CONCURRENCY_LIMITS)
+    names = [f'throttle.{scope}.limited' for scope in scopes]
+    names += ['jobs.succeeded', 'jobs.retried', 'jobs.failed']
+    return sorted(names)
@@ -0,0 +1,94 @@
+import gzip
+import re
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+
+ACCEPT_ENCODING_RE = re.compile(
+    r'^\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([\d.]+))?\s*$'
+)
+
+
+def accepted_encodings(header):
+    """Return the encodings of an Accept-Encoding header with their q-values"""
+    encodings = {}
+    for part in header.split(','):
+        match = ACCEPT_ENCODING_RE.match(part)
+        if match:
+            name, quality = match.groups()
+            try:
+                encodings[name.lower()] = float(quality) if quality else 1.0
+            except ValueError:
+                continue
+
+    return encodings
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """Compress responses with brotli or gzip, as the client accepts
+
+    Brotli is used when the brotli package is installed. Responses smaller
+    than COMPRESSION_MIN_SIZE, streaming responses, already encoded
+    responses and types listed as incompressible are sent as they are.
+    """
+    incompressible_types = ('image/', 'video/', 'audio/', 'application/zip')
+
+    def process_response(self, request, response):
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        content_type = response.get('Content-Type', '')
+        if content_type.startswith(self.incompressible_types):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+
+        encoding = self.negotiate(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        compressed = self.compress(response.content, encoding)
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+        # The compressed body is a different representation
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = f'W/{etag}'
+
+        return response
+
+    def negotiate(self, header):
+        """Return the preferred supported encoding, or None"""
+        encodings = accepted_encodings(header)
+        supported = ['br', 'gzip'] if brotli is not None else ['gzip']
+        wildcard = encodings.get('*', 0)
+        ranked = sorted(
+            ((encodings.get(name, wildcard), -index, name)
+             for index, name in enumerate(supported)),
+            reverse=True
+        )
+        quality, index, name = ranked[0]
+
+        return name if quality > 0 else None
+
+    def compress(self, content, encoding):
+        """Return the content compressed with the given encoding"""
+        if encoding == 'br':
+            return brotli.compress(
+                content,
+                quality=settings.COMPRESSION_BROTLI_QUALITY
+            )
+
+        return gzip.compress(content, settings.COMPRESSION_GZIP_LEVEL)
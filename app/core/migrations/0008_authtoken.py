@@ -0,0 +1,50 @@
+# Generated by Django 2.2.4 on 2026-10-19 05:43
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def copy_authtoken_tokens(apps, schema_editor):
+    """Carry existing rest_framework tokens over so clients stay logged in"""
+    Token = apps.get_model('authtoken', 'Token')
+    AuthToken = apps.get_model('core', 'AuthToken')
+    now = django.utils.timezone.now()
+    AuthToken.objects.bulk_create(
+        AuthToken(key=token.key, user_id=token.user_id,
+                  created=token.created, last_used=now)
+        for token in Token.objects.iterator()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_auto_20190408_1715'),
+        ('authtoken', '0002_auto_20160226_1747'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthToken',
+            fields=[
+                ('key', models.CharField(max_length=40, primary_key=True, serialize=False)),
+                ('created', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_used', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='api_token', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='authtoken',
+            index=models.Index(fields=['created'], name='core_authto_created_7ef0d1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='authtoken',
+            index=models.Index(fields=['last_used'], name='core_authto_last_us_55c6ef_idx'),
+        ),
+        migrations.RunPython(
+            copy_authtoken_tokens,
+            migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 2.2.4 on 2026-10-19 05:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_change_log'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='business',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='service',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='business',
+            index=models.Index(condition=models.Q(deleted_at__isnull=True), fields=['user'], name='core_business_live_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='business',
+            index=models.Index(condition=models.Q(deleted_at__isnull=False), fields=['deleted_at'], name='core_business_deleted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(condition=models.Q(deleted_at__isnull=True), fields=['user'], name='core_category_live_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(condition=models.Q(deleted_at__isnull=False), fields=['deleted_at'], name='core_category_deleted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='service',
+            index=models.Index(condition=models.Q(deleted_at__isnull=True), fields=['user'], name='core_service_live_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='service',
+            index=models.Index(condition=models.Q(deleted_at__isnull=False), fields=['deleted_at'], name='core_service_deleted_idx'),
+        ),
+    ]
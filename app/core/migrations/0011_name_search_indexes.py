@@ -0,0 +1,39 @@
+from django.db import migrations
+
+
+TABLES = ('core_category', 'core_service', 'core_business')
+
+
+def create_name_search_indexes(apps, schema_editor):
+    """Index upper-cased name prefixes used by admin `^name` search"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    for table in TABLES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {table}_name_upper_idx ON {table} '
+            f'(UPPER(name::text) text_pattern_ops) '
+            f'WHERE deleted_at IS NULL'
+        )
+
+
+def drop_name_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    for table in TABLES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {table}_name_upper_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_soft_delete'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            create_name_search_indexes,
+            drop_name_search_indexes
+        ),
+    ]
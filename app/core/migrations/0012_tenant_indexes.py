@@ -0,0 +1,84 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_name_search_indexes'),
+    ]
+
+    operations = [
+        # The relation tables already exist; only the model state changes
+        # from auto-created to explicit through models
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='BusinessCategory',
+                    fields=[
+                        ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('business', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.Business')),
+                        ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.Category')),
+                    ],
+                    options={
+                        'db_table': 'core_business_categories',
+                        'unique_together': {('business', 'category')},
+                    },
+                ),
+                migrations.CreateModel(
+                    name='BusinessService',
+                    fields=[
+                        ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('business', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.Business')),
+                        ('service', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.Service')),
+                    ],
+                    options={
+                        'db_table': 'core_business_services',
+                        'unique_together': {('business', 'service')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='business',
+                    name='categories',
+                    field=models.ManyToManyField(through='core.BusinessCategory', to='core.Category'),
+                ),
+                migrations.AlterField(
+                    model_name='business',
+                    name='services',
+                    field=models.ManyToManyField(through='core.BusinessService', to='core.Service'),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='businesscategory',
+            index=models.Index(fields=['category', 'business'], name='core_business_cat_rev_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='businessservice',
+            index=models.Index(fields=['service', 'business'], name='core_business_svc_rev_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='business',
+            name='core_business_live_user_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='category',
+            name='core_category_live_user_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='service',
+            name='core_service_live_user_idx',
+        ),
+        migrations.AddIndex(
+            model_name='business',
+            index=models.Index(condition=models.Q(deleted_at__isnull=True), fields=['user', 'name', 'id'], name='core_business_live_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(condition=models.Q(deleted_at__isnull=True), fields=['user', 'name', 'id'], name='core_category_live_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='service',
+            index=models.Index(condition=models.Q(deleted_at__isnull=True), fields=['user', 'name', 'id'], name='core_service_live_name_idx'),
+        ),
+    ]
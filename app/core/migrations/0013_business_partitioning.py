@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.db import migrations
+
+from core.partitioning import BusinessPartitioner
+
+
+def partition_empty_tables(apps, schema_editor):
+    """Hash partition the business tables of new PostgreSQL databases
+
+    Tables already holding data are left alone, they are moved online
+    with the partition_business command instead.
+    """
+    connection = schema_editor.connection
+    partitions = settings.BUSINESS_PARTITIONS
+    if (connection.vendor != 'postgresql' or not partitions or
+            connection.pg_version < 110000):
+        return
+
+    partitioner = BusinessPartitioner(connection, partitions)
+    if partitioner.is_partitioned() or partitioner.has_rows():
+        return
+
+    partitioner.prepare()
+    partitioner.swap(drop_old=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_tenant_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            partition_empty_tables,
+            migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 2.2.4 on 2026-10-19 06:01
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_business_location'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaxonomyTerm',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('category', 'Category'), ('service', 'Service')], max_length=8)),
+                ('name', models.CharField(max_length=255)),
+                ('normalized_name', models.CharField(max_length=255)),
+            ],
+            options={
+                'unique_together': {('kind', 'normalized_name')},
+            },
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='term',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.TaxonomyTerm'),
+        ),
+        migrations.AddField(
+            model_name='service',
+            name='term',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.TaxonomyTerm'),
+        ),
+    ]
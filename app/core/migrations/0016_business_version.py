@@ -0,0 +1,18 @@
+# Generated by Django 2.2.4 on 2026-10-19 06:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_taxonomy'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='business',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
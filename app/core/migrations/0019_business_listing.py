@@ -0,0 +1,66 @@
+# Generated by Django 2.2.4 on 2026-10-19 06:15
+
+import core.fields
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+GIN_INDEXES = (
+    ('core_listing_category_gin', 'category_ids'),
+    ('core_listing_service_gin', 'service_ids'),
+)
+
+
+def create_gin_indexes(apps, schema_editor):
+    """Index the id arrays for `overlap` filters on PostgreSQL"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    for name, column in GIN_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX {name} ON core_businesslisting USING gin ({column})'
+        )
+
+
+def drop_gin_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    for name, _ in GIN_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_webhook_subscription'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BusinessListing',
+            fields=[
+                ('id', models.PositiveIntegerField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=255)),
+                ('latitude', models.FloatField(null=True)),
+                ('longitude', models.FloatField(null=True)),
+                ('geohash', models.CharField(max_length=12)),
+                ('version', models.PositiveIntegerField()),
+                ('category_ids', core.fields.ListField(base_field=models.IntegerField())),
+                ('category_names', core.fields.ListField(base_field=models.CharField(max_length=255))),
+                ('service_ids', core.fields.ListField(base_field=models.IntegerField())),
+                ('service_names', core.fields.ListField(base_field=models.CharField(max_length=255))),
+                ('user', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='businesslisting',
+            index=models.Index(fields=['user', 'name', 'id'], name='core_listing_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='businesslisting',
+            index=models.Index(fields=['user', 'geohash'], name='core_listing_geohash_idx'),
+        ),
+        migrations.RunPython(create_gin_indexes, drop_gin_indexes),
+    ]
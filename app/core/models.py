@@ -1,9 +1,21 @@
+import binascii
+import json
 import uuid
 import os
+from datetime import timedelta
 
-from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.validators import MaxValueValidator, MinValueValidator
+from django.db import models, router, transaction
+from django.db.models.signals import m2m_changed, post_save
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.conf import settings
+from django.utils import timezone
+from django.utils.http import quote_etag
+
+from core import geo
+from core.fields import ListField
+from core.taxonomy import normalize, term_cache
 
 
 def business_image_file_path(instance, filename):
@@ -43,48 +55,822 @@ class User(AbstractBaseUser, PermissionsMixin):
     name = models.CharField(max_length=255)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    deleted_at = models.DateTimeField(null=True, blank=True)
 
     objects = UserManager()
 
     USERNAME_FIELD = 'email'
 
+    def soft_delete(self):
+        """Deactivate the user, leaving their data to purge_deleted"""
+        self.is_active = False
+        self.deleted_at = timezone.now()
+        self.save(update_fields=['is_active', 'deleted_at'])
+
+
+class TenantQuerySet(models.QuerySet):
+
+    def for_user(self, user):
+        """Return the rows owned by a user, newest name first
+
+        The ordering matches the (user, name, id) index, so the rows are
+        read straight from it.
+        """
+        return self.filter(user=user).order_by('-name', '-id')
+
+
+class SoftDeleteManager(models.Manager.from_queryset(TenantQuerySet)):
+
+    def get_queryset(self):
+        """Hide soft deleted rows"""
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
+class SoftDeleteModel(models.Model):
+    """Model whose deletes only set `deleted_at`
+
+    Deleted rows are hidden by the default manager and hard deleted in
+    bounded batches by the purge_deleted command.
+    """
+    deleted_at = models.DateTimeField(null=True, blank=True)
+
+    objects = SoftDeleteManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        abstract = True
+
+    def delete(self, using=None, keep_parents=False):
+        """Mark the row as deleted with a single UPDATE"""
+        self.deleted_at = timezone.now()
+        self.save(update_fields=['deleted_at'], using=using)
+
+    def hard_delete(self, using=None, keep_parents=False):
+        """Delete the row and cascade to related rows"""
+        return super().delete(using=using, keep_parents=keep_parents)
+
+
+def soft_delete_indexes(table):
+    """Return partial indexes for live rows by user and deleted rows by age"""
+    return [
+        # Covers the per-user lists, including the selected id and name
+        models.Index(
+            fields=['user', 'name', 'id'],
+            name=f'{table}_live_name_idx',
+            condition=models.Q(deleted_at__isnull=True)
+        ),
+        models.Index(
+            fields=['deleted_at'],
+            name=f'{table}_deleted_idx',
+            condition=models.Q(deleted_at__isnull=False)
+        ),
+    ]
+
+
+class TaxonomyTermQuerySet(models.QuerySet):
+
+    def intern(self, kind, names):
+        """Return a dict mapping each name to the id of its term
+
+        Names are resolved from the process wide cache first. Terms
+        missing from the database are created with a single INSERT that
+        skips terms created concurrently, then read back in one query and
+        cached once the transaction commits.
+        """
+        normalized = {name: normalize(name) for name in names}
+        ids = term_cache.get_many(kind, normalized.values())
+        missing = {}
+        for name, normalized_name in normalized.items():
+            if normalized_name not in ids:
+                missing.setdefault(normalized_name, name)
+
+        if missing:
+            self.bulk_create(
+                [TaxonomyTerm(kind=kind, name=name, normalized_name=key)
+                 for key, name in missing.items()],
+                ignore_conflicts=True
+            )
+            found = dict(self.filter(
+                kind=kind,
+                normalized_name__in=missing
+            ).values_list('normalized_name', 'id'))
+            # Terms inserted by a transaction that rolls back must not be
+            # cached, or later saves would point at missing rows
+            if transaction.get_connection(self.db).in_atomic_block:
+                transaction.on_commit(
+                    lambda: term_cache.set_many(kind, found),
+                    using=self.db
+                )
+            else:
+                term_cache.set_many(kind, found)
+            ids.update(found)
+
+        return {name: ids[key] for name, key in normalized.items()}
+
+
+class TaxonomyTerm(models.Model):
+    """Category or service name shared by all users
+
+    Terms are never updated, so every process can cache them.
+    """
+    CATEGORY = 'category'
+    SERVICE = 'service'
+    KIND_CHOICES = (
+        (CATEGORY, 'Category'),
+        (SERVICE, 'Service'),
+    )
+
+    kind = models.CharField(max_length=8, choices=KIND_CHOICES)
+    name = models.CharField(max_length=255)
+    normalized_name = models.CharField(max_length=255)
+
+    objects = TaxonomyTermQuerySet.as_manager()
+
+    class Meta:
+        unique_together = ('kind', 'normalized_name')
+
+    def __str__(self):
+        return self.name
+
+
+class TaxonomyAliasModel(SoftDeleteModel):
+    """User owned name, linked to a global term when GLOBAL_TAXONOMY is on
+
+    The row is the user's alias; its name stays as the user wrote it.
+    """
+    taxonomy_kind = None
+    term = models.ForeignKey(
+        'TaxonomyTerm',
+        null=True,
+        blank=True,
+        editable=False,
+        on_delete=models.SET_NULL,
+        related_name='+'
+    )
+
+    class Meta(SoftDeleteModel.Meta):
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        """Save the row, linking its name to the global taxonomy if enabled
+
+        New rows created with their term already interned, as bulk
+        creates do, are not interned again.
+        """
+        update_fields = kwargs.get('update_fields')
+        interned = self._state.adding and self.term_id is not None
+        if settings.GLOBAL_TAXONOMY and not interned and (
+                update_fields is None or 'name' in update_fields):
+            self.term_id = TaxonomyTerm.objects.intern(
+                self.taxonomy_kind,
+                [self.name]
+            )[self.name]
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'term'}
+
+        super().save(*args, **kwargs)
 
-class Category(models.Model):
+
+class Category(TaxonomyAliasModel):
     """Category to be used for businesses"""
+    taxonomy_kind = TaxonomyTerm.CATEGORY
     name = models.CharField(max_length=255)
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
     )
 
+    class Meta(TaxonomyAliasModel.Meta):
+        indexes = soft_delete_indexes('core_category')
+
     def __str__(self):
         return self.name
 
 
-class Service(models.Model):
+class Service(TaxonomyAliasModel):
     """Service provided by a business"""
+    taxonomy_kind = TaxonomyTerm.SERVICE
     name = models.CharField(max_length=255)
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
     )
 
+    class Meta(TaxonomyAliasModel.Meta):
+        indexes = soft_delete_indexes('core_service')
+
     def __str__(self):
         return self.name
 
 
-class Business(models.Model):
+class BusinessQuerySet(TenantQuerySet):
+
+    def within_bbox(self, min_lat, min_lng, max_lat, max_lng):
+        """Return businesses located inside a bounding box
+
+        The geohash ranges of the covering cells narrow the rows down on
+        the (user, geohash) index before the coordinates are compared.
+        """
+        cells = models.Q()
+        for cell in geo.covering_cells(min_lat, min_lng, max_lat, max_lng):
+            cells |= models.Q(
+                geohash__gte=cell,
+                geohash__lte=cell.ljust(geo.GEOHASH_PRECISION, 'z')
+            )
+
+        return self.filter(
+            cells,
+            latitude__range=(min_lat, max_lat),
+            longitude__range=(min_lng, max_lng)
+        )
+
+    def by_distance(self, latitude, longitude):
+        """Annotate the distance in km to a point and order nearest first"""
+        return self.annotate(
+            distance=geo.distance_km(latitude, longitude)
+        ).order_by('distance', 'id')
+
+    def near(self, latitude, longitude, radius_km):
+        """Return businesses within `radius_km` of a point, nearest first"""
+        return self.within_bbox(
+            *geo.bounding_box(latitude, longitude, radius_km)
+        ).by_distance(latitude, longitude).filter(distance__lte=radius_km)
+
+
+class Business(SoftDeleteModel):
     """Business model"""
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
     )
     name = models.CharField(max_length=255)
-    categories = models.ManyToManyField('Category')
-    services = models.ManyToManyField('Service')
+    categories = models.ManyToManyField('Category', through='BusinessCategory')
+    services = models.ManyToManyField('Service', through='BusinessService')
     image = models.ImageField(null=True, upload_to=business_image_file_path)
+    latitude = models.FloatField(
+        null=True,
+        blank=True,
+        validators=[MinValueValidator(-90), MaxValueValidator(90)]
+    )
+    longitude = models.FloatField(
+        null=True,
+        blank=True,
+        validators=[MinValueValidator(-180), MaxValueValidator(180)]
+    )
+    geohash = models.CharField(
+        max_length=geo.GEOHASH_PRECISION,
+        blank=True,
+        default='',
+        editable=False
+    )
+    version = models.PositiveIntegerField(default=1, editable=False)
+
+    objects = SoftDeleteManager.from_queryset(BusinessQuerySet)()
+
+    class Meta(SoftDeleteModel.Meta):
+        indexes = soft_delete_indexes('core_business') + [
+            models.Index(
+                fields=['user', 'geohash'],
+                name='core_business_geohash_idx',
+                condition=models.Q(deleted_at__isnull=True)
+            ),
+        ]
+
+    def __str__(self):
+        return self.name
+
+    @property
+    def etag(self):
+        """Return the entity tag of the current version"""
+        return quote_etag(f'{self.pk}-{self.version}')
+
+    def _location_geohash(self):
+        if self.latitude is None or self.longitude is None:
+            return ''
+
+        return geo.encode(self.latitude, self.longitude)
+
+    def save(self, *args, **kwargs):
+        """Save the business, bumping its version and updating its geohash"""
+        self.geohash = self._location_geohash()
+        if not self._state.adding:
+            self.version += 1
+
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = set(update_fields) | {'version'}
+            if {'latitude', 'longitude'} & update_fields:
+                update_fields.add('geohash')
+            kwargs['update_fields'] = update_fields
+
+        super().save(*args, **kwargs)
+
+    def conditional_update(self, fields, version=None, using=None):
+        """Write `fields` and bump the version with a single UPDATE
+
+        With `version` the row is only written while it still has that
+        version. Returns whether the row was written.
+        """
+        fields = set(fields)
+        if {'latitude', 'longitude'} & fields:
+            self.geohash = self._location_geohash()
+            fields.add('geohash')
+        values = {
+            self._meta.get_field(name).attname: getattr(self, name)
+            for name in fields
+        }
+
+        using = using or router.db_for_write(Business, instance=self)
+        queryset = Business.objects.using(using).filter(
+            pk=self.pk,
+            user_id=self.user_id
+        )
+        if version is not None:
+            queryset = queryset.filter(version=version)
+        if not queryset.update(version=models.F('version') + 1, **values):
+            return False
+
+        if version is None:
+            self.version = queryset.values_list('version', flat=True).get()
+        else:
+            self.version = version + 1
+        post_save.send(
+            sender=Business,
+            instance=self,
+            created=False,
+            update_fields=frozenset(fields | {'version'}),
+            raw=False,
+            using=using
+        )
+        return True
+
+    def set_related_ids(self, name, ids, using=None):
+        """Replace a many to many relation, writing only the changed rows
+
+        The current ids are read once, then removed rows are deleted and
+        new rows inserted, each with one statement and the usual
+        m2m_changed signals.
+        """
+        manager = getattr(self, name)
+        through = manager.through
+        source = manager.source_field_name
+        target = f'{manager.target_field_name}_id'
+        using = using or router.db_for_write(through, instance=self)
+        rows = through.objects.using(using).filter(**{source: self})
+
+        current = set(rows.values_list(target, flat=True))
+        ids = set(ids)
+        signal_kwargs = {
+            'sender': through,
+            'instance': self,
+            'reverse': False,
+            'model': manager.model,
+            'using': using,
+        }
+
+        removed = current - ids
+        if removed:
+            m2m_changed.send(
+                action='pre_remove',
+                pk_set=removed,
+                **signal_kwargs
+            )
+            rows.filter(**{f'{target}__in': removed}).delete()
+            m2m_changed.send(
+                action='post_remove',
+                pk_set=removed,
+                **signal_kwargs
+            )
+
+        added = ids - current
+        if added:
+            m2m_changed.send(action='pre_add', pk_set=added, **signal_kwargs)
+            through.objects.using(using).bulk_create(
+                through(**{f'{source}_id': self.pk, target: pk})
+                for pk in added
+            )
+            m2m_changed.send(action='post_add', pk_set=added, **signal_kwargs)
+
+
+class BusinessCategory(models.Model):
+    """Category assigned to a business"""
+    business = models.ForeignKey('Business', on_delete=models.CASCADE)
+    category = models.ForeignKey('Category', on_delete=models.CASCADE)
+
+    class Meta:
+        db_table = 'core_business_categories'
+        unique_together = (('business', 'category'),)
+        indexes = [
+            models.Index(
+                fields=['category', 'business'],
+                name='core_business_cat_rev_idx'
+            ),
+        ]
+
+
+class BusinessService(models.Model):
+    """Service provided by a business"""
+    business = models.ForeignKey('Business', on_delete=models.CASCADE)
+    service = models.ForeignKey('Service', on_delete=models.CASCADE)
+
+    class Meta:
+        db_table = 'core_business_services'
+        unique_together = (('business', 'service'),)
+        indexes = [
+            models.Index(
+                fields=['service', 'business'],
+                name='core_business_svc_rev_idx'
+            ),
+        ]
+
+
+class BusinessListingQuerySet(BusinessQuerySet):
+
+    def refresh(self, business_ids):
+        """Rewrite the listings of businesses from their current rows
+
+        Live businesses are locked while their listings are rewritten, so
+        concurrent refreshes of a business apply one after the other.
+        Deleted businesses lose their listing.
+        """
+        business_ids = list(business_ids)
+        with transaction.atomic(using=self.db):
+            businesses = Business.objects.using(self.db).filter(
+                id__in=business_ids
+            ).select_for_update().prefetch_related(
+                models.Prefetch(
+                    'categories',
+                    queryset=Category.objects.only('id', 'name')
+                ),
+                models.Prefetch(
+                    'services',
+                    queryset=Service.objects.only('id', 'name')
+                ),
+            )
+            listings = [
+                BusinessListing.from_business(business)
+                for business in businesses
+            ]
+            self.filter(id__in=business_ids).delete()
+            self.bulk_create(listings)
+
+
+class BusinessListing(models.Model):
+    """Denormalized copy of a live business for the list endpoint
+
+    Categories and services are kept as id and name lists on the row, so
+    listing and filtering businesses reads this table alone. Rows are kept
+    up to date by signals while BUSINESS_LISTING is enabled and rebuilt by
+    the rebuild_listings command.
+    """
+    # Same as the business id; not a foreign key since the business table
+    # may be partitioned
+    id = models.PositiveIntegerField(primary_key=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+'
+    )
+    name = models.CharField(max_length=255)
+    latitude = models.FloatField(null=True)
+    longitude = models.FloatField(null=True)
+    geohash = models.CharField(max_length=geo.GEOHASH_PRECISION)
+    version = models.PositiveIntegerField()
+    category_ids = ListField(models.IntegerField())
+    category_names = ListField(models.CharField(max_length=255))
+    service_ids = ListField(models.IntegerField())
+    service_names = ListField(models.CharField(max_length=255))
+
+    objects = BusinessListingQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', 'name', 'id'],
+                name='core_listing_name_idx'
+            ),
+            models.Index(
+                fields=['user', 'geohash'],
+                name='core_listing_geohash_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_business(cls, business):
+        """Return the listing of a business with prefetched relations"""
+        categories = business.categories.all()
+        services = business.services.all()
+        return cls(
+            id=business.id,
+            user_id=business.user_id,
+            name=business.name,
+            latitude=business.latitude,
+            longitude=business.longitude,
+            geohash=business.geohash,
+            version=business.version,
+            category_ids=[category.id for category in categories],
+            category_names=[category.name for category in categories],
+            service_ids=[service.id for service in services],
+            service_names=[service.name for service in services],
+        )
+
+    @property
+    def categories(self):
+        """Return unsaved categories rebuilt from the id and name lists"""
+        return [
+            Category(id=pk, user_id=self.user_id, name=name)
+            for pk, name in zip(self.category_ids, self.category_names)
+        ]
+
+    @property
+    def services(self):
+        """Return unsaved services rebuilt from the id and name lists"""
+        return [
+            Service(id=pk, user_id=self.user_id, name=name)
+            for pk, name in zip(self.service_ids, self.service_names)
+        ]
+
+
+class AuthTokenQuerySet(models.QuerySet):
+
+    def expired(self, now=None):
+        """Return tokens past their idle timeout or maximum age"""
+        now = now or timezone.now()
+        return self.filter(
+            models.Q(created__lt=now - AuthToken.max_age()) |
+            models.Q(last_used__lt=now - AuthToken.idle_timeout())
+        )
+
+
+class AuthToken(models.Model):
+    """Expiring API token, renewed while it is being used"""
+    key = models.CharField(max_length=40, primary_key=True)
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        related_name='api_token',
+        on_delete=models.CASCADE
+    )
+    created = models.DateTimeField(default=timezone.now)
+    last_used = models.DateTimeField(default=timezone.now)
+
+    objects = AuthTokenQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created']),
+            models.Index(fields=['last_used']),
+        ]
+
+    @staticmethod
+    def max_age():
+        return timedelta(seconds=settings.AUTH_TOKEN_MAX_AGE)
+
+    @staticmethod
+    def idle_timeout():
+        return timedelta(seconds=settings.AUTH_TOKEN_IDLE_TIMEOUT)
+
+    @staticmethod
+    def generate_key():
+        return binascii.hexlify(os.urandom(20)).decode()
+
+    def save(self, *args, **kwargs):
+        if not self.key:
+            self.key = self.generate_key()
+        return super().save(*args, **kwargs)
+
+    def is_expired(self, now=None):
+        """Return whether the token is past its idle timeout or maximum age"""
+        now = now or timezone.now()
+        return (
+            self.created < now - self.max_age() or
+            self.last_used < now - self.idle_timeout()
+        )
+
+    def __str__(self):
+        return self.key
+
+
+class ChangeQuerySet(models.QuerySet):
+
+    def record(self, user_id, model_name, object_ids, action):
+        """Append changes for objects, dropping the entries they supersede"""
+        object_ids = list(object_ids)
+        if not object_ids:
+            return
+
+        self.filter(model=model_name, object_id__in=object_ids).delete()
+        self.bulk_create(
+            Change(user_id=user_id, model=model_name,
+                   object_id=object_id, action=action)
+            for object_id in object_ids
+        )
+
+
+class Change(models.Model):
+    """Change log entry used to sync clients incrementally
+
+    The id is the sync cursor. Only the latest entry per object is kept, so
+    the log holds one row per live object plus recent tombstones.
+    """
+    UPSERT = 'upsert'
+    DELETE = 'delete'
+    ACTION_CHOICES = (
+        (UPSERT, 'Upsert'),
+        (DELETE, 'Delete'),
+    )
+
+    id = models.BigAutoField(primary_key=True)
+    # Tombstones are written while a user's objects are cascade deleted, so
+    # the log is not constrained to existing users; compact_changes drops
+    # entries of deleted users
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+'
+    )
+    model = models.CharField(max_length=32)
+    object_id = models.PositiveIntegerField()
+    action = models.CharField(max_length=6, choices=ACTION_CHOICES)
+    created = models.DateTimeField(default=timezone.now)
+
+    objects = ChangeQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'id']),
+            models.Index(fields=['model', 'object_id']),
+        ]
+
+
+class SyncHorizon(models.Model):
+    """Highest change id whose tombstone has been compacted away, per user
+
+    Clients holding an older cursor may have missed deletes and must
+    sync from scratch.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='+'
+    )
+    change_id = models.BigIntegerField()
+
+
+class OutboxEventQuerySet(models.QuerySet):
+
+    def append(self, event_type, instances, payloads):
+        """Append one event per instance, in the caller's transaction"""
+        return self.bulk_create(
+            OutboxEvent(
+                user_id=instance.user_id,
+                aggregate=instance._meta.model_name,
+                aggregate_id=instance.pk,
+                event_type=event_type,
+                payload=json.dumps(
+                    payload,
+                    cls=DjangoJSONEncoder,
+                    separators=(',', ':')
+                )
+            )
+            for instance, payload in zip(instances, payloads)
+        )
+
+
+class OutboxEvent(models.Model):
+    """Domain event waiting to be relayed to downstream systems
+
+    Events are appended in the transaction of the write they describe and
+    deleted once the relay_outbox command has delivered them. The id
+    orders them, within and across users.
+    """
+    CREATED = 'created'
+    UPDATED = 'updated'
+    DELETED = 'deleted'
+    EVENT_TYPE_CHOICES = (
+        (CREATED, 'Created'),
+        (UPDATED, 'Updated'),
+        (DELETED, 'Deleted'),
+    )
+
+    id = models.BigAutoField(primary_key=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+'
+    )
+    aggregate = models.CharField(max_length=32)
+    aggregate_id = models.PositiveIntegerField()
+    event_type = models.CharField(max_length=7, choices=EVENT_TYPE_CHOICES)
+    payload = models.TextField()
+    created = models.DateTimeField(default=timezone.now)
+
+    objects = OutboxEventQuerySet.as_manager()
+
+    def to_message(self):
+        """Return the event as delivered to sinks"""
+        return {
+            'id': self.id,
+            'user': self.user_id,
+            'aggregate': self.aggregate,
+            'aggregate_id': self.aggregate_id,
+            'type': self.event_type,
+            'payload': json.loads(self.payload),
+            'created': self.created.isoformat(),
+        }
+
 
+class WebhookSubscription(models.Model):
+    """Endpoint notified when the user's businesses change
+
+    Deliveries are made by business.webhooks.WebhookDispatcher. Failed
+    deliveries are counted and the subscription is deactivated after
+    WEBHOOK_MAX_FAILURES in a row.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE
+    )
+    url = models.URLField(max_length=500)
+    secret = models.CharField(max_length=64, blank=True)
+    active = models.BooleanField(default=True)
+    failures = models.PositiveIntegerField(default=0, editable=False)
+    created = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return self.url
+
+
+class JobQuerySet(models.QuerySet):
+
+    def runnable(self, now=None):
+        """Return jobs that are due and not claimed, in the order to run"""
+        now = now or timezone.now()
+        return self.filter(
+            failed_at__isnull=True,
+            available_at__lte=now
+        ).order_by('-priority', 'available_at', 'id')
+
+    def claim(self, limit, visibility_timeout):
+        """Claim up to `limit` runnable jobs for `visibility_timeout` seconds
+
+        Rows locked by other workers are skipped. Claimed jobs are hidden
+        until the timeout passes, so the jobs of a worker that died are
+        run again.
+        """
+        now = timezone.now()
+        hidden_until = now + timedelta(seconds=visibility_timeout)
+        with transaction.atomic(using=self.db):
+            jobs = list(
+                self.runnable(now).select_for_update(skip_locked=True)[:limit]
+            )
+            self.filter(id__in=[job.id for job in jobs]).update(
+                available_at=hidden_until,
+                attempts=models.F('attempts') + 1
+            )
+
+        for job in jobs:
+            job.available_at = hidden_until
+            job.attempts += 1
+
+        return jobs
+
+
+class Job(models.Model):
+    """Deferred call of a task registered in core.jobs
+
+    Jobs run in priority order, higher first, by the run_worker command
+    and are deleted once they succeed. Failed jobs are retried after an
+    exponential backoff until they used max_attempts; then failed_at is
+    set and they are kept for inspection.
+    """
+    id = models.BigAutoField(primary_key=True)
+    name = models.CharField(max_length=100)
+    kwargs = models.TextField(default='{}')
+    priority = models.SmallIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    last_error = models.TextField(blank=True)
+    failed_at = models.DateTimeField(null=True, blank=True)
+    created = models.DateTimeField(default=timezone.now)
+
+    objects = JobQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['-priority', 'available_at'],
+                name='core_job_runnable_idx',
+                condition=models.Q(failed_at__isnull=True)
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.name} #{self.id}'
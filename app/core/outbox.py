@@ -0,0 +1,161 @@
+import hashlib
+import hmac
+import ipaddress
+import json
+import os
+import socket
+import uuid
+from http.client import HTTPSConnection
+from urllib.parse import urlsplit
+from urllib.request import (
+    HTTPDefaultErrorHandler, HTTPErrorProcessor, HTTPSHandler,
+    OpenerDirector, Request, urlopen
+)
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class FileSink:
+    """Append events to a file as JSON lines"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def send(self, messages):
+        with open(self.path, 'a') as f:
+            for message in messages:
+                f.write(json.dumps(message, separators=(',', ':')) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class BlockedAddress(OSError):
+    """Raised for URLs that are not https or reach non-public addresses"""
+
+
+def public_addresses(host, port):
+    """Return the addresses of a host, all of which must be public
+
+    Loopback, private, link-local, reserved and multicast addresses raise
+    BlockedAddress, so tenants cannot make requests into the network.
+    """
+    addresses = [
+        info[4][0]
+        for info in socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    ]
+    for address in addresses:
+        ip = ipaddress.ip_address(address.split('%')[0])
+        if not ip.is_global or ip.is_multicast:
+            raise BlockedAddress(f'{host} resolves to a non-public address.')
+
+    return addresses
+
+
+def check_public_url(url):
+    """Raise BlockedAddress unless url is https to a public host"""
+    parts = urlsplit(url)
+    if parts.scheme != 'https' or not parts.hostname:
+        raise BlockedAddress('Only https URLs are allowed.')
+    public_addresses(parts.hostname, parts.port or 443)
+
+
+class PublicHTTPSConnection(HTTPSConnection):
+    """HTTPS connection made only to public addresses
+
+    The host is resolved and checked once and the socket is opened to the
+    checked address, so DNS cannot point it elsewhere in between.
+    """
+
+    def connect(self):
+        address = public_addresses(self.host, self.port)[0]
+        sock = socket.create_connection(
+            (address, self.port),
+            self.timeout,
+            self.source_address
+        )
+        self.sock = self._context.wrap_socket(sock, server_hostname=self.host)
+
+
+class PublicHTTPSHandler(HTTPSHandler):
+
+    def https_open(self, req):
+        return self.do_open(PublicHTTPSConnection, req, context=self._context)
+
+
+def public_opener():
+    """Return an opener for https URLs on public hosts only
+
+    Redirects are not followed, since they could lead anywhere.
+    """
+    opener = OpenerDirector()
+    for handler in (PublicHTTPSHandler(), HTTPDefaultErrorHandler(),
+                    HTTPErrorProcessor()):
+        opener.add_handler(handler)
+
+    return opener
+
+
+class WebhookSink:
+    """POST each batch of events to a URL as {"events": [...]}
+
+    With a `secret` the body is signed with HMAC-SHA256 in the
+    X-Outbox-Signature header. Any non-2xx response fails the batch.
+    With `public_only` the URL must be https to a public address and
+    redirects are not followed.
+    """
+
+    def __init__(self, url, secret='', timeout=10, public_only=False):
+        self.url = url
+        self.secret = secret
+        self.timeout = timeout
+        self.public_only = public_only
+
+    def send(self, messages):
+        body = json.dumps(
+            {'events': messages},
+            separators=(',', ':')
+        ).encode()
+        headers = {'Content-Type': 'application/json'}
+        if self.secret:
+            digest = hmac.new(
+                self.secret.encode(),
+                body,
+                hashlib.sha256
+            ).hexdigest()
+            headers['X-Outbox-Signature'] = f'sha256={digest}'
+
+        request = Request(self.url, data=body, headers=headers, method='POST')
+        if self.public_only:
+            check_public_url(self.url)
+            public_opener().open(request, timeout=self.timeout).close()
+        else:
+            urlopen(request, timeout=self.timeout).close()
+
+
+class SpoolSink:
+    """Write each batch to a spool directory for local consumers
+
+    Batches are written to a temporary name and renamed, so consumers only
+    ever see complete files. Names sort in delivery order.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def send(self, messages):
+        name = f'{messages[0]["id"]:020d}-{uuid.uuid4().hex[:8]}.json'
+        path = os.path.join(self.directory, name)
+        temp_path = os.path.join(self.directory, f'.{name}.tmp')
+        with open(temp_path, 'w') as f:
+            json.dump(messages, f, separators=(',', ':'))
+            f.flush()
+            os.fsync(f.fileno())
+        os.rename(temp_path, path)
+
+
+def get_sink():
+    """Return the sink configured by OUTBOX_SINK"""
+    config = settings.OUTBOX_SINK
+    return import_string(config['BACKEND'])(**config.get('OPTIONS', {}))
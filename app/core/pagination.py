@@ -0,0 +1,52 @@
+import json
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that estimates large counts from Postgres statistics
+
+    Unfiltered tables are estimated from pg_class.reltuples and filtered
+    querysets from the planner's row estimate. Small results, and other
+    databases, still get an exact COUNT(*).
+    """
+    exact_count_threshold = 10000
+
+    @cached_property
+    def count(self):
+        """Return the estimated number of objects when it is large"""
+        estimate = self._estimate_count()
+        if estimate is None or estimate < self.exact_count_threshold:
+            return super().count
+
+        return estimate
+
+    def _estimate_count(self):
+        """Return the planner's estimate for the object list, if available"""
+        query = getattr(self.object_list, 'query', None)
+        if query is None:
+            return None
+        connection = connections[self.object_list.db]
+        if connection.vendor != 'postgresql':
+            return None
+
+        with connection.cursor() as cursor:
+            if not query.where:
+                cursor.execute(
+                    'SELECT reltuples::bigint FROM pg_class '
+                    'WHERE relname = %s',
+                    [self.object_list.model._meta.db_table]
+                )
+                row = cursor.fetchone()
+                return row[0] if row else None
+
+            sql, params = query.sql_with_params()
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+
+        return plan[0]['Plan']['Plan Rows']
@@ -0,0 +1,316 @@
+import re
+
+# Tables that are hash partitioned and the column they are partitioned on.
+# The relation tables carry no user_id, so they are partitioned on the
+# business, which keeps all relations of one business in one partition.
+PARTITIONED_TABLES = (
+    ('core_business', 'user_id'),
+    ('core_business_categories', 'business_id'),
+    ('core_business_services', 'business_id'),
+)
+
+INDEX_RE = re.compile(r'^CREATE (UNIQUE )?INDEX (\S+) ON (?:ONLY )?\S+ (.*)$')
+
+
+def staged(name):
+    """Return the name used for a relation while it is being built"""
+    return f'{name[:59]}_new'
+
+
+def retired(name):
+    """Return the name given to a relation once it has been replaced"""
+    return f'{name[:59]}_old'
+
+
+class TablePartitioner:
+    """Rebuild one table as a hash partitioned copy of itself
+
+    The copy is filled in batches while a trigger mirrors every write on
+    the original, then both are swapped by renaming them under a short
+    lock. The original is kept as `<table>_old` unless it is dropped.
+    """
+
+    def __init__(self, table, key, partitions):
+        self.table = table
+        self.key = key
+        self.partitions = partitions
+        self.staging = staged(table)
+        self.trigger = staged(f'{table}_sync')
+
+    def create_sql(self, indexes, foreign_keys, unique_constraints=()):
+        """Return the statements building the empty partitioned table
+
+        `indexes` and `foreign_keys` are (name, definition) pairs of the
+        original table, without its primary key and unique constraints;
+        `unique_constraints` are (name, columns) pairs.
+        """
+        statements = [
+            f'CREATE TABLE {self.staging} (LIKE {self.table} '
+            f'INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+            f'PARTITION BY HASH ({self.key})',
+        ]
+        statements += [
+            f'CREATE TABLE {self.table}_part{remainder} '
+            f'PARTITION OF {self.staging} FOR VALUES WITH '
+            f'(MODULUS {self.partitions}, REMAINDER {remainder})'
+            for remainder in range(self.partitions)
+        ]
+        # Unique keys of a partitioned table must include the partition key
+        statements.append(
+            f'ALTER TABLE {self.staging} ADD CONSTRAINT '
+            f'{staged(self.table + "_pkey")} PRIMARY KEY (id, {self.key})'
+        )
+        statements += [
+            self.unique_sql(name, columns)
+            for name, columns in unique_constraints
+        ]
+        statements += [self.index_sql(definition) for _, definition in indexes]
+        statements += [
+            f'ALTER TABLE {self.staging} ADD CONSTRAINT {name} {definition}'
+            for name, definition in foreign_keys
+        ]
+
+        return statements
+
+    def unique_sql(self, name, columns):
+        """Return a unique constraint recreated on the partitioned table
+
+        It stays a constraint, so migrations can alter or drop it by name,
+        and gains the partition key if it lacks it.
+        """
+        columns = list(columns)
+        if self.key not in columns:
+            columns.append(self.key)
+
+        return (f'ALTER TABLE {self.staging} ADD CONSTRAINT {staged(name)} '
+                f'UNIQUE ({", ".join(columns)})')
+
+    def index_sql(self, definition):
+        """Return an index definition rewritten for the partitioned table"""
+        unique, name, rest = INDEX_RE.match(definition).groups()
+        return (f'CREATE {unique or ""}INDEX {staged(name)} '
+                f'ON {self.staging} {rest}')
+
+    def trigger_sql(self):
+        """Return the statements mirroring writes into the partitioned table"""
+        return [
+            f'CREATE FUNCTION {self.trigger}() RETURNS trigger '
+            f'LANGUAGE plpgsql AS $$\n'
+            f'BEGIN\n'
+            f"    IF TG_OP <> 'INSERT' THEN\n"
+            f'        DELETE FROM {self.staging}\n'
+            f'        WHERE id = OLD.id AND {self.key} = OLD.{self.key};\n'
+            f'    END IF;\n'
+            f"    IF TG_OP <> 'DELETE' THEN\n"
+            f'        INSERT INTO {self.staging} SELECT NEW.*\n'
+            f'        ON CONFLICT DO NOTHING;\n'
+            f'    END IF;\n'
+            f'    RETURN NULL;\n'
+            f'END\n'
+            f'$$',
+            f'CREATE TRIGGER {self.trigger} '
+            f'AFTER INSERT OR UPDATE OR DELETE ON {self.table} '
+            f'FOR EACH ROW EXECUTE PROCEDURE {self.trigger}()',
+        ]
+
+    def copy_sql(self):
+        """Return the statement copying one id range into the new table"""
+        # Locking the source rows makes concurrent updates wait for the
+        # batch, so the trigger always replaces what the batch copied
+        return (
+            f'INSERT INTO {self.staging} SELECT * FROM {self.table} '
+            f'WHERE id > %s AND id <= %s FOR SHARE ON CONFLICT DO NOTHING'
+        )
+
+    def swap_sql(self, index_names, sequence, constraint_names=()):
+        """Return the statements putting the partitioned table in place"""
+        statements = [
+            f'DROP TRIGGER {self.trigger} ON {self.table}',
+            f'DROP FUNCTION {self.trigger}()',
+            f'ALTER TABLE {self.table} RENAME TO {retired(self.table)}',
+        ]
+        index_names = [f'{self.table}_pkey'] + list(index_names)
+        statements += [
+            f'ALTER INDEX {name} RENAME TO {retired(name)}'
+            for name in index_names
+        ]
+        statements += [
+            f'ALTER TABLE {retired(self.table)} '
+            f'RENAME CONSTRAINT {name} TO {retired(name)}'
+            for name in constraint_names
+        ]
+        statements.append(f'ALTER TABLE {self.staging} RENAME TO {self.table}')
+        statements += [
+            f'ALTER INDEX {staged(name)} RENAME TO {name}'
+            for name in index_names
+        ]
+        statements += [
+            f'ALTER TABLE {self.table} '
+            f'RENAME CONSTRAINT {staged(name)} TO {name}'
+            for name in constraint_names
+        ]
+        if sequence:
+            statements.append(
+                f'ALTER SEQUENCE {sequence} OWNED BY {self.table}.id'
+            )
+
+        return statements
+
+
+class BusinessPartitioner:
+    """Hash partition the business tables of a Postgres database
+
+    `prepare()` and `swap()` should each run in their own transaction and
+    `copy()` in autocommit, so every batch commits on its own. Only
+    `swap()` blocks writers, and only while renaming.
+    """
+
+    def __init__(self, connection, partitions):
+        self.connection = connection
+        self.tables = [
+            TablePartitioner(table, key, partitions)
+            for table, key in PARTITIONED_TABLES
+        ]
+        self.names = {table for table, _ in PARTITIONED_TABLES}
+
+    def _fetch(self, sql, params=None):
+        with self.connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    def _execute(self, statements):
+        with self.connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+
+    def is_partitioned(self):
+        """Return whether the business table is already partitioned"""
+        rows = self._fetch(
+            "SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)",
+            [self.tables[0].table]
+        )
+        return bool(rows) and rows[0][0] == 'p'
+
+    def is_prepared(self):
+        """Return whether the partitioned tables have been created"""
+        return self._fetch(
+            'SELECT to_regclass(%s)', [self.tables[0].staging]
+        )[0][0] is not None
+
+    def has_rows(self):
+        """Return whether any of the tables holds data"""
+        return any(
+            self._fetch(f'SELECT EXISTS (SELECT 1 FROM {table.table})')[0][0]
+            for table in self.tables
+        )
+
+    def indexes(self, table):
+        """Return the (name, definition) of a table's secondary indexes
+
+        Indexes backing the primary key or a unique constraint are left
+        out; they are recreated with their constraint.
+        """
+        return self._fetch(
+            "SELECT indexname, indexdef FROM pg_indexes "
+            "WHERE tablename = %s AND indexname NOT IN ("
+            "SELECT conname FROM pg_constraint "
+            "WHERE conrelid = to_regclass(%s) AND contype IN ('p', 'u')"
+            ") ORDER BY indexname",
+            [table, table]
+        )
+
+    def unique_constraints(self, table):
+        """Return the (name, columns) of a table's unique constraints"""
+        return self._fetch(
+            "SELECT conname, ARRAY("
+            "SELECT attname::text FROM unnest(conkey) "
+            "WITH ORDINALITY AS k(attnum, position) "
+            "JOIN pg_attribute a ON a.attrelid = conrelid "
+            "AND a.attnum = k.attnum ORDER BY position"
+            ") FROM pg_constraint "
+            "WHERE contype = 'u' AND conrelid = to_regclass(%s) "
+            "ORDER BY conname",
+            [table]
+        )
+
+    def foreign_keys(self, table):
+        """Return the (name, definition) of a table's foreign keys
+
+        Keys pointing at another partitioned table are left out, as they
+        could not reference its new primary key.
+        """
+        rows = self._fetch(
+            "SELECT conname, pg_get_constraintdef(oid), "
+            "confrelid::regclass::text FROM pg_constraint "
+            "WHERE contype = 'f' AND conrelid = to_regclass(%s) "
+            "ORDER BY conname",
+            [table]
+        )
+        return [(name, definition) for name, definition, target in rows
+                if target not in self.names]
+
+    def prepare(self):
+        """Create the empty partitioned tables and start mirroring writes"""
+        for table in self.tables:
+            self._execute(table.create_sql(
+                self.indexes(table.table),
+                self.foreign_keys(table.table),
+                self.unique_constraints(table.table)
+            ))
+            self._execute(table.trigger_sql())
+
+    def copy(self, batch_size):
+        """Yield (table, copied rows) for each batch copied
+
+        Rows written after copying started reach the new tables through
+        the triggers, so only ids up to the current maximum are copied.
+        """
+        with self.connection.cursor() as cursor:
+            for table in self.tables:
+                cursor.execute(
+                    f'SELECT COALESCE(MAX(id), 0) FROM {table.table}'
+                )
+                last_id = cursor.fetchone()[0]
+                start = 0
+                while start < last_id:
+                    cursor.execute(table.copy_sql(),
+                                   [start, start + batch_size])
+                    start += batch_size
+                    yield table.table, cursor.rowcount
+
+    def swap(self, drop_old=False):
+        """Replace the original tables by the partitioned ones"""
+        names = ', '.join(table.table for table in self.tables)
+        self._execute([f'LOCK TABLE {names} IN ACCESS EXCLUSIVE MODE'])
+
+        # A partitioned table cannot be referenced by its id alone, so
+        # foreign keys into it are dropped; deletes cascade in Django
+        incoming = self._fetch(
+            "SELECT conrelid::regclass::text, conname FROM pg_constraint "
+            "WHERE contype = 'f' AND confrelid::regclass::text = ANY(%s)",
+            [list(self.names)]
+        )
+        self._execute(
+            f'ALTER TABLE {table} DROP CONSTRAINT {name}'
+            for table, name in incoming
+        )
+
+        for table in self.tables:
+            sequence = self._fetch(
+                "SELECT pg_get_serial_sequence(%s, 'id')", [table.table]
+            )[0][0]
+            index_names = [name for name, _ in self.indexes(table.table)]
+            constraint_names = [
+                name for name, _ in self.unique_constraints(table.table)
+            ]
+            self._execute(table.swap_sql(
+                index_names,
+                sequence,
+                constraint_names
+            ))
+
+        if drop_old:
+            retired_names = ', '.join(
+                retired(table.table) for table in self.tables
+            )
+            self._execute([f'DROP TABLE {retired_names}'])
@@ -0,0 +1,141 @@
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+class GenerationCache:
+    """Per-user query results kept in the shared cache
+
+    Results are stored under the user's current generation. Changes to a
+    user's businesses, categories or services bump the generation, right
+    away and again once their transaction commits, so results read before
+    the commit are not reused either. Results expire after
+    BUSINESS_ID_CACHE_TIMEOUT seconds.
+    """
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+
+    def _generation_key(self, user_id):
+        return f'{self.prefix}_generation:{user_id}'
+
+    def generation(self, user_id):
+        """Return the user's generation, starting one if none is cached"""
+        key = self._generation_key(user_id)
+        generation = cache.get(key)
+        if generation is None:
+            # A clock based start cannot repeat a generation the cache
+            # evicted
+            cache.add(key, time.time_ns(), None)
+            generation = cache.get(key)
+
+        return generation
+
+    def invalidate(self, user_id):
+        """Drop the user's cached results"""
+        self._bump(user_id)
+        if transaction.get_connection().in_atomic_block:
+            transaction.on_commit(lambda: self._bump(user_id))
+
+    def _bump(self, user_id):
+        key = self._generation_key(user_id)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), None)
+
+    def key(self, user_id, params):
+        """Return the cache key of a result for canonical `params`"""
+        digest = hashlib.md5(repr(params).encode()).hexdigest()
+        return f'{self.prefix}:{user_id}:{self.generation(user_id)}:{digest}'
+
+    def get_or_set(self, user_id, params, compute):
+        """Return the cached result for `params`, computing it when missing"""
+        key = self.key(user_id, params)
+        result = cache.get(key)
+        if result is None:
+            result = compute()
+            cache.set(key, result, settings.BUSINESS_ID_CACHE_TIMEOUT)
+
+        return result
+
+
+business_id_cache = GenerationCache('business_ids')
+
+
+class RepresentationCache:
+    """Serialized objects kept in the shared cache by id and version
+
+    Each serializer `variant` has its own keys. Every change shown in a
+    representation, including relation changes and renames or deletes of
+    related objects, bumps the version, so entries are never invalidated.
+    Old versions expire after BUSINESS_REPR_CACHE_TIMEOUT seconds.
+    """
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+
+    def _key(self, variant, pk, version):
+        return f'{self.prefix}:{variant}:{pk}:{version}'
+
+    def get_many(self, variant, pairs):
+        """Return cached representations of (id, version) pairs by id"""
+        keys = {self._key(variant, pk, version): pk for pk, version in pairs}
+        found = cache.get_many(keys)
+
+        return {keys[key]: data for key, data in found.items()}
+
+    def set_many(self, variant, representations):
+        """Cache representations given by (id, version)"""
+        cache.set_many({
+            self._key(variant, pk, version): data
+            for (pk, version), data in representations.items()
+        }, settings.BUSINESS_REPR_CACHE_TIMEOUT)
+
+
+business_repr_cache = RepresentationCache('business_repr')
+
+
+class OwnedIdCache:
+    """Process wide cache of primary keys known to belong to a user
+
+    Entries expire after RELATED_ID_CACHE_TIMEOUT seconds. Deletes in this
+    process discard their entry right away; other processes see them once
+    the entry expires.
+    """
+
+    def __init__(self, max_size=100000):
+        self.max_size = max_size
+        self._expires = {}
+        self._lock = threading.Lock()
+
+    def get_many(self, label, user_id, ids):
+        """Return the ids that are cached and not expired"""
+        now = time.monotonic()
+        expires = self._expires
+        return {pk for pk in ids if expires.get((label, user_id, pk), 0) > now}
+
+    def set_many(self, label, user_id, ids):
+        """Remember that the user owns the given ids"""
+        expires_at = time.monotonic() + settings.RELATED_ID_CACHE_TIMEOUT
+        with self._lock:
+            if len(self._expires) + len(ids) > self.max_size:
+                self._expires = {}
+            self._expires.update(
+                ((label, user_id, pk), expires_at) for pk in ids
+            )
+
+    def discard(self, label, user_id, pk):
+        with self._lock:
+            self._expires.pop((label, user_id, pk), None)
+
+    def clear(self):
+        with self._lock:
+            self._expires = {}
+
+
+owned_id_cache = OwnedIdCache()
@@ -0,0 +1,87 @@
+from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
+
+from core.querycache import owned_id_cache
+
+
+class UserPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Primary key relation limited to rows owned by the requesting user
+
+    With `many=True` the submitted ids are validated together by
+    UserManyRelatedField.
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(
+            user=self.context['request'].user
+        )
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+
+        return UserManyRelatedField(**list_kwargs)
+
+
+class UserManyRelatedField(serializers.ManyRelatedField):
+    """Many relation validating all submitted ids with at most one query
+
+    Ids are looked up in a per-request set, then in the process wide
+    cache, and only the rest in the database. The validated value is the
+    list of ids, which related managers accept as is.
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+
+        ids = []
+        for value in data:
+            if isinstance(value, bool):
+                self.child_relation.fail(
+                    'incorrect_type',
+                    data_type=type(value).__name__
+                )
+            try:
+                ids.append(int(value))
+            except (TypeError, ValueError):
+                self.child_relation.fail(
+                    'incorrect_type',
+                    data_type=type(value).__name__
+                )
+
+        owned = self._owned_ids(set(ids))
+        for pk in ids:
+            if pk not in owned:
+                self.child_relation.fail('does_not_exist', pk_value=pk)
+
+        return list(dict.fromkeys(ids))
+
+    def _owned_ids(self, ids):
+        """Return which of the ids exist and belong to the requesting user"""
+        queryset = self.child_relation.get_queryset()
+        label = queryset.model._meta.label
+        request = self.context['request']
+        user_id = request.user.pk
+
+        request_ids = getattr(request, '_owned_ids', None)
+        if request_ids is None:
+            request_ids = request._owned_ids = set()
+
+        owned = {pk for pk in ids if (label, pk) in request_ids}
+        owned |= owned_id_cache.get_many(label, user_id, ids - owned)
+        missing = ids - owned
+        if missing:
+            found = set(
+                queryset.filter(pk__in=missing).values_list('pk', flat=True)
+            )
+            owned_id_cache.set_many(label, user_id, found)
+            owned |= found
+
+        request_ids.update((label, pk) for pk in owned)
+        return owned
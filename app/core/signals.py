@@ -0,0 +1,188 @@
+from django.conf import settings
+from django.db.models import F
+from django.db.models.signals import (
+    post_save, post_delete, pre_delete, m2m_changed
+)
+from django.dispatch import receiver
+
+from .models import Category, Service, Business, BusinessListing, Change
+from .querycache import business_id_cache, owned_id_cache
+
+
+def record_change(instance, action):
+    """Append a change log entry for a synced object"""
+    business_id_cache.invalidate(instance.user_id)
+    Change.objects.record(
+        instance.user_id,
+        instance._meta.model_name,
+        [instance.pk],
+        action
+    )
+
+
+def record_business_upserts(user_id, business_ids):
+    """Append upserts for businesses whose relations changed"""
+    business_id_cache.invalidate(user_id)
+    Change.objects.record(
+        user_id,
+        Business._meta.model_name,
+        business_ids,
+        Change.UPSERT
+    )
+
+
+def record_related_business_upserts(instance):
+    """Append upserts for businesses using a category or service"""
+    business_ids = instance.business_set.values_list('id', flat=True)
+    record_business_upserts(instance.user_id, business_ids)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Service)
+@receiver(post_save, sender=Business)
+def log_save(sender, instance, raw=False, **kwargs):
+    """Log inserts, updates and soft deletes of synced objects"""
+    if raw:
+        return
+
+    if instance.deleted_at is None:
+        record_change(instance, Change.UPSERT)
+    else:
+        record_change(instance, Change.DELETE)
+        if sender is not Business:
+            record_related_business_upserts(instance)
+
+
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Service)
+@receiver(post_delete, sender=Business)
+def log_delete(sender, instance, **kwargs):
+    """Log a tombstone for hard deleted objects not already soft deleted"""
+    if instance.deleted_at is None:
+        record_change(instance, Change.DELETE)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Service)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Service)
+def forget_owned_id(sender, instance, **kwargs):
+    """Stop treating deleted categories and services as valid relations"""
+    if kwargs.get('signal') is post_delete or instance.deleted_at is not None:
+        owned_id_cache.discard(
+            sender._meta.label,
+            instance.user_id,
+            instance.pk
+        )
+
+
+@receiver(pre_delete, sender=Category)
+@receiver(pre_delete, sender=Service)
+def log_related_business_changes(sender, instance, **kwargs):
+    """Log businesses losing a category or service that is being deleted"""
+    if instance.deleted_at is None:
+        record_related_business_upserts(instance)
+
+
+@receiver(m2m_changed, sender=Business.categories.through)
+@receiver(m2m_changed, sender=Business.services.through)
+def log_relation_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """Log businesses whose categories or services changed"""
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            record_business_upserts(instance.user_id, [instance.pk])
+    elif action in ('post_add', 'post_remove'):
+        record_business_upserts(instance.user_id, pk_set)
+    elif action == 'pre_clear':
+        business_ids = instance.business_set.values_list('id', flat=True)
+        record_business_upserts(instance.user_id, business_ids)
+
+
+def refresh_listings(business_ids):
+    """Rewrite business listings while the read model is enabled"""
+    if settings.BUSINESS_LISTING and business_ids:
+        BusinessListing.objects.refresh(business_ids)
+
+
+def bump_versions(business_ids):
+    """Give businesses a new version with one UPDATE
+
+    Representations are cached by version, so a reader that loaded the
+    old relations before the change committed cannot cache them under
+    the version readers see afterwards.
+    """
+    Business.all_objects.filter(id__in=business_ids).update(
+        version=F('version') + 1
+    )
+
+
+def relations_changed(business_ids):
+    """Update copies of businesses whose categories or services changed"""
+    business_ids = list(business_ids)
+    if not business_ids:
+        return
+
+    bump_versions(business_ids)
+    refresh_listings(business_ids)
+
+
+@receiver(post_save, sender=Business)
+def refresh_business_listing(sender, instance, raw=False, **kwargs):
+    """Copy saved businesses to their listing"""
+    if not raw:
+        refresh_listings([instance.pk])
+
+
+@receiver(post_delete, sender=Business)
+def delete_business_listing(sender, instance, **kwargs):
+    """Drop the listing of hard deleted businesses"""
+    if settings.BUSINESS_LISTING:
+        BusinessListing.objects.filter(id=instance.pk).delete()
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Service)
+def copy_related_changes(sender, instance, created=False, raw=False,
+                         update_fields=None, **kwargs):
+    """Copy renamed or deleted categories and services to businesses"""
+    if raw or created:
+        return
+    if update_fields is not None and \
+            not {'name', 'deleted_at'} & set(update_fields):
+        return
+
+    relations_changed(instance.business_set.values_list('id', flat=True))
+
+
+@receiver(pre_delete, sender=Category)
+@receiver(pre_delete, sender=Service)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Service)
+def copy_related_deletes(sender, instance, signal, **kwargs):
+    """Copy hard deletes of categories and services to businesses"""
+    if signal is pre_delete:
+        instance._business_ids = list(
+            instance.business_set.values_list('id', flat=True)
+        )
+    else:
+        relations_changed(getattr(instance, '_business_ids', []))
+
+
+@receiver(m2m_changed, sender=Business.categories.through)
+@receiver(m2m_changed, sender=Business.services.through)
+def copy_relation_changes(sender, instance, action, reverse, pk_set,
+                          **kwargs):
+    """Copy changed categories and services of businesses"""
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            bump_versions([instance.pk])
+            instance.version += 1
+            refresh_listings([instance.pk])
+    elif action in ('post_add', 'post_remove'):
+        relations_changed(pk_set)
+    elif action == 'pre_clear':
+        instance._business_ids = list(
+            instance.business_set.values_list('id', flat=True)
+        )
+    elif action == 'post_clear':
+        relations_changed(getattr(instance, '_business_ids', []))
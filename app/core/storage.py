@@ -0,0 +1,277 @@
+import base64
+import hashlib
+import hmac
+import posixpath
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone as dt_timezone
+from email.utils import parsedate_to_datetime
+from urllib.error import HTTPError
+from urllib.parse import quote, urlsplit
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, Storage
+from django.db import connection
+from django.utils.deconstruct import deconstructible
+
+
+def content_digest(content):
+    """Return the sha256 hex digest of a file, leaving it rewound"""
+    digest = hashlib.sha256()
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+
+    return digest.hexdigest()
+
+
+def lock_stored_file(name):
+    """Lock a stored file name until the current transaction ends
+
+    Content addressed files are shared, so a file found unreferenced may
+    be attached again before it is deleted. Code deleting unreferenced
+    files and code attaching existing ones both take this lock, and
+    check the references or the file only once they hold it. The lock is
+    a PostgreSQL advisory lock; other databases do not take one.
+    """
+    if connection.vendor != 'postgresql':
+        return
+
+    digest = hashlib.blake2b(name.encode(), digest_size=8).digest()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT pg_advisory_xact_lock(%s)',
+            [int.from_bytes(digest, 'big', signed=True)]
+        )
+
+
+def content_addressed_name(name, digest):
+    """Return the storage name for content with the given digest
+
+    The directory and extension of `name` are kept, the file name is
+    replaced by the digest and fanned out by its first two characters.
+    """
+    directory, filename = posixpath.split(name)
+    ext = posixpath.splitext(filename)[1].lower()
+
+    return posixpath.join(directory, digest[:2], f'{digest}{ext}')
+
+
+class ContentAddressedMixin:
+    """Store files under the hash of their content
+
+    Saving content that is already stored returns the existing name
+    without writing anything, so identical uploads share one file. Files
+    may therefore be referenced by several rows and are only removed by
+    the gc_media command.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = ContentFile(content.read(), name)
+
+        name = content_addressed_name(name, content_digest(content))
+        if self.exists(name):
+            return name
+
+        return super().save(name, content, max_length=max_length)
+
+
+@deconstructible
+class ContentAddressedStorage(ContentAddressedMixin, FileSystemStorage):
+    """File system storage deduplicating identical files"""
+
+
+class S3Presigner:
+    """Sign S3 requests into URLs with AWS signature version 4
+
+    Works with S3 and S3-compatible servers such as MinIO. Path style
+    addressing puts the bucket in the URL path, virtual style in the host.
+    """
+    algorithm = 'AWS4-HMAC-SHA256'
+
+    def __init__(self, endpoint_url, bucket, access_key, secret_key,
+                 region='us-east-1', addressing_style='path'):
+        self.endpoint_url = endpoint_url.rstrip('/')
+        self.bucket = bucket
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.addressing_style = addressing_style
+
+    def presign(self, method, key='', expires=3600, query=None,
+                headers=None, now=None):
+        """Return a URL allowing `method` on `key` for `expires` seconds
+
+        Any `headers` are signed and must be sent with the request.
+        """
+        endpoint = urlsplit(self.endpoint_url)
+        host = endpoint.netloc
+        path = f'/{key}'
+        if self.addressing_style == 'virtual':
+            host = f'{self.bucket}.{host}'
+        else:
+            path = f'/{self.bucket}{path}' if key else f'/{self.bucket}'
+
+        now = now or datetime.now(dt_timezone.utc)
+        amz_date = now.strftime('%Y%m%dT%H%M%SZ')
+        scope = f"{now.strftime('%Y%m%d')}/{self.region}/s3/aws4_request"
+
+        signed = {'host': host}
+        signed.update((name.lower(), value) for name, value in
+                      (headers or {}).items())
+        signed_headers = ';'.join(sorted(signed))
+
+        params = dict(query or {})
+        params.update({
+            'X-Amz-Algorithm': self.algorithm,
+            'X-Amz-Credential': f'{self.access_key}/{scope}',
+            'X-Amz-Date': amz_date,
+            'X-Amz-Expires': str(expires),
+            'X-Amz-SignedHeaders': signed_headers,
+        })
+        canonical_uri = quote(path, safe='/~')
+        canonical_query = '&'.join(
+            f"{quote(name, safe='~')}={quote(value, safe='~')}"
+            for name, value in sorted(params.items())
+        )
+        canonical_headers = ''.join(
+            f'{name}:{signed[name].strip()}\n' for name in sorted(signed)
+        )
+        canonical_request = '\n'.join((
+            method,
+            canonical_uri,
+            canonical_query,
+            canonical_headers,
+            signed_headers,
+            'UNSIGNED-PAYLOAD',
+        ))
+        string_to_sign = '\n'.join((
+            self.algorithm,
+            amz_date,
+            scope,
+            hashlib.sha256(canonical_request.encode()).hexdigest(),
+        ))
+        signature = hmac.new(
+            self._signing_key(now),
+            string_to_sign.encode(),
+            hashlib.sha256
+        ).hexdigest()
+
+        return (f'{endpoint.scheme}://{host}{canonical_uri}?'
+                f'{canonical_query}&X-Amz-Signature={signature}')
+
+    def _signing_key(self, now):
+        key = f'AWS4{self.secret_key}'.encode()
+        for part in (now.strftime('%Y%m%d'), self.region, 's3',
+                     'aws4_request'):
+            key = hmac.new(key, part.encode(), hashlib.sha256).digest()
+
+        return key
+
+
+@deconstructible
+class S3Storage(ContentAddressedMixin, Storage):
+    """Content addressed storage on an S3-compatible object store
+
+    Every request goes through a presigned URL, so no SDK is needed.
+    Clients can also upload straight to the store with
+    `presigned_upload()`.
+    """
+    namespace = '{http://s3.amazonaws.com/doc/2006-03-01/}'
+
+    def __init__(self, endpoint_url=None, bucket=None, access_key=None,
+                 secret_key=None, region=None, public_url=None):
+        self.presigner = S3Presigner(
+            endpoint_url or settings.S3_ENDPOINT_URL,
+            bucket or settings.S3_BUCKET,
+            access_key or settings.S3_ACCESS_KEY,
+            secret_key or settings.S3_SECRET_KEY,
+            region or settings.S3_REGION,
+        )
+        self.public_url = (public_url or settings.S3_PUBLIC_URL).rstrip('/')
+
+    def _request(self, method, key='', data=None, query=None, headers=None):
+        url = self.presigner.presign(method, key, query=query)
+        request = Request(url, data=data, method=method,
+                          headers=headers or {})
+        return urlopen(request, timeout=30)
+
+    def _open(self, name, mode='rb'):
+        with self._request('GET', name) as response:
+            return ContentFile(response.read(), name=name)
+
+    def _save(self, name, content):
+        content_type = getattr(content, 'content_type', None)
+        headers = {'Content-Type': content_type} if content_type else {}
+        self._request('PUT', name, data=content.read(),
+                      headers=headers).close()
+        return name
+
+    def _head(self, name):
+        try:
+            with self._request('HEAD', name) as response:
+                return response.headers
+        except HTTPError as error:
+            if error.code == 404:
+                return None
+            raise
+
+    def exists(self, name):
+        return self._head(name) is not None
+
+    def delete(self, name):
+        self._request('DELETE', name).close()
+
+    def size(self, name):
+        return int(self._head(name)['Content-Length'])
+
+    def get_modified_time(self, name):
+        return parsedate_to_datetime(self._head(name)['Last-Modified'])
+
+    def url(self, name):
+        if self.public_url:
+            return f"{self.public_url}/{quote(name, safe='/~')}"
+
+        return self.presigner.presign(
+            'GET', name, expires=settings.MEDIA_URL_EXPIRES
+        )
+
+    def listdir(self, path):
+        prefix = f"{path.strip('/')}/" if path.strip('/') else ''
+        directories, files = [], []
+        query = {'list-type': '2', 'prefix': prefix, 'delimiter': '/'}
+        while True:
+            with self._request('GET', query=query) as response:
+                root = ET.fromstring(response.read())
+            for element in root.iter(f'{self.namespace}CommonPrefixes'):
+                name = element.find(f'{self.namespace}Prefix').text
+                directories.append(name[len(prefix):].rstrip('/'))
+            for element in root.iter(f'{self.namespace}Contents'):
+                name = element.find(f'{self.namespace}Key').text
+                files.append(name[len(prefix):])
+            token = root.find(f'{self.namespace}NextContinuationToken')
+            if token is None:
+                return directories, files
+            query = dict(query, **{'continuation-token': token.text})
+
+    def presigned_upload(self, name, digest):
+        """Return a URL and headers for uploading content straight to S3
+
+        The sha256 checksum is signed, so the store rejects any body that
+        does not match `digest`.
+        """
+        checksum = base64.b64encode(bytes.fromhex(digest)).decode()
+        headers = {'x-amz-checksum-sha256': checksum}
+        url = self.presigner.presign(
+            'PUT', name,
+            expires=settings.MEDIA_UPLOAD_URL_EXPIRES,
+            headers=headers
+        )
+
+        return url, headers
@@ -0,0 +1,40 @@
+import threading
+import unicodedata
+
+
+def normalize(name):
+    """Return the form a category or service name is interned under"""
+    return ' '.join(unicodedata.normalize('NFKC', name).casefold().split())
+
+
+class TermCache:
+    """Process wide map of (kind, normalized name) to taxonomy term id
+
+    Terms are never changed once created, so committed entries do not go
+    stale; callers only add terms after their transaction commits. The
+    map is emptied when it outgrows `max_size`.
+    """
+
+    def __init__(self, max_size=100000):
+        self.max_size = max_size
+        self._ids = {}
+        self._lock = threading.Lock()
+
+    def get_many(self, kind, names):
+        """Return the cached term ids of the given normalized names"""
+        ids = self._ids
+        return {name: ids[kind, name] for name in names if (kind, name) in ids}
+
+    def set_many(self, kind, ids):
+        """Cache term ids by normalized name"""
+        with self._lock:
+            if len(self._ids) + len(ids) > self.max_size:
+                self._ids = {}
+            self._ids.update(((kind, name), id) for name, id in ids.items())
+
+    def clear(self):
+        with self._lock:
+            self._ids = {}
+
+
+term_cache = TermCache()
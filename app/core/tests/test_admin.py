@@ -1,23 +1,31 @@
+from unittest.mock import patch
+
 from django.test import TestCase, Client
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 
+from core.models import Business, Category, Service
+from core.pagination import EstimatedCountPaginator
+
 
 class AdminSiteTests(TestCase):
 
-    def setUp(self):
-        self.client = Client()
-        self.admin_user = get_user_model().objects.create_superuser(
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin_user = get_user_model().objects.create_superuser(
             email='admin@danijel.com',
             password='123'
         )
-        self.client.force_login(self.admin_user)
-        self.user = get_user_model().objects.create_user(
+        cls.user = get_user_model().objects.create_user(
             email='test@danijel.com',
             password='123',
             name='test'
         )
 
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.admin_user)
+
     def test_users_listed(self):
         """Test that users are listed on users page"""
         url = reverse('admin:core_user_changelist')
@@ -39,4 +47,124 @@ class AdminSiteTests(TestCase):
         url = reverse('admin:core_user_add')
         res = self.client.get(url)
 
-        self.assertEqual(res.status_code, 200)
\ No newline at end of file
+        self.assertEqual(res.status_code, 200)
+
+    def test_business_changelist_query_count(self):
+        """Test that the business list does not query once per row"""
+        for i in range(5):
+            Business.objects.create(user=self.user, name=f'Business {i}')
+        url = reverse('admin:core_business_changelist')
+
+        # Session, user, count and the page of businesses with their users
+        with self.assertNumQueries(4):
+            res = self.client.get(url)
+
+        self.assertContains(res, self.user.email)
+
+    def test_business_change_page_uses_autocomplete(self):
+        """Test that the business edit page does not list every category"""
+        business = Business.objects.create(user=self.user, name='Business')
+        business.categories.add(
+            Category.objects.create(user=self.user, name='Selected category')
+        )
+        Category.objects.create(user=self.user, name='Unselected category')
+        Service.objects.create(user=self.user, name='Unselected service')
+        url = reverse('admin:core_business_change', args=[business.id])
+
+        res = self.client.get(url)
+
+        self.assertEqual(res.status_code, 200)
+        for field in ('businesscategory_set-0-category',
+                      'businessservice_set-__prefix__-service'):
+            self.assertContains(res, f'id="id_{field}"')
+        self.assertContains(res, 'data-ajax--url')
+        self.assertContains(res, 'Selected category')
+        self.assertNotContains(res, 'Unselected category')
+        self.assertNotContains(res, 'Unselected service')
+
+    def test_business_relations_saved_inline(self):
+        """Test that relations edited inline fire the relation signals"""
+        # The admin form requires an image
+        business = Business.objects.create(
+            user=self.user,
+            name='Business',
+            image='uploads/business/existing.jpg'
+        )
+        kept = Category.objects.create(user=self.user, name='Kept')
+        removed = Category.objects.create(user=self.user, name='Removed')
+        service = Service.objects.create(user=self.user, name='Service')
+        business.categories.add(kept, removed)
+        business.refresh_from_db()
+        version = business.version
+        rows = list(
+            business.categories.through.objects.filter(business=business)
+            .order_by('category_id')
+        )
+        url = reverse('admin:core_business_change', args=[business.id])
+
+        res = self.client.post(url, {
+            'name': business.name,
+            'user': self.user.id,
+            'businesscategory_set-TOTAL_FORMS': '2',
+            'businesscategory_set-INITIAL_FORMS': '2',
+            'businesscategory_set-0-id': rows[0].id,
+            'businesscategory_set-0-business': business.id,
+            'businesscategory_set-0-category': kept.id,
+            'businesscategory_set-1-id': rows[1].id,
+            'businesscategory_set-1-business': business.id,
+            'businesscategory_set-1-category': removed.id,
+            'businesscategory_set-1-DELETE': 'on',
+            'businessservice_set-TOTAL_FORMS': '1',
+            'businessservice_set-INITIAL_FORMS': '0',
+            'businessservice_set-0-service': service.id,
+        })
+
+        self.assertEqual(res.status_code, 302)
+        business.refresh_from_db()
+        self.assertEqual(list(business.categories.all()), [kept])
+        self.assertEqual(list(business.services.all()), [service])
+        self.assertGreater(business.version, version + 1)
+
+    def test_category_search(self):
+        """Test that categories are searched by name prefix"""
+        Category.objects.create(user=self.user, name='Programming')
+        Category.objects.create(user=self.user, name='Cooking')
+        url = reverse('admin:core_category_changelist')
+
+        res = self.client.get(url, {'q': 'prog'})
+
+        self.assertContains(res, 'Programming')
+        self.assertNotContains(res, 'Cooking')
+
+    def test_delete_selected_soft_deletes(self):
+        """Test that the bulk delete action soft deletes"""
+        category = Category.objects.create(user=self.user, name='Category')
+        url = reverse('admin:core_category_changelist')
+
+        self.client.post(url, {
+            'action': 'delete_selected',
+            '_selected_action': [category.id],
+            'post': 'yes',
+        })
+
+        self.assertFalse(Category.objects.filter(id=category.id).exists())
+        self.assertTrue(Category.all_objects.filter(id=category.id).exists())
+
+
+class EstimatedCountPaginatorTests(TestCase):
+
+    def test_small_estimate_counts_exactly(self):
+        """Test that small estimates fall back to an exact count"""
+        paginator = EstimatedCountPaginator(Business.objects.all(), 10)
+
+        with patch.object(paginator, '_estimate_count', return_value=5):
+            self.assertEqual(paginator.count, 0)
+
+    def test_large_estimate_used(self):
+        """Test that large estimates are used without counting"""
+        paginator = EstimatedCountPaginator(Business.objects.all(), 10)
+
+        with patch.object(paginator, '_estimate_count', return_value=10 ** 6):
+            with self.assertNumQueries(0):
+                self.assertEqual(paginator.count, 10 ** 6)
+
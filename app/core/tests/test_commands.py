@@ -1,8 +1,22 @@
+import os
+import subprocess
+import sys
+from datetime import timedelta
+from io import StringIO
 from unittest.mock import patch
 
+from django.contrib.auth import get_user_model
+from django.conf import settings
+from django.core.cache import cache
 from django.core.management import call_command
 from django.db.utils import OperationalError
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core import metrics
+from core.models import AuthToken, Business, Category, Service
+from core.management.commands.startup_report import Command as StartupReport
+from core.taxonomy import term_cache
 
 
 class CommandTess(TestCase):
@@ -21,3 +35,127 @@ class CommandTess(TestCase):
             gi.side_effect = [OperationalError] * 5 + [True]
             call_command('wait_for_db')
             self.assertEqual(gi.call_count, 6)
+
+    def test_purge_tokens(self):
+        """Test that only expired tokens are purged"""
+        old = timezone.now() - AuthToken.idle_timeout() - timedelta(1)
+        for i in range(3):
+            user = get_user_model().objects.create_user(f'{i}@test.com', '1')
+            AuthToken.objects.create(user=user, last_used=old)
+        user = get_user_model().objects.create_user('fresh@test.com', '1')
+        fresh = AuthToken.objects.create(user=user)
+
+        call_command('purge_tokens', batch_size=2, stdout=StringIO())
+
+        self.assertEqual(list(AuthToken.objects.all()), [fresh])
+
+    def test_purge_deleted(self):
+        """Test that only old soft deleted rows are hard deleted"""
+        user = get_user_model().objects.create_user('test@test.com', '1')
+        category = Category.objects.create(user=user, name='Category')
+        old = Business.objects.create(user=user, name='Old')
+        old.categories.add(category)
+        recent = Business.objects.create(user=user, name='Recent')
+        old.delete()
+        recent.delete()
+        Business.all_objects.filter(id=old.id).update(
+            deleted_at=timezone.now() - timedelta(days=30)
+        )
+
+        call_command('purge_deleted', batch_size=1, stdout=StringIO())
+
+        self.assertEqual(list(Business.all_objects.all()), [recent])
+        self.assertTrue(Category.objects.filter(id=category.id).exists())
+
+    def test_purge_deleted_user(self):
+        """Test that soft deleted users are purged with their data"""
+        user = get_user_model().objects.create_user('test@test.com', '1')
+        for i in range(3):
+            Business.objects.create(user=user, name=f'Business {i}')
+        user.soft_delete()
+        get_user_model().objects.filter(id=user.id).update(
+            deleted_at=timezone.now() - timedelta(days=30)
+        )
+
+        call_command('purge_deleted', batch_size=2, stdout=StringIO())
+
+        self.assertFalse(get_user_model().objects.filter(id=user.id).exists())
+        self.assertFalse(Business.all_objects.exists())
+
+
+    def test_intern_taxonomy(self):
+        """Test existing categories and services are linked to terms"""
+        term_cache.clear()
+        user = get_user_model().objects.create_user('test@test.com', '1')
+        other = get_user_model().objects.create_user('other@test.com', '1')
+        Category.objects.create(user=user, name='Food')
+        Category.objects.create(user=other, name='FOOD')
+        deleted = Service.objects.create(user=user, name='Delivery')
+        deleted.delete()
+
+        call_command('intern_taxonomy', batch_size=1, stdout=StringIO())
+
+        terms = set(Category.objects.values_list('term', flat=True))
+        self.assertEqual(len(terms), 1)
+        self.assertIsNotNone(Service.all_objects.get(id=deleted.id).term_id)
+
+    def test_startup_report(self):
+        """Test import times are summed by package"""
+        stderr = '\n'.join([
+            'import time: self [us] | cumulative | imported package',
+            'import time:       100 |        100 |   rest_framework.fields',
+            'import time:       200 |        300 | rest_framework.serializers',
+            'import time:        50 |         50 | core.models',
+        ])
+        out = StringIO()
+        command = StartupReport(stdout=out)
+
+        command._report(stderr, [0.5, 0.7, 0.6], top=5)
+
+        report = out.getvalue()
+        self.assertIn('Wall time: 600 ms (median of 3)', report)
+        self.assertIn('     0.3 ms  rest_framework\n', report)
+        self.assertLess(
+            report.index('0.3 ms  rest_framework.serializers'),
+            report.index('0.1 ms  core.models')
+        )
+        self.assertNotIn('rest_framework.fields', report)
+
+    def test_setup_skips_rest_framework(self):
+        """Test that loading the apps does not import the API stack"""
+        script = (
+            'import sys, django; django.setup(); '
+            'print(sorted(m for m in sys.modules if m.startswith('
+            '("rest_framework.serializers", "PIL", "business.views"))))'
+        )
+        result = subprocess.run(
+            [sys.executable, '-c', script],
+            cwd=settings.BASE_DIR,
+            env=dict(os.environ, DJANGO_SETTINGS_MODULE='app.ops_settings'),
+            capture_output=True,
+            text=True,
+            check=True
+        )
+
+        self.assertEqual(result.stdout.strip(), '[]')
+
+    @override_settings(
+        WRITE_THROTTLE_RATES={'business': '1/min'},
+        CONCURRENCY_LIMITS={'business_upload_image': 1}
+    )
+    def test_show_metrics(self):
+        """Test printing the known counters"""
+        cache.clear()
+        metrics.incr('throttle.business.limited', 3)
+        out = StringIO()
+
+        call_command('show_metrics', stdout=out)
+
+        self.assertEqual(
+            out.getvalue(),
+            'jobs.failed 0\n'
+            'jobs.retried 0\n'
+            'jobs.succeeded 0\n'
+            'throttle.business.limited 3\n'
+            'throttle.business_upload_image.limited 0\n'
+        )
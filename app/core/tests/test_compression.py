@@ -0,0 +1,111 @@
+import gzip
+import json
+from decimal import Decimal
+from io import StringIO
+from unittest import skipIf
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+
+from rest_framework.renderers import JSONRenderer
+
+from core import middleware
+from core.middleware import CompressionMiddleware, accepted_encodings
+from core.renderers import FastJSONRenderer
+
+
+BODY = b'{"name": "Business"}' * 100
+
+
+def get_response(request):
+    return HttpResponse(BODY, content_type='application/json')
+
+
+@override_settings(COMPRESSION_MIN_SIZE=1024)
+class CompressionMiddlewareTests(TestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.middleware = CompressionMiddleware(get_response)
+
+    def request(self, accept_encoding):
+        return self.middleware(
+            self.factory.get('/', HTTP_ACCEPT_ENCODING=accept_encoding)
+        )
+
+    def test_gzip(self):
+        """Test that gzip is used when it is the only accepted encoding"""
+        res = self.request('gzip')
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(res.content), BODY)
+        self.assertEqual(res['Content-Length'], str(len(res.content)))
+        self.assertIn('Accept-Encoding', res['Vary'])
+
+    @skipIf(middleware.brotli is None, 'brotli is not installed')
+    def test_brotli_preferred(self):
+        """Test that brotli wins when the client accepts both equally"""
+        res = self.request('gzip, deflate, br')
+
+        self.assertEqual(res['Content-Encoding'], 'br')
+        self.assertEqual(middleware.brotli.decompress(res.content), BODY)
+
+    def test_quality_values_respected(self):
+        """Test that encodings refused with q=0 are not used"""
+        with patch.object(middleware, 'brotli', None):
+            res = self.request('gzip;q=0, identity')
+
+        self.assertFalse(res.has_header('Content-Encoding'))
+
+    def test_small_response_not_compressed(self):
+        """Test that responses under the threshold are sent as is"""
+        with override_settings(COMPRESSION_MIN_SIZE=len(BODY) + 1):
+            res = self.request('gzip')
+
+        self.assertFalse(res.has_header('Content-Encoding'))
+        self.assertEqual(res.content, BODY)
+
+    def test_images_not_compressed(self):
+        """Test that already compressed types are sent as is"""
+        middleware = CompressionMiddleware(
+            lambda request: HttpResponse(BODY, content_type='image/png')
+        )
+
+        res = middleware(self.factory.get('/', HTTP_ACCEPT_ENCODING='gzip'))
+
+        self.assertFalse(res.has_header('Content-Encoding'))
+
+    def test_accepted_encodings(self):
+        """Test parsing an Accept-Encoding header"""
+        self.assertEqual(
+            accepted_encodings('gzip;q=0.5, br, *;q=0'),
+            {'gzip': 0.5, 'br': 1.0, '*': 0.0}
+        )
+
+
+class FastJSONRendererTests(TestCase):
+
+    def test_render_matches_stdlib(self):
+        """Test that output decodes the same as the stdlib renderer's"""
+        data = {'id': 1, 'name': 'Bäckerei', 'price': Decimal('1.50')}
+
+        content = FastJSONRenderer().render(data)
+
+        self.assertEqual(
+            json.loads(content),
+            json.loads(JSONRenderer().render(data))
+        )
+
+    def test_render_none(self):
+        """Test that an empty response renders to no bytes"""
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+    def test_bench_render(self):
+        """Test that the render benchmark runs"""
+        out = StringIO()
+
+        call_command('bench_render', rows=10, repeat=1, stdout=out)
+
+        self.assertIn('JSONRenderer', out.getvalue())
@@ -0,0 +1,34 @@
+from django.test import TestCase
+
+from core import geo
+
+
+class GeoTests(TestCase):
+
+    def test_encode_geohash(self):
+        """Test encoding a point matches the reference geohash"""
+        self.assertEqual(geo.encode(57.64911, 10.40744, 11), 'u4pruydqqvj')
+        self.assertEqual(geo.encode(-25.382708, -49.265506, 7), '6gkzwgj')
+
+    def test_covering_cells_contain_box(self):
+        """Test every point of a box falls in one of its covering cells"""
+        box = (45.75, 15.90, 45.85, 16.05)
+        cells = geo.covering_cells(*box)
+
+        self.assertTrue(0 < len(cells) <= 16)
+        for latitude in (45.75, 45.8, 45.85):
+            for longitude in (15.90, 15.97, 16.05):
+                geohash = geo.encode(latitude, longitude)
+                self.assertTrue(any(geohash.startswith(c) for c in cells))
+
+    def test_covering_cells_large_box(self):
+        """Test boxes too large for geohash cells return no cells"""
+        self.assertEqual(geo.covering_cells(-80, -170, 80, 170), [])
+
+    def test_bounding_box_encloses_radius(self):
+        """Test the bounding box of a circle spans its radius"""
+        min_lat, min_lng, max_lat, max_lng = geo.bounding_box(45.8, 15.96, 10)
+
+        self.assertAlmostEqual(max_lat - 45.8, 0.0899, places=3)
+        self.assertGreater(max_lng - 15.96, max_lat - 45.8)
+        self.assertEqual(geo.bounding_box(89.99, 0, 10)[1::2], (-180.0, 180.0))
@@ -0,0 +1,155 @@
+import threading
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from core import jobs, metrics
+from core.management.commands.run_worker import Command as RunWorker
+from core.models import Job
+
+
+calls = []
+
+
+@jobs.task('tests.record')
+def record(value):
+    calls.append(value)
+
+
+@jobs.task('tests.fail')
+def fail():
+    raise ValueError('Broken')
+
+
+class JobQueueTests(TestCase):
+    """Test enqueueing, claiming and running jobs"""
+
+    def setUp(self):
+        cache.clear()
+        calls.clear()
+
+    def test_claim_in_priority_order(self):
+        """Test that higher priority jobs are claimed first"""
+        low = jobs.enqueue('tests.record', value='low')
+        high = jobs.enqueue('tests.record', priority=5, value='high')
+        jobs.enqueue('tests.record', delay=60, priority=9, value='later')
+
+        claimed = Job.objects.claim(5, visibility_timeout=30)
+
+        self.assertEqual([job.id for job in claimed], [high.id, low.id])
+        self.assertEqual([job.attempts for job in claimed], [1, 1])
+
+    def test_claimed_jobs_hidden_until_timeout(self):
+        """Test that a claimed job is only claimed again after its timeout"""
+        job = jobs.enqueue('tests.record', value=1)
+        Job.objects.claim(1, visibility_timeout=30)
+
+        self.assertEqual(Job.objects.claim(1, visibility_timeout=30), [])
+
+        Job.objects.filter(id=job.id).update(
+            available_at=timezone.now() - timedelta(seconds=1)
+        )
+        claimed = Job.objects.claim(1, visibility_timeout=30)
+        self.assertEqual(claimed[0].attempts, 2)
+
+    def test_successful_job_deleted(self):
+        """Test that a job that ran is deleted and counted"""
+        jobs.enqueue('tests.record', value=1)
+        job, = Job.objects.claim(1, visibility_timeout=30)
+
+        self.assertTrue(jobs.execute(job))
+
+        self.assertEqual(calls, [1])
+        self.assertFalse(Job.objects.exists())
+        self.assertEqual(metrics.read(['jobs.succeeded'])['jobs.succeeded'], 1)
+
+    def test_failed_job_retried_with_backoff(self):
+        """Test that a failed job is hidden for the backoff"""
+        jobs.enqueue('tests.fail')
+        job, = Job.objects.claim(1, visibility_timeout=30)
+        before = timezone.now()
+
+        self.assertFalse(jobs.execute(job))
+
+        job.refresh_from_db()
+        self.assertIsNone(job.failed_at)
+        self.assertIn('ValueError: Broken', job.last_error)
+        self.assertGreaterEqual(
+            job.available_at,
+            before + timedelta(seconds=10)
+        )
+        self.assertEqual(metrics.read(['jobs.retried'])['jobs.retried'], 1)
+
+    def test_job_fails_after_max_attempts(self):
+        """Test that a job out of attempts is kept as failed"""
+        jobs.enqueue('tests.fail', max_attempts=1)
+        job, = Job.objects.claim(1, visibility_timeout=30)
+
+        jobs.execute(job)
+
+        job.refresh_from_db()
+        self.assertIsNotNone(job.failed_at)
+        self.assertEqual(Job.objects.claim(1, visibility_timeout=0), [])
+        self.assertEqual(metrics.read(['jobs.failed'])['jobs.failed'], 1)
+
+    def test_unknown_task_fails(self):
+        """Test that jobs without a registered task fail"""
+        jobs.enqueue('tests.missing', max_attempts=1)
+        job, = Job.objects.claim(1, visibility_timeout=30)
+
+        self.assertFalse(jobs.execute(job))
+
+        job.refresh_from_db()
+        self.assertIn('No task is registered as tests.missing', job.last_error)
+
+    def test_stale_attempt_leaves_job(self):
+        """Test that an attempt past its timeout does not delete the job"""
+        jobs.enqueue('tests.record', value=1)
+        stale, = Job.objects.claim(1, visibility_timeout=0)
+        Job.objects.claim(1, visibility_timeout=30)
+
+        jobs.execute(stale)
+
+        self.assertEqual(Job.objects.get().attempts, 2)
+
+    def test_run_worker_drains_queue(self):
+        """Test that the worker runs every due job"""
+        for value in range(3):
+            jobs.enqueue('tests.record', priority=value, value=value)
+        jobs.enqueue('tests.fail', max_attempts=1)
+        out = StringIO()
+
+        call_command('run_worker', concurrency=1, stdout=out)
+
+        self.assertEqual(calls, [2, 1, 0])
+        self.assertIn('Ran 4 jobs, 1 failed', out.getvalue())
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_run_worker_pool(self):
+        """Test that the pool runs every job once"""
+        ids = [
+            jobs.enqueue('tests.record', value=value).id
+            for value in range(6)
+        ]
+        ran = []
+        lock = threading.Lock()
+
+        # SQLite connections of other threads cannot read this test's
+        # transaction, so the threads only record the jobs; claimed jobs
+        # stay hidden for the visibility timeout
+        def execute(command, job):
+            with lock:
+                ran.append(job.id)
+            return True
+
+        out = StringIO()
+        with patch.object(RunWorker, '_execute', execute):
+            call_command('run_worker', concurrency=3, stdout=out)
+
+        self.assertEqual(sorted(ran), ids)
+        self.assertIn('Ran 6 jobs, 0 failed', out.getvalue())
@@ -0,0 +1,124 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from core.models import Business, BusinessListing, Category, Service
+from core.tests.factories import create_named, create_users
+
+
+@override_settings(BUSINESS_LISTING=True)
+class BusinessListingTests(TestCase):
+    """Test keeping the denormalized business listings up to date"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, = create_users(1)
+
+    def setUp(self):
+        self.food, self.drinks = create_named(
+            Category,
+            self.user,
+            ['Food', 'Drinks']
+        )
+        self.delivery, = create_named(Service, self.user, ['Delivery'])
+        self.business = Business.objects.create(
+            user=self.user,
+            name='Shop',
+            latitude=45.8,
+            longitude=15.97
+        )
+        self.business.categories.add(self.food, self.drinks)
+        self.business.services.add(self.delivery)
+
+    def listing(self):
+        return BusinessListing.objects.get(id=self.business.id)
+
+    def test_listing_copies_business(self):
+        """Test a business and its relations are copied to its listing"""
+        listing = self.listing()
+
+        self.assertEqual(listing.user_id, self.user.id)
+        self.assertEqual(listing.name, 'Shop')
+        self.assertEqual(listing.geohash, self.business.geohash)
+        self.assertEqual(listing.version, self.business.version)
+        self.assertCountEqual(
+            zip(listing.category_ids, listing.category_names),
+            [(self.food.id, 'Food'), (self.drinks.id, 'Drinks')]
+        )
+        self.assertEqual(listing.service_ids, [self.delivery.id])
+        self.assertEqual(
+            [(c.id, c.name) for c in listing.services],
+            [(self.delivery.id, 'Delivery')]
+        )
+
+    def test_overlap_filter(self):
+        """Test filtering listings sharing any of the given ids"""
+        other = Business.objects.create(user=self.user, name='Other')
+        other.categories.add(self.drinks)
+
+        matches = BusinessListing.objects.filter(
+            category_ids__overlap=[self.drinks.id, 0]
+        )
+        misses = BusinessListing.objects.filter(service_ids__overlap=[0])
+
+        self.assertCountEqual(
+            matches.values_list('id', flat=True),
+            [self.business.id, other.id]
+        )
+        self.assertFalse(misses.exists())
+
+    def test_relation_changes_update_listing(self):
+        """Test removing, renaming and deleting relations update listings"""
+        self.business.categories.remove(self.drinks)
+        self.food.name = 'Meals'
+        self.food.save()
+        self.delivery.delete()
+
+        listing = self.listing()
+        self.assertEqual(listing.category_names, ['Meals'])
+        self.assertEqual(listing.service_ids, [])
+
+    def test_reverse_clear_updates_listing(self):
+        """Test clearing a category's businesses updates their listings"""
+        self.drinks.business_set.clear()
+
+        self.assertEqual(self.listing().category_ids, [self.food.id])
+
+    def test_deleted_business_loses_listing(self):
+        """Test soft and hard deleted businesses have no listing"""
+        other = Business.objects.create(user=self.user, name='Other')
+        self.business.delete()
+        other.hard_delete()
+
+        self.assertFalse(BusinessListing.objects.exists())
+
+    def test_rebuild_listings(self):
+        """Test the rebuild command rewrites listings and drops orphans"""
+        BusinessListing.objects.all().delete()
+        BusinessListing.objects.create(
+            id=self.business.id + 100,
+            user=self.user,
+            name='Gone',
+            geohash='',
+            version=1
+        )
+        Business.objects.filter(id=self.business.id).update(name='Renamed')
+
+        call_command(
+            'rebuild_listings',
+            '--batch-size', '1',
+            stdout=StringIO()
+        )
+
+        self.assertEqual(
+            list(BusinessListing.objects.values_list('id', 'name')),
+            [(self.business.id, 'Renamed')]
+        )
+
+    @override_settings(BUSINESS_LISTING=False)
+    def test_disabled_listing_not_written(self):
+        """Test no listings are written while the read model is disabled"""
+        Business.objects.create(user=self.user, name='Other')
+
+        self.assertEqual(BusinessListing.objects.count(), 1)
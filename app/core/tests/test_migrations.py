@@ -0,0 +1,39 @@
+from unittest import skipUnless
+
+from django.apps import apps
+from django.db import connection
+from django.db.migrations.autodetector import MigrationAutodetector
+from django.db.migrations.executor import MigrationExecutor
+from django.db.migrations.loader import MigrationLoader
+from django.db.migrations.state import ProjectState
+from django.test import TestCase, override_settings
+
+
+class MigrationTests(TestCase):
+
+    @override_settings(MIGRATION_MODULES={})
+    def test_migrations_match_models(self):
+        """Test the models have no changes missing from the migrations"""
+        loader = MigrationLoader(None, ignore_no_migrations=True)
+        autodetector = MigrationAutodetector(
+            loader.project_state(),
+            ProjectState.from_apps(apps)
+        )
+
+        self.assertEqual(autodetector.changes(graph=loader.graph), {})
+
+    @skipUnless(connection.vendor == 'postgresql', 'Requires PostgreSQL')
+    def test_schema_built_by_migrations(self):
+        """Test every migration ran, including the PostgreSQL only steps"""
+        executor = MigrationExecutor(connection)
+        plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+        self.assertEqual(plan, [])
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT indexname FROM pg_indexes "
+                "WHERE tablename = 'core_businesslisting'"
+            )
+            indexes = {row[0] for row in cursor.fetchall()}
+        self.assertIn('core_listing_category_gin', indexes)
+        self.assertIn('core_listing_service_gin', indexes)
@@ -1,9 +1,11 @@
 from unittest.mock import patch
 
-from django.test import TestCase
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
 from django.contrib.auth import get_user_model
 
 from .. import models
+from ..taxonomy import normalize, term_cache
 
 def sample_user(email='test@test.com', password='12345'):
     """Create a sample user"""
@@ -85,3 +87,145 @@ class ModelTests(TestCase):
 
     
 
+    def test_delete_is_soft(self):
+        """Test that deleting a business only marks it deleted"""
+        business = models.Business.objects.create(
+            user=sample_user(),
+            name='CxRomos'
+        )
+
+        # One UPDATE, plus replacing the object's change log entry
+        with self.assertNumQueries(3):
+            business.delete()
+
+        self.assertFalse(
+            models.Business.objects.filter(id=business.id).exists()
+        )
+        self.assertTrue(
+            models.Business.all_objects.filter(id=business.id).exists()
+        )
+
+    def test_business_conditional_update(self):
+        """Test a business is only updated at the expected version"""
+        business = models.Business.objects.create(
+            user=sample_user(),
+            name='CxRomos'
+        )
+        business.name = 'Renamed'
+
+        self.assertFalse(business.conditional_update(['name'], version=2))
+        # One UPDATE, plus replacing the object's change log entry
+        with self.assertNumQueries(3):
+            self.assertTrue(business.conditional_update(['name'], version=1))
+
+        business.refresh_from_db()
+        self.assertEqual((business.name, business.version), ('Renamed', 2))
+
+    def test_business_set_related_ids_unchanged(self):
+        """Test setting unchanged relations only reads the current rows"""
+        user = sample_user()
+        business = models.Business.objects.create(user=user, name='CxRomos')
+        category = models.Category.objects.create(user=user, name='IT')
+        business.categories.add(category)
+
+        with self.assertNumQueries(1):
+            business.set_related_ids('categories', [category.id])
+
+    def test_soft_deleted_category_hidden_from_business(self):
+        """Test that soft deleted categories disappear from relations"""
+        user = sample_user()
+        business = models.Business.objects.create(user=user, name='CxRomos')
+        category = models.Category.objects.create(user=user, name='IT')
+        business.categories.add(category)
+
+        category.delete()
+
+        self.assertEqual(list(business.categories.all()), [])
+
+    def test_user_soft_delete(self):
+        """Test that soft deleting a user deactivates them"""
+        user = sample_user()
+
+        user.soft_delete()
+
+        user.refresh_from_db()
+        self.assertFalse(user.is_active)
+        self.assertIsNotNone(user.deleted_at)
+
+
+
+class TaxonomyTests(TestCase):
+
+    def setUp(self):
+        term_cache.clear()
+
+    def test_normalize_name(self):
+        """Test names are normalized for case, width and whitespace"""
+        self.assertEqual(normalize('  Web\tＤesign '), 'web design')
+
+    def test_intern_shares_terms(self):
+        """Test equivalent names intern to one term"""
+        ids = models.TaxonomyTerm.objects.intern(
+            models.TaxonomyTerm.SERVICE,
+            ['iOS', 'ios ', 'Android']
+        )
+
+        self.assertEqual(ids['iOS'], ids['ios '])
+        self.assertNotEqual(ids['iOS'], ids['Android'])
+        self.assertEqual(models.TaxonomyTerm.objects.count(), 2)
+
+    @override_settings(GLOBAL_TAXONOMY=True)
+    def test_categories_alias_global_term(self):
+        """Test categories of different users share a term"""
+        first = models.Category.objects.create(user=sample_user(), name='IT')
+        second = models.Category.objects.create(
+            user=sample_user('other@test.com'),
+            name='it'
+        )
+
+        self.assertIsNotNone(first.term_id)
+        self.assertEqual(first.term_id, second.term_id)
+        self.assertEqual(second.name, 'it')
+
+    def test_taxonomy_disabled(self):
+        """Test categories are not linked when the taxonomy is off"""
+        category = models.Category.objects.create(
+            user=sample_user(),
+            name='IT'
+        )
+
+        self.assertIsNone(category.term_id)
+
+
+class TaxonomyCacheTests(TransactionTestCase):
+    """Test the term cache against committed and rolled back terms"""
+
+    def setUp(self):
+        term_cache.clear()
+
+    def test_intern_cached(self):
+        """Test interned names are resolved from memory"""
+        kind = models.TaxonomyTerm.CATEGORY
+        # One INSERT for the missing terms and one SELECT for their ids;
+        # SQLite also logs the BEGIN of bulk_create's transaction
+        with self.assertNumQueries(3 if connection.vendor == 'sqlite' else 2):
+            ids = models.TaxonomyTerm.objects.intern(kind, ['IT', 'Food'])
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                models.TaxonomyTerm.objects.intern(kind, ['it', 'FOOD']),
+                {'it': ids['IT'], 'FOOD': ids['Food']}
+            )
+
+    @override_settings(GLOBAL_TAXONOMY=True)
+    def test_rolled_back_terms_not_cached(self):
+        """Test a name interned in a rolled back transaction saves again"""
+        user = sample_user()
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                models.Category.objects.create(user=user, name='IT')
+                raise RuntimeError('Rolled back')
+
+        category = models.Category.objects.create(user=user, name='it')
+
+        term = models.TaxonomyTerm.objects.get(id=category.term_id)
+        self.assertEqual(term.normalized_name, 'it')
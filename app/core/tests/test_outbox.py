@@ -0,0 +1,195 @@
+import hashlib
+import hmac
+import json
+import os
+import shutil
+import tempfile
+import threading
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core.models import Business, OutboxEvent
+from core.outbox import SpoolSink, WebhookSink
+from core.tests.factories import create_users
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    """Record the requests received by a test webhook server"""
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        self.server.received.append((dict(self.headers), body))
+        self.send_response(self.server.status)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class OutboxTests(TestCase):
+    """Test appending and relaying outbox events"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.other = create_users(2)
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, 'outbox.jsonl')
+
+    def append(self, user, name, event_type=OutboxEvent.CREATED):
+        business = Business.objects.create(user=user, name=name)
+        OutboxEvent.objects.append(event_type, [business], [{'name': name}])
+        return business
+
+    def relay(self, *args, **kwargs):
+        sink = {
+            'BACKEND': 'core.outbox.FileSink',
+            'OPTIONS': {'path': self.path},
+        }
+        kwargs.setdefault('stdout', StringIO())
+        with override_settings(OUTBOX_SINK=sink):
+            call_command('relay_outbox', *args, **kwargs)
+
+    def relayed(self):
+        with open(self.path) as f:
+            return [json.loads(line) for line in f]
+
+    def test_relay_delivers_in_order_and_deletes(self):
+        """Test events are delivered in id order across batches"""
+        businesses = [self.append(self.user, f'Shop {i}') for i in range(5)]
+
+        self.relay('--batch-size', '2')
+
+        messages = self.relayed()
+        self.assertEqual(
+            [m['aggregate_id'] for m in messages],
+            [b.id for b in businesses]
+        )
+        self.assertEqual(messages[0]['payload'], {'name': 'Shop 0'})
+        self.assertEqual(messages[0]['type'], OutboxEvent.CREATED)
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    def test_relay_shard_delivers_own_users(self):
+        """Test a shard only delivers the events of its users"""
+        self.append(self.user, 'Mine')
+        self.append(self.other, 'Theirs')
+        shard = self.user.id % 2
+
+        self.relay('--shards', '2', '--shard', str(shard))
+
+        self.assertEqual(
+            [m['user'] for m in self.relayed()],
+            [self.user.id]
+        )
+        self.assertEqual(
+            list(OutboxEvent.objects.values_list('user_id', flat=True)),
+            [self.other.id]
+        )
+
+    def test_failed_delivery_keeps_events(self):
+        """Test events stay in the outbox when the sink fails"""
+        self.append(self.user, 'Shop')
+
+        with patch('core.outbox.FileSink.send', side_effect=OSError):
+            with self.assertRaises(OSError):
+                self.relay()
+
+        self.assertEqual(OutboxEvent.objects.count(), 1)
+
+    @override_settings(SYNC_COMMIT_LAG=10)
+    def test_relay_waits_for_events_to_settle(self):
+        """Test events are held back until older ones may have committed"""
+        first = self.append(self.user, 'First')
+        second = self.append(self.user, 'Second')
+        third = self.append(self.user, 'Third')
+        # The second event's transaction may still be open, so the third
+        # must wait for it even though it is old enough itself
+        OutboxEvent.objects.exclude(aggregate_id=second.id).update(
+            created=timezone.now() - timedelta(seconds=11)
+        )
+
+        self.relay()
+
+        self.assertEqual(
+            [m['aggregate_id'] for m in self.relayed()],
+            [first.id]
+        )
+        OutboxEvent.objects.update(
+            created=timezone.now() - timedelta(seconds=11)
+        )
+        self.relay()
+        self.assertEqual(
+            [m['aggregate_id'] for m in self.relayed()],
+            [first.id, second.id, third.id]
+        )
+
+    def test_loop_retries_failed_batches(self):
+        """Test a looping relay backs off and retries when the sink fails"""
+        self.append(self.user, 'Shop')
+        sleeps = []
+
+        class Stop(Exception):
+            pass
+
+        def sleep(seconds):
+            sleeps.append(seconds)
+            if not OutboxEvent.objects.exists():
+                raise Stop()
+
+        stderr = StringIO()
+        send = patch(
+            'core.outbox.FileSink.send',
+            side_effect=[OSError('down'), OSError('down'), None]
+        )
+        with send, patch('time.sleep', side_effect=sleep):
+            with self.assertRaises(Stop):
+                self.relay('--loop', '--interval', '2', stderr=stderr)
+
+        self.assertEqual(sleeps, [2, 4, 2])
+        self.assertIn("OSError('down')", stderr.getvalue())
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    def test_spool_sink_writes_complete_batches(self):
+        """Test the spool sink writes one file per batch in order"""
+        spool = os.path.join(self.directory, 'spool')
+        sink = SpoolSink(spool)
+
+        sink.send([{'id': 2}, {'id': 3}])
+        sink.send([{'id': 10}])
+
+        names = sorted(os.listdir(spool))
+        self.assertEqual(len(names), 2)
+        with open(os.path.join(spool, names[0])) as f:
+            self.assertEqual(json.load(f), [{'id': 2}, {'id': 3}])
+
+    def test_webhook_sink_signs_batches(self):
+        """Test the webhook sink posts signed batches"""
+        server = ThreadingHTTPServer(('127.0.0.1', 0), WebhookHandler)
+        server.received, server.status = [], 204
+        threading.Thread(
+            target=server.serve_forever,
+            kwargs={'poll_interval': 0.05},
+            daemon=True
+        ).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        url = f'http://127.0.0.1:{server.server_port}/events'
+
+        WebhookSink(url, secret='s3cret').send([{'id': 1}])
+
+        headers, body = server.received[0]
+        self.assertEqual(json.loads(body), {'events': [{'id': 1}]})
+        digest = hmac.new(b's3cret', body, hashlib.sha256).hexdigest()
+        self.assertEqual(headers['X-Outbox-Signature'], f'sha256={digest}')
+
+        server.status = 500
+        with self.assertRaises(OSError):
+            WebhookSink(url).send([{'id': 2}])
@@ -0,0 +1,151 @@
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase
+
+from core.models import Business
+from core.partitioning import (
+    PARTITIONED_TABLES, BusinessPartitioner, TablePartitioner
+)
+
+
+class TablePartitionerTests(TestCase):
+
+    def setUp(self):
+        self.partitioner = TablePartitioner('core_business', 'user_id', 4)
+
+    def test_create_sql_builds_hash_partitions(self):
+        """Test the partitioned table gets one partition per remainder"""
+        statements = self.partitioner.create_sql([], [])
+
+        self.assertIn('PARTITION BY HASH (user_id)', statements[0])
+        self.assertIn(
+            'CREATE TABLE core_business_part3 PARTITION OF core_business_new '
+            'FOR VALUES WITH (MODULUS 4, REMAINDER 3)',
+            statements
+        )
+        self.assertIn('PRIMARY KEY (id, user_id)', statements[-1])
+
+    def test_index_sql_targets_staging_table(self):
+        """Test index definitions are renamed and moved to the new table"""
+        sql = self.partitioner.index_sql(
+            'CREATE INDEX core_business_live_name_idx ON public.core_business '
+            'USING btree (user_id, name, id) WHERE (deleted_at IS NULL)'
+        )
+
+        self.assertEqual(
+            sql,
+            'CREATE INDEX core_business_live_name_idx_new '
+            'ON core_business_new USING btree (user_id, name, id) '
+            'WHERE (deleted_at IS NULL)'
+        )
+
+    def test_long_names_fit_identifier_limit(self):
+        """Test staged names never exceed the PostgreSQL identifier limit"""
+        name = 'core_business_categories_business_id_category_id_b4c3ba5e_uniq'
+        sql = TablePartitioner(
+            'core_business_categories', 'business_id', 4
+        ).index_sql(f'CREATE UNIQUE INDEX {name} ON public.t USING btree (x)')
+
+        self.assertLessEqual(len(sql.split()[3]), 63)
+
+    def test_unique_sql_keeps_constraint(self):
+        """Test unique constraints stay constraints with the partition key"""
+        partitioner = TablePartitioner(
+            'core_business_categories', 'business_id', 4
+        )
+        name = 'core_business_categories_business_id_category_id_b4c3ba5e_uniq'
+
+        self.assertEqual(
+            partitioner.unique_sql(name, ['category_id', 'business_id']),
+            'ALTER TABLE core_business_categories_new ADD CONSTRAINT '
+            f'{name[:59]}_new UNIQUE (category_id, business_id)'
+        )
+        self.assertEqual(
+            self.partitioner.unique_sql('core_business_slug_uniq', ['slug']),
+            'ALTER TABLE core_business_new ADD CONSTRAINT '
+            'core_business_slug_uniq_new UNIQUE (slug, user_id)'
+        )
+
+    def test_swap_sql_renames_constraints(self):
+        """Test swapping gives unique constraints their original names"""
+        statements = self.partitioner.swap_sql(
+            [], None, ['core_business_slug_uniq']
+        )
+
+        self.assertIn(
+            'ALTER TABLE core_business_old RENAME CONSTRAINT '
+            'core_business_slug_uniq TO core_business_slug_uniq_old',
+            statements
+        )
+        self.assertEqual(
+            statements[-1],
+            'ALTER TABLE core_business RENAME CONSTRAINT '
+            'core_business_slug_uniq_new TO core_business_slug_uniq'
+        )
+
+    def test_swap_sql_renames_indexes(self):
+        """Test swapping retires the original names and reuses them"""
+        statements = self.partitioner.swap_sql(
+            ['core_business_live_name_idx'], 'core_business_id_seq'
+        )
+
+        self.assertIn(
+            'ALTER TABLE core_business RENAME TO core_business_old',
+            statements
+        )
+        self.assertIn(
+            'ALTER INDEX core_business_live_name_idx_new '
+            'RENAME TO core_business_live_name_idx',
+            statements
+        )
+        self.assertEqual(
+            statements[-1],
+            'ALTER SEQUENCE core_business_id_seq OWNED BY core_business.id'
+        )
+
+    def test_command_requires_postgres(self):
+        """Test the command refuses to run on other databases"""
+        if connection.vendor == 'postgresql':
+            self.skipTest('Running on PostgreSQL')
+
+        with self.assertRaises(CommandError):
+            call_command('partition_business')
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Requires PostgreSQL')
+class BusinessPartitioningTests(TestCase):
+
+    def unique_constraints(self):
+        """Return the (table, name) of the partitioned tables' unique keys"""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT conrelid::regclass::text, conname FROM pg_constraint "
+                "WHERE contype = 'u' AND conrelid::regclass::text = ANY(%s) "
+                "ORDER BY 1, 2",
+                [[table for table, _ in PARTITIONED_TABLES]]
+            )
+            return cursor.fetchall()
+
+    def test_tenant_queries_prune_to_one_partition(self):
+        """Test data and constraints are kept and tenants hit one partition"""
+        if connection.pg_version < 110000:
+            self.skipTest('Requires PostgreSQL 11+')
+        user = get_user_model().objects.create_user('test@test.com', '12345')
+        Business.objects.create(user=user, name='Bistro')
+        unique = self.unique_constraints()
+
+        partitioner = BusinessPartitioner(connection, 4)
+        partitioner.prepare()
+        list(partitioner.copy(batch_size=100))
+        partitioner.swap()
+
+        plan = Business.objects.for_user(user).explain()
+        self.assertEqual(plan.count('core_business_part'), 1)
+        self.assertEqual(Business.objects.for_user(user).count(), 1)
+        # Migrations alter unique_together by constraint name
+        self.assertEqual(len(unique), 2)
+        self.assertEqual(self.unique_constraints(), unique)
@@ -0,0 +1,76 @@
+from unittest.mock import Mock
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from core.models import Business
+from core.querycache import business_id_cache, business_repr_cache
+from core.tests.factories import create_users
+
+
+class GenerationCacheTests(TestCase):
+    """Test per-user results cached under a generation"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.other = create_users(2)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_result_computed_once(self):
+        """Test a cached result is reused until invalidated"""
+        compute = Mock(return_value=[3, 1])
+
+        first = business_id_cache.get_or_set(self.user.id, ((1,), ()), compute)
+        second = business_id_cache.get_or_set(
+            self.user.id,
+            ((1,), ()),
+            compute
+        )
+        business_id_cache.invalidate(self.user.id)
+        third = business_id_cache.get_or_set(self.user.id, ((1,), ()), compute)
+
+        self.assertEqual(first, second)
+        self.assertEqual(third, [3, 1])
+        self.assertEqual(compute.call_count, 2)
+
+    def test_writes_invalidate_their_user_only(self):
+        """Test saving a business drops the owner's cached results"""
+        generation = business_id_cache.generation(self.user.id)
+        other_generation = business_id_cache.generation(self.other.id)
+
+        Business.objects.create(user=self.user, name='Shop')
+
+        self.assertNotEqual(business_id_cache.generation(self.user.id),
+                            generation)
+        self.assertEqual(business_id_cache.generation(self.other.id),
+                         other_generation)
+
+    def test_evicted_generation_restarts_from_clock(self):
+        """Test a lost generation does not revive older results"""
+        compute = Mock(return_value=[1])
+        business_id_cache.get_or_set(self.user.id, ((), (2,)), compute)
+        generation = business_id_cache.generation(self.user.id)
+
+        cache.delete(f'business_ids_generation:{self.user.id}')
+        business_id_cache.get_or_set(self.user.id, ((), (2,)), compute)
+
+        self.assertGreater(business_id_cache.generation(self.user.id),
+                           generation)
+        self.assertEqual(compute.call_count, 2)
+
+    def test_representations_keyed_by_version(self):
+        """Test representations are found at their version only"""
+        business_repr_cache.set_many('list', {(1, 2): {'id': 1}})
+        business_repr_cache.set_many('detail', {(1, 2): {'id': 1, 'x': 0}})
+
+        self.assertEqual(
+            business_repr_cache.get_many('list', [(1, 2), (3, 1)]),
+            {1: {'id': 1}}
+        )
+        self.assertEqual(business_repr_cache.get_many('list', [(1, 3)]), {})
+        self.assertEqual(
+            business_repr_cache.get_many('detail', [(1, 2)]),
+            {1: {'id': 1, 'x': 0}}
+        )
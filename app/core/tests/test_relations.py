@@ -0,0 +1,92 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from rest_framework import serializers
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from core.models import Category
+from core.querycache import owned_id_cache
+from core.relations import UserPrimaryKeyRelatedField
+
+from .factories import create_named
+
+
+class RelationSerializer(serializers.Serializer):
+    categories = UserPrimaryKeyRelatedField(
+        many=True,
+        queryset=Category.objects.all()
+    )
+
+
+class UserManyRelatedFieldTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('test@test.com', '1')
+        cls.ids = [category.id for category in create_named(
+            Category,
+            cls.user,
+            [f'Category {i}' for i in range(50)]
+        )]
+
+    def setUp(self):
+        owned_id_cache.clear()
+
+    def validate(self, ids, request=None):
+        """Return a validated serializer for the submitted category ids"""
+        request = request or self.request()
+        serializer = RelationSerializer(
+            data={'categories': ids},
+            context={'request': request}
+        )
+        serializer.is_valid()
+        return serializer
+
+    def request(self):
+        request = Request(APIRequestFactory().post('/'))
+        request.user = self.user
+        return request
+
+    def test_ids_validated_in_one_query(self):
+        """Test fifty ids are validated with a single query"""
+        with self.assertNumQueries(1):
+            serializer = self.validate(self.ids)
+
+        self.assertEqual(serializer.validated_data['categories'], self.ids)
+
+    def test_ids_cached_per_process(self):
+        """Test validated ids are not looked up again"""
+        self.validate(self.ids[:10])
+
+        with self.assertNumQueries(1):
+            serializer = self.validate(self.ids)
+        with self.assertNumQueries(0):
+            self.validate(self.ids)
+
+        self.assertTrue(serializer.is_valid())
+
+    def test_other_users_ids_rejected(self):
+        """Test ids of another user's categories are invalid"""
+        other = get_user_model().objects.create_user('other@test.com', '1')
+        category = Category.objects.create(user=other, name='Other')
+
+        serializer = self.validate([self.ids[0], category.id])
+
+        self.assertIn('categories', serializer.errors)
+
+    def test_deleted_ids_forgotten(self):
+        """Test deleting a category removes it from the cache"""
+        self.validate(self.ids)
+        Category.objects.get(id=self.ids[0]).delete()
+
+        serializer = self.validate(self.ids)
+
+        self.assertIn('categories', serializer.errors)
+
+    def test_invalid_ids_rejected(self):
+        """Test non integer ids fail validation without a query"""
+        with self.assertNumQueries(0):
+            serializer = self.validate(['one'])
+
+        self.assertIn('categories', serializer.errors)
@@ -0,0 +1,85 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+
+from core.models import Business, Category, Service
+
+
+class TenantScopingTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            '12345'
+        )
+
+    def explain(self, queryset, disable=('seqscan',)):
+        """Return the query plan for a queryset, discouraging table scans
+
+        The test tables are tiny, so PostgreSQL is told not to use the
+        plans in `disable` rather than left to pick them by cost.
+        """
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                for plan in disable:
+                    cursor.execute(f'SET enable_{plan} = off')
+        try:
+            return queryset.explain()
+        finally:
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    for plan in disable:
+                        cursor.execute(f'RESET enable_{plan}')
+
+    def test_for_user_scopes_and_orders(self):
+        """Test for_user returns live rows of one user, newest name first"""
+        other = get_user_model().objects.create_user('other@test.com', 'x')
+        Category.objects.create(user=self.user, name='Beta')
+        Category.objects.create(user=self.user, name='Alpha')
+        second = Category.objects.create(user=self.user, name='Alpha')
+        Category.objects.create(user=other, name='Gamma')
+        Category.objects.create(user=self.user, name='Delta').delete()
+
+        names = list(
+            Category.objects.for_user(self.user).values_list('id', 'name')
+        )
+
+        self.assertEqual(names[0][1], 'Beta')
+        self.assertEqual(names[1], (second.id, 'Alpha'))
+        self.assertEqual(len(names), 3)
+
+    def test_list_queries_use_live_name_index(self):
+        """Test tenant list queries are served by the (user, name, id) index"""
+        for model in (Category, Service, Business):
+            plan = self.explain(model.objects.for_user(self.user))
+            self.assertIn(f'{model._meta.db_table}_live_name_idx', plan)
+            self.assertNotIn('TEMP B-TREE', plan)
+            self.assertNotIn('Sort', plan)
+
+    def test_id_name_lists_use_index_only_scans(self):
+        """Test id and name lists are read from the index alone"""
+        for model in (Category, Service, Business):
+            queryset = model.objects.for_user(self.user).values_list(
+                'id',
+                'name'
+            )
+            plan = self.explain(
+                queryset,
+                disable=('seqscan', 'indexscan', 'bitmapscan')
+            )
+            index = f'{model._meta.db_table}_live_name_idx'
+            if connection.vendor == 'postgresql':
+                self.assertIn(f'Index Only Scan using {index}', plan)
+            else:
+                # SQLite does not treat the deleted_at IS NULL predicate of
+                # a partial index as covered, so it cannot report a
+                # covering index here
+                self.assertIn(index, plan)
+            self.assertNotIn('Sort', plan)
+
+    def test_reverse_relation_uses_index(self):
+        """Test looking up businesses of a category uses a composite index"""
+        category = Category.objects.create(user=self.user, name='Vegan')
+        plan = self.explain(category.business_set.values_list('id'))
+
+        self.assertIn('core_business_cat_rev_idx', plan)
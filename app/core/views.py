@@ -0,0 +1,166 @@
+import mimetypes
+import os
+import posixpath
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import (
+    FileResponse, Http404, HttpResponse, HttpResponseNotModified,
+    StreamingHttpResponse
+)
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_etags, quote_etag
+from django.views.decorators.http import require_safe
+
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+DIGEST_RE = re.compile(r'^[0-9a-f]{64}$')
+
+
+def media_cache_control():
+    """Return the Cache-Control value for media files, which never change"""
+    return f'public, max-age={settings.MEDIA_CACHE_MAX_AGE}, immutable'
+
+
+def media_etag(name, stat):
+    """Return a strong ETag for a media file
+
+    Content addressed files are tagged with the hash in their name,
+    anything else with its size and modification time.
+    """
+    stem = posixpath.splitext(posixpath.basename(name))[0]
+    if DIGEST_RE.match(stem):
+        return quote_etag(stem)
+
+    return quote_etag(f'{stat.st_size:x}-{stat.st_mtime_ns:x}')
+
+
+def parse_range(header, size):
+    """Return the (start, end) byte range requested, inclusive
+
+    Returns None when the whole file should be sent, including for
+    multiple ranges, and raises ValueError for unsatisfiable ranges.
+    """
+    match = RANGE_RE.match(header.replace(' ', ''))
+    if not match or match.groups() == ('', ''):
+        return None
+
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        start = max(size - int(last), 0)
+        end = size - 1
+    if start > end or start >= size:
+        raise ValueError('Unsatisfiable range')
+
+    return start, end
+
+
+def stream_range(path, start, length, block_size=64 * 1024):
+    """Yield `length` bytes of a file starting at `start`"""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(block_size, length))
+            if not chunk:
+                return
+            length -= len(chunk)
+            yield chunk
+
+
+@require_safe
+def serve_media(request, path):
+    """Serve a media file, handing the transfer to the web server if set up
+
+    With MEDIA_SERVE_MODE 'x-accel-redirect' (nginx) or 'x-sendfile'
+    (Apache, lighttpd) only headers are returned and the web server sends
+    the file. 'django' sends it from Python, with conditional and range
+    request support, through the WSGI server's file wrapper so servers
+    such as gunicorn can use sendfile().
+    """
+    name = posixpath.normpath(path).lstrip('/')
+    if name.startswith('..') or name == '.':
+        raise Http404('Invalid media path')
+
+    content_type, encoding = mimetypes.guess_type(name)
+    content_type = content_type or 'application/octet-stream'
+
+    mode = settings.MEDIA_SERVE_MODE
+    if mode == 'django':
+        response = _serve_file(request, name, content_type)
+    elif mode == 'x-accel-redirect':
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = quote(
+            f"{settings.MEDIA_ACCEL_PREFIX.rstrip('/')}/{name}"
+        )
+    elif mode == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        try:
+            response['X-Sendfile'] = safe_join(settings.MEDIA_ROOT, name)
+        except ValueError:
+            raise Http404('Invalid media path')
+    else:
+        raise ValueError(f'Unknown MEDIA_SERVE_MODE {mode!r}')
+
+    # Errors such as 416 must not be cached as immutable
+    if response.status_code in (200, 206, 304):
+        response['Cache-Control'] = media_cache_control()
+    return response
+
+
+def _serve_file(request, name, content_type):
+    """Return a full, partial or not modified response for a media file"""
+    try:
+        path = safe_join(settings.MEDIA_ROOT, name)
+        stat = os.stat(path)
+    except (ValueError, OSError):
+        raise Http404('Media file not found')
+    if not os.path.isfile(path):
+        raise Http404('Media file not found')
+
+    etag = media_etag(name, stat)
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(stat.st_mtime),
+        'Accept-Ranges': 'bytes',
+    }
+
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match and (
+            etag in parse_etags(if_none_match) or if_none_match == '*'):
+        response = HttpResponseNotModified()
+        for header, value in headers.items():
+            response[header] = value
+        return response
+
+    byte_range = None
+    range_header = request.META.get('HTTP_RANGE')
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if range_header and (not if_range or if_range == etag):
+        try:
+            byte_range = parse_range(range_header, stat.st_size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+            return response
+
+    if byte_range is None:
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+        response['Content-Length'] = str(stat.st_size)
+    else:
+        start, end = byte_range
+        length = end - start + 1
+        response = StreamingHttpResponse(
+            stream_range(path, start, length),
+            status=206,
+            content_type=content_type
+        )
+        response['Content-Length'] = str(length)
+        response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+
+    for header, value in headers.items():
+        response[header] = value
+    return response
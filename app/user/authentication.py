@@ -0,0 +1,33 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.translation import ugettext_lazy as _
+
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+from core.models import AuthToken
+
+
+class ExpiringTokenAuthentication(TokenAuthentication):
+    """Token authentication that rejects expired tokens and renews used ones"""
+    model = AuthToken
+
+    def authenticate_credentials(self, key):
+        user, token = super().authenticate_credentials(key)
+
+        now = timezone.now()
+        if token.is_expired(now):
+            raise exceptions.AuthenticationFailed(_('Token has expired.'))
+
+        # Renew at most once per touch interval; the condition makes
+        # concurrent requests renewing the same token write it once
+        touch_interval = timedelta(seconds=settings.AUTH_TOKEN_TOUCH_INTERVAL)
+        if now - token.last_used >= touch_interval:
+            AuthToken.objects.filter(
+                key=token.key,
+                last_used__lt=now - touch_interval
+            ).update(last_used=now)
+
+        return (user, token)
@@ -1,4 +1,8 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model, authenticate
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.utils.crypto import salted_hmac
 from django.utils.translation import ugettext_lazy as _
 
 from rest_framework import serializers
@@ -40,16 +44,47 @@ class AuthTokenSerializer(serializers.Serializer):
         """Validate and authenticate the user"""
         email = attrs.get('email')
         password = attrs.get('password')
+        msg = _('Unable to authenticate with provided credential')
 
-        user = authenticate(
-            request=self.context.get('request'),
-            username=email,
-            password=password
+        # Recently failed credentials are rejected without running the
+        # password hasher, for unknown and known emails alike
+        user_model = get_user_model()
+        password_hash = user_model.objects.filter(
+            **{user_model.USERNAME_FIELD: email}
+        ).values_list('password', flat=True).first()
+
+        failure_key = self._failure_cache_key(
+            email, password, password_hash or ''
         )
+        if cache.get(failure_key):
+            raise serializers.ValidationError(msg, code='authentication')
+
+        if password_hash is None:
+            # Hash anyway, as ModelBackend does, so the response time does
+            # not tell whether the email is registered
+            make_password(password)
+            user = None
+        else:
+            user = authenticate(
+                request=self.context.get('request'),
+                username=email,
+                password=password
+            )
 
         if not user:
-            msg = _('Unable to authenticate with provided credential')
+            cache.set(failure_key, True, settings.LOGIN_FAILURE_CACHE_TIMEOUT)
             raise serializers.ValidationError(msg, code='authentication')
 
         attrs['user'] = user
         return attrs
+
+    def _failure_cache_key(self, email, password, password_hash):
+        """Return the cache key remembering a failed credential pair"""
+        # The stored hash is part of the digest, so a password change
+        # invalidates every cached failure for the user
+        digest = salted_hmac(
+            'user.serializers.AuthTokenSerializer',
+            '\0'.join((email, password, password_hash))
+        ).hexdigest()
+
+        return f'login_failure_{digest}'
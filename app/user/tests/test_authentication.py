@@ -0,0 +1,136 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.test import APIClient
+
+from core.models import AuthToken
+
+from ..authentication import ExpiringTokenAuthentication
+
+
+TOKEN_URL = reverse('user:token')
+ME_URL = reverse('user:me')
+
+
+class ExpiringTokenTests(TestCase):
+    """Test expiring token authentication"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            'test@test.com',
+            '12345'
+        )
+        self.client = APIClient()
+
+    def authenticate(self, token):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def test_valid_token_accepted(self):
+        """Test that a fresh token authenticates the user"""
+        self.authenticate(AuthToken.objects.create(user=self.user))
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_idle_token_rejected(self):
+        """Test that a token unused for too long is rejected"""
+        token = AuthToken.objects.create(
+            user=self.user,
+            last_used=timezone.now() - AuthToken.idle_timeout() - timedelta(1)
+        )
+        self.authenticate(token)
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_old_token_rejected(self):
+        """Test that a token past its maximum age is rejected"""
+        token = AuthToken.objects.create(
+            user=self.user,
+            created=timezone.now() - AuthToken.max_age() - timedelta(1)
+        )
+        self.authenticate(token)
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_recently_used_token_not_written(self):
+        """Test that recent tokens are not renewed on every request"""
+        last_used = timezone.now() - timedelta(seconds=10)
+        token = AuthToken.objects.create(user=self.user, last_used=last_used)
+        self.authenticate(token)
+
+        self.client.get(ME_URL)
+
+        token.refresh_from_db()
+        self.assertEqual(token.last_used, last_used)
+
+    def test_used_token_renewed(self):
+        """Test that an aging token is renewed when it is used"""
+        last_used = timezone.now() - timedelta(hours=1)
+        token = AuthToken.objects.create(user=self.user, last_used=last_used)
+        self.authenticate(token)
+
+        self.client.get(ME_URL)
+
+        token.refresh_from_db()
+        self.assertGreater(token.last_used, last_used)
+
+    def test_token_renewed_once_per_interval(self):
+        """Test that a request that read a token before its renewal does
+        not write it again"""
+        token = AuthToken.objects.create(
+            user=self.user,
+            last_used=timezone.now() - timedelta(hours=1)
+        )
+        renewed = timezone.now() - timedelta(seconds=10)
+        AuthToken.objects.filter(key=token.key).update(last_used=renewed)
+
+        with patch.object(
+            TokenAuthentication,
+            'authenticate_credentials',
+            return_value=(self.user, token)
+        ):
+            ExpiringTokenAuthentication().authenticate_credentials(token.key)
+
+        token.refresh_from_db()
+        self.assertEqual(token.last_used, renewed)
+
+    def test_login_rotates_expired_token(self):
+        """Test that logging in replaces an expired token"""
+        token = AuthToken.objects.create(
+            user=self.user,
+            created=timezone.now() - AuthToken.max_age() - timedelta(1)
+        )
+
+        res = self.client.post(
+            TOKEN_URL,
+            {'email': 'test@test.com', 'password': '12345'}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res.data['token'], token.key)
+        self.assertEqual(AuthToken.objects.filter(user=self.user).count(), 1)
+
+    def test_login_reuses_valid_token(self):
+        """Test that logging in returns the existing valid token"""
+        token = AuthToken.objects.create(user=self.user)
+
+        res = self.client.post(
+            TOKEN_URL,
+            {'email': 'test@test.com', 'password': '12345'}
+        )
+
+        self.assertEqual(res.data['token'], token.key)
@@ -0,0 +1,51 @@
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from rest_framework.test import APIRequestFactory
+
+from ..throttles import SlidingWindowThrottle
+
+
+class SampleThrottle(SlidingWindowThrottle):
+    rate = '4/min'
+
+    def get_cache_key(self, request, view):
+        return 'throttle_sample'
+
+
+class SlidingWindowThrottleTests(TestCase):
+    """Test the sliding window counter throttle"""
+
+    def setUp(self):
+        cache.clear()
+        self.request = APIRequestFactory().get('/')
+
+    def allow(self, now):
+        throttle = SampleThrottle()
+        with patch.object(throttle, 'timer', return_value=now):
+            return throttle.allow_request(self.request, None)
+
+    def test_requests_within_rate_allowed(self):
+        """Test that requests up to the rate are allowed"""
+        results = [self.allow(600 + i) for i in range(4)]
+
+        self.assertTrue(all(results))
+        self.assertFalse(self.allow(605))
+
+    def test_previous_window_is_weighted(self):
+        """Test that the previous window counts by its overlap"""
+        for i in range(4):
+            self.allow(600 + i)
+
+        # A quarter into the next window, 3 of the 4 old requests still count
+        self.assertTrue(self.allow(675))
+        self.assertFalse(self.allow(676))
+
+    def test_old_windows_are_forgotten(self):
+        """Test that requests two windows back no longer count"""
+        for i in range(5):
+            self.allow(600 + i)
+
+        self.assertTrue(self.allow(720))
@@ -1,10 +1,16 @@
-from django.test import TestCase
+import json
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.urls import reverse
 
 from rest_framework.test import APIClient
 from rest_framework import status
 
+from core.models import Job
+
 
 CREATE_USER_URL = reverse('user:create')
 TOKEN_URL = reverse('user:token')
@@ -20,6 +26,7 @@ class PublicUserApiTests(TestCase):
 
     def setUp(self):
         self.client = APIClient()
+        cache.clear()
 
     def test_create_user_success(self):
         """Test creating user with valid payload us successful"""
@@ -64,6 +71,18 @@ class PublicUserApiTests(TestCase):
         self.assertIn('token', res.data)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
 
+    @override_settings(WARM_CACHE_ON_LOGIN=True)
+    def test_create_token_queues_cache_warming(self):
+        """Test that a login queues warming the user's caches"""
+        payload = {'email': 'test@test.com', 'password': '12345'}
+        user = create_user(**payload)
+
+        self.client.post(TOKEN_URL, payload)
+
+        job = Job.objects.get()
+        self.assertEqual(job.name, 'business.warm_cache')
+        self.assertEqual(json.loads(job.kwargs), {'user_id': user.pk})
+
     def test_create_token_with_invalid_credentials(self):
         """Test that token is not created if credentials are invalid"""
         create_user(email='test@test.com', password='12345')
@@ -87,6 +106,62 @@ class PublicUserApiTests(TestCase):
         self.assertNotIn('token', res.data)
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
 
+    @patch('user.serializers.make_password')
+    def test_create_token_unknown_email_hashes_password(self, hasher):
+        """Test that unknown emails run the hasher like known ones"""
+        payload = {'email': 'test@test.com', 'password': '12345'}
+        res = self.client.post(TOKEN_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        hasher.assert_called_once_with('12345')
+
+    def test_create_token_unknown_email_failure_cached(self):
+        """Test that repeated unknown emails are cached like bad passwords"""
+        payload = {'email': 'test@test.com', 'password': '12345'}
+        self.client.post(TOKEN_URL, payload)
+
+        with patch('user.serializers.make_password') as hasher:
+            res = self.client.post(TOKEN_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        hasher.assert_not_called()
+
+    def test_create_token_repeated_failure_cached(self):
+        """Test that a repeated bad password is rejected from the cache"""
+        create_user(email='test@test.com', password='12345')
+        payload = {'email': 'test@test.com', 'password': 'wrong'}
+        self.client.post(TOKEN_URL, payload)
+
+        with patch('user.serializers.authenticate') as auth:
+            res = self.client.post(TOKEN_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        auth.assert_not_called()
+
+    def test_create_token_after_password_change(self):
+        """Test that a cached failure does not outlive a password change"""
+        user = create_user(email='test@test.com', password='12345')
+        payload = {'email': 'test@test.com', 'password': 'new12345'}
+        self.client.post(TOKEN_URL, payload)
+        user.set_password(payload['password'])
+        user.save()
+
+        res = self.client.post(TOKEN_URL, payload)
+
+        self.assertIn('token', res.data)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_create_token_throttled_by_email(self):
+        """Test that login attempts for one email are rate limited"""
+        payload = {'email': 'test@test.com', 'password': '12345'}
+        for _ in range(10):
+            self.client.post(TOKEN_URL, payload)
+
+        res = self.client.post(TOKEN_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', res)
+
     def test_retrieve_user_unauthorized(self):
         """Test that authentication is required for user"""
         res = self.client.get(ME_URL)
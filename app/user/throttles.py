@@ -0,0 +1,72 @@
+import hashlib
+
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class SlidingWindowThrottle(SimpleRateThrottle):
+    """Throttle requests with a sliding window counter
+
+    Only two integer counters are kept per client (the current and the
+    previous fixed window). The previous window is weighted by how much of
+    it still overlaps the sliding window, so memory per client stays
+    constant no matter how fast the client is sending requests.
+    """
+
+    def allow_request(self, request, view):
+        """Count the request and check the estimated rate"""
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        now = self.timer()
+        window = int(now // self.duration)
+        current = self._incr(f'{self.key}_{window}')
+        previous = self.cache.get(f'{self.key}_{window - 1}', 0)
+
+        elapsed = (now % self.duration) / self.duration
+        estimated = previous * (1 - elapsed) + current
+        self.wait_seconds = self.duration - (now % self.duration)
+
+        return estimated <= self.num_requests
+
+    def wait(self):
+        """Return the seconds left until the current window rolls over"""
+        return self.wait_seconds
+
+    def _incr(self, key):
+        """Atomically increment a window counter, creating it if needed"""
+        # Counters outlive their own window so they can act as the
+        # previous window for the next one
+        self.cache.add(key, 0, self.duration * 2)
+        try:
+            return self.cache.incr(key)
+        except ValueError:
+            self.cache.set(key, 1, self.duration * 2)
+            return 1
+
+
+class LoginIPThrottle(SlidingWindowThrottle):
+    """Limit login attempts per client IP address"""
+    scope = 'login_ip'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {
+            'scope': self.scope,
+            'ident': self.get_ident(request)
+        }
+
+
+class LoginEmailThrottle(SlidingWindowThrottle):
+    """Limit login attempts per submitted email address"""
+    scope = 'login_email'
+
+    def get_cache_key(self, request, view):
+        email = getattr(request.data, 'get', lambda key: None)('email')
+        if not email:
+            return None
+
+        ident = hashlib.sha1(str(email).strip().lower().encode()).hexdigest()
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
@@ -1,8 +1,17 @@
-from rest_framework import generics, authentication, permissions
+from django.conf import settings
+from django.utils import timezone
+
+from rest_framework import generics, permissions
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
 
+from core import jobs
+from core.models import AuthToken
+
+from .authentication import ExpiringTokenAuthentication
 from .serializers import UserSerializer, AuthTokenSerializer
+from .throttles import LoginIPThrottle, LoginEmailThrottle
 
 
 class CreateUserView(generics.CreateAPIView):
@@ -13,14 +22,50 @@ class CreateTokenView(ObtainAuthToken):
     """Create a new auth token for user"""
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    throttle_classes = (LoginIPThrottle, LoginEmailThrottle)
+
+    def post(self, request, *args, **kwargs):
+        """Return the user's token, rotating it if it has expired"""
+        serializer = self.serializer_class(
+            data=request.data,
+            context={'request': request}
+        )
+        serializer.is_valid(raise_exception=True)
+        user = serializer.validated_data['user']
+
+        token, created = AuthToken.objects.get_or_create(user=user)
+        if not created and token.is_expired():
+            token = self._rotate(token)
+        if settings.WARM_CACHE_ON_LOGIN:
+            # Ahead of other jobs, the user's first requests are imminent
+            jobs.enqueue(
+                'business.warm_cache',
+                priority=10,
+                max_attempts=1,
+                user_id=user.pk
+            )
+
+        return Response({'token': token.key})
+
+    def _rotate(self, token):
+        """Replace an expired token with a fresh key"""
+        now = timezone.now()
+        AuthToken.objects.filter(key=token.key).update(
+            key=AuthToken.generate_key(),
+            created=now,
+            last_used=now
+        )
+        # Whether this or a concurrent login rotated it, the user is left
+        # with a single fresh token
+        token, created = AuthToken.objects.get_or_create(user=token.user)
+        return token
 
 class ManageUserView(generics.RetrieveUpdateAPIView):
     """Manage the authenticated user"""
     serializer_class = UserSerializer
-    authentication_classes = (authentication.TokenAuthentication,)
+    authentication_classes = (ExpiringTokenAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
 
     def get_object(self):
         """Retrieve and return authenticated user"""
         return self.request.user
-